@@ -0,0 +1,388 @@
+"""
+Scheduler that adapts how often archiver processors run to their
+activity.
+
+The scheduler tracks the activity of a set of *keys*, for example the
+paths of the clip and recording archivers of the stations. A processor
+runs only when its key is due. The key then remains due after a run
+in which the processor's listers output items, since more items may be
+waiting. After a run in which the listers found only items that are not
+yet ready (for example files that are still being synced), the key is
+due again after a short minimum period. After a run in which the
+listers found nothing, or that failed, the key's period grows
+geometrically up to a maximum period. A processor can defer items that
+the listers output, for example because it is still uploading them, in
+which case they count as not yet ready.
+
+A processor that skips work because a remote service it uses is
+unavailable can also report when the service may be available again,
+and its key is not due before then. The processor can also report the
+cause of the block, for example the service's circuit breaker, in which
+case the key becomes due as soon as the cause is removed.
+
+A key can also be associated with one or more directories whose
+modification times the scheduler watches while the archiver sleeps.
+When a watched directory changes, for example because a new file
+appeared in it, its key becomes due immediately and the archiver
+wakes up early. The archiver always sleeps for at least a minimum
+period between passes, however, so that a busy key does not keep it
+from sleeping at all.
+"""
+
+
+import threading
+import time
+
+import lrgv.util.file_utils as file_utils
+
+
+class ActivityScheduler:
+
+
+    def __init__(
+            self, min_period, max_period, backoff_factor=2,
+            watch_period=5, min_sleep_period=0):
+
+        """
+        Initializes this scheduler.
+
+        Parameters
+        ----------
+        min_period : float
+            the period in seconds of a key after a run in which its
+            processor found only items that are not yet ready.
+
+        max_period : float
+            the maximum period in seconds of an idle key.
+
+        backoff_factor : float
+            the factor by which the period of an idle key grows after
+            each idle run.
+
+        watch_period : float
+            the period in seconds at which watched directories are
+            checked for changes while sleeping.
+
+        min_sleep_period : float
+            the minimum period in seconds of each sleep.
+        """
+
+        self._min_period = min_period
+        self._max_period = max_period
+        self._backoff_factor = backoff_factor
+        self._watch_period = watch_period
+        self._min_sleep_period = min_sleep_period
+
+        # Mapping from key to `_KeyState`.
+        self._states = {}
+
+        # Mapping from watched directory path to (key, mtime_ns) pair.
+        self._watched_dirs = {}
+
+        # Key of current run, and activity during it.
+        self._run_key = None
+        self._run_item_count = 0
+        self._run_pending_count = 0
+        self._run_blocked_until = None
+        self._run_block_causes = set()
+
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+
+
+    def _get_state(self, key):
+        state = self._states.get(key)
+        if state is None:
+            state = _KeyState()
+            self._states[key] = state
+        return state
+
+
+    def watch(self, key, dir_path):
+
+        """
+        Watches a directory for changes, waking the specified key when
+        the directory changes.
+        """
+
+        with self._lock:
+            self._get_state(key)
+            mtime_ns = file_utils.get_mtime_ns(dir_path)
+            self._watched_dirs[dir_path] = (key, mtime_ns)
+
+
+    def is_due(self, key, now=None):
+
+        """Determines whether or not the specified key is due to run."""
+
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+            return self._get_state(key).due_time <= now
+
+
+    def get_period(self, key):
+        with self._lock:
+            return self._get_state(key).period
+
+
+    def start_run(self, key):
+
+        """Starts a run for the specified key."""
+
+        with self._lock:
+            self._get_state(key)
+            self._run_key = key
+            self._run_item_count = 0
+            self._run_pending_count = 0
+            self._run_blocked_until = None
+            self._run_block_causes = set()
+
+
+    def record_activity(self, item_count, pending_count=0):
+
+        """
+        Records activity during the current run.
+
+        Parameters
+        ----------
+        item_count : int
+            the number of items output by a lister.
+
+        pending_count : int
+            the number of items a lister found that are not yet ready
+            for processing, for example since they were modified too
+            recently.
+        """
+
+        with self._lock:
+            if self._run_key is not None:
+                self._run_item_count += item_count
+                self._run_pending_count += pending_count
+
+
+    def record_deferred(self, item_count):
+
+        """
+        Records that a processor deferred items that a lister output
+        during the current run, for example since work on them that
+        started during an earlier run has not yet completed. The items
+        count as not yet ready rather than as output.
+        """
+
+        with self._lock:
+            if self._run_key is not None:
+                count = min(item_count, self._run_item_count)
+                self._run_item_count -= count
+                self._run_pending_count += count
+
+
+    def record_blocked(self, retry_time, cause=None):
+
+        """
+        Records that a processor skipped work during the current run
+        because a remote service it uses is unavailable, or because it
+        is waiting for something else to happen.
+
+        Parameters
+        ----------
+        retry_time : float
+            the `time.monotonic` time at which the service may be
+            available again. The key of the current run will not be due
+            before then, unless `cause` is removed first.
+
+        cause : Hashable | None
+            the cause of the block, for example the circuit breaker of
+            the service, or `None`. If the cause is removed, as reported
+            by the `unblock` method, the key of the current run becomes
+            due immediately.
+        """
+
+        with self._lock:
+            if self._run_key is not None:
+                blocked_until = self._run_blocked_until
+                if blocked_until is None or retry_time > blocked_until:
+                    self._run_blocked_until = retry_time
+                if cause is not None:
+                    self._run_block_causes.add(cause)
+
+
+    def end_run(self, failed=False, now=None):
+
+        """
+        Ends the current run, scheduling the next run of its key
+        according to the activity recorded during it.
+        """
+
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+
+            key = self._run_key
+
+            if key is None:
+                return
+
+            state = self._states[key]
+
+            if failed:
+                state.period = self._back_off(state.period)
+
+            elif self._run_item_count != 0:
+                # busy
+
+                state.period = 0
+
+            elif self._run_pending_count != 0:
+                # items pending
+
+                state.period = self._min_period
+
+            else:
+                # idle
+
+                state.period = self._back_off(state.period)
+
+            state.due_time = now + state.period
+
+            if self._run_blocked_until is not None:
+                state.due_time = max(state.due_time, self._run_blocked_until)
+
+            state.block_causes = frozenset(self._run_block_causes)
+
+            self._run_key = None
+
+
+    def _back_off(self, period):
+        period = max(period, self._min_period) * self._backoff_factor
+        return min(period, self._max_period)
+
+
+    def wake(self, key):
+
+        """
+        Makes the specified key due immediately, and wakes the scheduler
+        if it is sleeping.
+        """
+
+        with self._lock:
+            state = self._get_state(key)
+            state.due_time = 0
+            state.period = 0
+
+        self._wake_event.set()
+
+
+    def unblock(self, cause):
+
+        """
+        Reports that the specified cause of blocks has been removed.
+
+        Keys whose last runs were blocked by the cause become due
+        immediately, and the scheduler wakes if it is sleeping. The
+        periods of the keys, and the due times of other keys, are not
+        changed.
+        """
+
+        woke = False
+
+        with self._lock:
+            for state in self._states.values():
+                if cause in state.block_causes:
+                    state.due_time = 0
+                    state.block_causes = frozenset()
+                    woke = True
+
+        if woke:
+            self._wake_event.set()
+
+
+    def get_next_due_time(self):
+
+        """
+        Gets the earliest due time of all keys, or `None` if there are
+        no keys.
+        """
+
+        with self._lock:
+            if len(self._states) == 0:
+                return None
+            else:
+                return min(s.due_time for s in self._states.values())
+
+
+    def sleep(self):
+
+        """
+        Sleeps until some key is due, a watched directory changes, or
+        a key is woken or unblocked, but for at least the minimum sleep
+        period.
+        """
+
+        min_wake_time = time.monotonic() + self._min_sleep_period
+
+        while True:
+
+            due_time = self.get_next_due_time()
+
+            if due_time is None:
+                due_time = time.monotonic() + self._min_period
+
+            # A key may have become due since we last checked, for
+            # example because it was woken.
+            due_time = max(due_time, min_wake_time)
+
+            timeout = due_time - time.monotonic()
+
+            if timeout <= 0:
+                break
+
+            if self._wake_event.wait(min(timeout, self._watch_period)):
+                self._wake_event.clear()
+            else:
+                self._check_watched_dirs()
+
+        self._wake_event.clear()
+
+
+    def _check_watched_dirs(self):
+
+        """
+        Checks watched directories for changes, waking the keys of
+        those that changed.
+
+        Returns `True` if and only if any directory changed.
+        """
+
+        with self._lock:
+            watched_dirs = tuple(self._watched_dirs.items())
+
+        changed = False
+
+        for dir_path, (key, mtime_ns) in watched_dirs:
+
+            new_mtime_ns = file_utils.get_mtime_ns(dir_path)
+
+            if new_mtime_ns != mtime_ns:
+
+                with self._lock:
+                    self._watched_dirs[dir_path] = (key, new_mtime_ns)
+
+                self.wake(key)
+                changed = True
+
+        return changed
+
+
+class _KeyState:
+
+    def __init__(self):
+
+        # All keys are initially due.
+        self.due_time = 0
+        self.period = 0
+
+        # Causes of the block of the key's last run, if it was blocked.
+        self.block_causes = frozenset()
@@ -70,10 +70,206 @@ _OLD_BIRD_CLIP_FILE_NAME_RE = (
 _OLD_BIRD_DETECTOR_START_TIME = Time(hour=21)
 _OLD_BIRD_DETECTOR_RUN_TIME = 8           # hours
 
+# Maximum number of Old Bird clips that the archiver converts to Vesper
+# clips at once for a station.
+_OLD_BIRD_CONVERSION_CONCURRENCY = 8
+
 _NON_OLD_BIRD_DETECTOR_NAMES = ('Nighthawk',)
 
 _FILE_WAIT_PERIOD = 30                  # seconds
 
+# Settings of the detectors that the archiver recording and clip listers
+# use to release files as soon as they are complete, rather than only
+# after the file wait period, or `None` to use only the wait period.
+# See the `lrgv.archiver.file_stability_detector` module for details.
+_FILE_STABILITY = Bunch(
+    period=2,                           # seconds
+    validate_wave_headers=True,
+    validate_json_files=True)
+
+# Path of SQLite index of archiver directory state, or `None` to not
+# maintain an index.
+_ARCHIVER_INDEX_FILE_PATH = _ARCHIVER_DATA_DIR_PATH / 'Archiver Index.sqlite'
+
+# Path of journal in which the archiver records the creation of clips
+# and recordings in the Vesper archive, or `None` to not keep a journal.
+# See the `lrgv.archiver.transition_journal` module for details.
+_ARCHIVER_JOURNAL_FILE_PATH = \
+    _ARCHIVER_DATA_DIR_PATH / 'Archiver Journal.jsonl'
+
+# Period for which the archiver journal remembers the Vesper IDs of the
+# clips and recordings the archiver has created, or `None` to not
+# remember them. The archiver does not create a clip or recording again
+# if its files reappear within this period, for example because a sync
+# program restores them, but just archives the files. The journal keeps
+# the IDs in memory and in its file, so their size grows with the
+# number of clips created in the period.
+_CREATED_OBJECT_RETENTION_PERIOD = 2 * 24 * 3600      # seconds
+
+# Maximum total size of the clip and recording metadata files whose
+# parsed contents are cached in memory across archiver ticks, or `None`
+# to not cache metadata. Parsed metadata typically occupy several times
+# as much memory as the files they are parsed from.
+_METADATA_CACHE_SIZE = 20_000_000        # bytes
+
+# `True` if and only if the archiver `Incoming`, `Created`, and `Archived`
+# clip directories of each detector are partitioned into night
+# subdirectories, for example `Archived/2026-04-15`. Existing clip
+# directories can be partitioned with the
+# `lrgv/scripts/partition_clip_dirs_by_night.py` script.
+_PARTITION_CLIP_DIRS_BY_NIGHT = False
+
+# `True` if and only if the archived clip files of each night should be
+# packed into a clip container (see `lrgv.archiver.clip_container`) once
+# the night is at least `_ARCHIVED_CLIP_PACK_DELAY` nights old. Packing
+# requires that clip directories be partitioned by night.
+_PACK_ARCHIVED_CLIPS = False
+_ARCHIVED_CLIP_PACK_DELAY = 2           # nights
+
+# `True` if and only if the archiver should hold back the clips of
+# non-Old Bird detectors until their recordings have been created in the
+# Vesper archive, so that the clips are imported along with existing
+# recordings rather than declaring the recordings themselves. A clip
+# whose recording has not been created is held for at most
+# `_CLIP_RECORDING_WAIT_PERIOD` seconds after its start time. Holding
+# requires an archiver index.
+_HOLD_CLIPS_FOR_RECORDINGS = False
+_CLIP_RECORDING_WAIT_PERIOD = 3600      # seconds
+
+# `True` if and only if, when archiving remotely, the archiver should
+# start uploading the audio file of each clip to AWS S3 as soon as the
+# clip has been created in the Vesper archive, rather than after all of
+# the clips of a station and detector have been created. Clip audio
+# then appears in clip albums seconds after the clips themselves.
+_START_CLIP_UPLOADS_ON_CREATION = True
+
+# `True` if and only if the archiver should hand each clip it creates in
+# the Vesper archive directly to the processors that archive the clip's
+# audio file, in the same tick, rather than having them find the clip
+# in the created clip directory on a later tick. The directory is still
+# listed when the archiver starts, after errors, and at least every
+# `_CREATED_CLIP_RESCAN_PERIOD` seconds.
+_HAND_OFF_CREATED_CLIPS = True
+_CREATED_CLIP_RESCAN_PERIOD = 600       # seconds
+
+# Settings of the quality checks that the archiver performs on each clip
+# before creating it in the Vesper archive, or `None` to not check clips.
+# A clip fails if its audio file header is invalid, if its audio file is
+# truncated or contains no samples, if its length differs from that of
+# its metadata by more than `max_length_difference` sample frames, if
+# its sample rate differs from that of its recording in its metadata, if
+# all of its samples are zero, if its RMS level is below `min_rms_level`
+# dBFS, or if more than `max_clipped_fraction` of its samples are at
+# full scale. The length, RMS level, and clipping checks can be disabled
+# by setting their settings to `None`. Nighthawk clip extraction
+# computes the lengths of clip audio files and metadata separately, so
+# they can differ by a frame due to rounding. Clips that fail are moved
+# to the `Rejected` clip directory of their detector.
+_CLIP_QUALITY_CHECKS = Bunch(
+    max_length_difference=2,            # sample frames
+    min_rms_level=None,                 # dBFS
+    max_clipped_fraction=.5)
+
+# Archiver polling settings. The archiver processes the recordings and
+# clips of each station recorder and detector again immediately after
+# processing some, and after `_MIN_POLL_PERIOD` seconds if it found some
+# that were not yet ready. Otherwise it waits a period that grows by a
+# factor of `_POLL_BACKOFF_FACTOR` each time it finds nothing, up to
+# `_MAX_POLL_PERIOD` seconds. It checks synced recording and clip
+# directories for changes every `_DIR_WATCH_PERIOD` seconds, and
+# processes a recorder or detector immediately if its directory changes.
+# It always sleeps at least `_MIN_SLEEP_PERIOD` seconds between passes.
+_MIN_POLL_PERIOD = 1                    # seconds
+_MAX_POLL_PERIOD = 300                  # seconds
+_POLL_BACKOFF_FACTOR = 2
+_DIR_WATCH_PERIOD = 5                   # seconds
+_MIN_SLEEP_PERIOD = 1                   # seconds
+
+# Settings of the circuit breakers that the archiver uses to stop sending
+# requests to the Vesper server or AWS S3 while it is unavailable. After
+# `failure_threshold` consecutive failures the archiver skips requests to
+# the service for `min_open_period` seconds, after which it tries one
+# request. Each time that fails, it waits `backoff_factor` times longer,
+# up to `max_open_period` seconds. See `lrgv.util.circuit_breaker`.
+_CIRCUIT_BREAKER = Bunch(
+    failure_threshold=3,
+    min_open_period=5,                  # seconds
+    max_open_period=300,                # seconds
+    backoff_factor=2,
+    jitter=.2)
+
+# Maximum number of clips of one station, recorder, and detector that
+# the archiver imports into the Vesper archive with a single HTTP
+# request. Set to one to import clips one at a time.
+_CLIP_IMPORT_BATCH_SIZE = 100
+
+# Maximum number of clip import requests that the archiver clip creator
+# of a detector has in flight at once. Most of the time taken by a
+# request is network latency, so sending several at once can speed
+# clip archiving considerably when the Vesper server is remote.
+_CLIP_IMPORT_CONCURRENCY = 4
+
+# Maximum number of concurrent connections to the Vesper server.
+_VESPER_CONNECTION_POOL_SIZE = 10
+
+# Path of file in which to save the archiver's Vesper server session
+# cookies so that the archiver need not log in to the server again
+# after it restarts, or `None` to not save the cookies.
+_VESPER_SESSION_FILE_PATH = _ARCHIVER_DATA_DIR_PATH / 'Vesper Session.json'
+
+# Gzip compression level (from 1 to 9) of the JSON bodies of the Vesper
+# import requests that the archiver sends, or `None` to not compress
+# them. Set a level only for a Vesper server that is known to accept
+# gzip-encoded requests. If the server rejects a compressed request
+# because of its encoding (with status code 415, or 400 and a message
+# that mentions the encoding) but accepts the same request
+# uncompressed, the archiver stops compressing.
+_VESPER_REQUEST_COMPRESSION_LEVEL = None
+
+# Timeouts in seconds of connecting to the Vesper server and of waiting
+# for its response to a request. A request that times out counts as a
+# failure of the server for its circuit breaker.
+_VESPER_REQUEST_TIMEOUT = (10, 120)     # (connect, read) seconds
+
+# Maximum number of clip audio files that the archiver uploads to AWS S3
+# concurrently, across all stations and detectors.
+_S3_UPLOAD_CONCURRENCY = 10
+
+# `True` if and only if the archiver should check whether or not a clip
+# audio file is already in AWS S3 before uploading it, and skip the
+# upload if it is. This saves uploading the file again when the archiver
+# stopped after uploading it but before moving it to the archived clip
+# directory.
+_S3_SKIP_EXISTING_UPLOADS = True
+
+# Schedule of the maximum total rate at which the archiver uploads clip
+# audio files to AWS S3, or `None` for no limit. The schedule is a
+# sequence of `(start_time, rate)` pairs, where `start_time` is a time
+# of day in the station time zone and `rate` is a rate in bytes per
+# second, or `None` for no limit, that applies from that time until the
+# next start time. For example:
+#
+#     (('07:00', 250_000), ('19:00', None))
+#
+# limits uploads to 250 kB/s during the day and not at all at night.
+_S3_UPLOAD_BANDWIDTH_SCHEDULE = None
+
+# `True` if and only if, when archiving locally, the archiver may put
+# clip audio files into the Vesper archive by creating hard links to
+# them rather than copying them. Linking requires that the archiver
+# data and the Vesper archive be on the same file system. A linked
+# archive file is the same file as the clip's file in the archiver's
+# `Archived` directory, so modifying or truncating either modifies
+# both, and the archive has no copy of its own. When linking is not
+# allowed or not possible, the archiver clones files with reflinks or
+# copies them within the kernel when it can.
+_LINK_LOCAL_ARCHIVE_CLIP_FILES = False
+
+# Maximum number of clip audio files that the archiver copies into the
+# Vesper archive at once for a station and detector, when archiving
+# locally.
+_LOCAL_ARCHIVE_COPY_CONCURRENCY = 4
+
 _SECRET_FILE_PATH = Path(__file__).parent / 'secrets/secrets_lrgv.env'
 
 
@@ -132,7 +328,8 @@ def _get_paths(station_names, recorder_names, detector_names):
         return Bunch(
             synced_recording_dir_path=synced_dir_path / 'Incoming',
             incoming_recording_dir_path=archiver_dir_path / 'Incoming',
-            archived_recording_dir_path=archiver_dir_path / 'Archived')
+            archived_recording_dir_path=archiver_dir_path / 'Archived',
+            unconfirmed_recording_dir_path=archiver_dir_path / 'Unconfirmed')
     
 
     def get_detector_paths(station_name, detector_name):
@@ -146,11 +343,19 @@ def _get_paths(station_names, recorder_names, detector_names):
         station_dir_path = get_archiver_station_dir_path(station_name)
         archiver_dir_path = get_detector_dir_path(station_dir_path)
 
+        # Time zone in which to compute clip nights for night-partitioned
+        # clip directories, or `None` if they are not partitioned.
+        night_dir_time_zone = \
+            _STATION_TIME_ZONE if _PARTITION_CLIP_DIRS_BY_NIGHT else None
+
         return Bunch(
             synced_clip_dir_path=synced_dir_path / 'Incoming',
             incoming_clip_dir_path=archiver_dir_path / 'Incoming',
             created_clip_dir_path=archiver_dir_path / 'Created',
-            archived_clip_dir_path=archiver_dir_path / 'Archived')
+            archived_clip_dir_path=archiver_dir_path / 'Archived',
+            rejected_clip_dir_path=archiver_dir_path / 'Rejected',
+            unconfirmed_clip_dir_path=archiver_dir_path / 'Unconfirmed',
+            night_dir_time_zone=night_dir_time_zone)
     
 
     def get_station_paths(station_name, recorder_names, detector_names):
@@ -182,6 +387,8 @@ def _get_paths(station_names, recorder_names, detector_names):
     return Bunch(
         archive_dir_path=_ARCHIVE_DIR_PATH,
         log_file_path=_LOG_FILE_PATH,
+        archiver_index_file_path=_ARCHIVER_INDEX_FILE_PATH,
+        archiver_journal_file_path=_ARCHIVER_JOURNAL_FILE_PATH,
         stations=station_paths)
 
 
@@ -216,7 +423,13 @@ def _get_vesper_settings():
         archive_url_base=archive_url_base,
         archive_url=archive_url,
         username=username,
-        password=password)
+        password=password,
+        clip_import_batch_size=_CLIP_IMPORT_BATCH_SIZE,
+        clip_import_concurrency=_CLIP_IMPORT_CONCURRENCY,
+        connection_pool_size=_VESPER_CONNECTION_POOL_SIZE,
+        session_file_path=_VESPER_SESSION_FILE_PATH,
+        request_compression_level=_VESPER_REQUEST_COMPRESSION_LEVEL,
+        request_timeout=_VESPER_REQUEST_TIMEOUT)
 
 
 def _get_aws_settings():
@@ -225,7 +438,11 @@ def _get_aws_settings():
         secret_access_key=env('AWS_SECRET_ACCESS_KEY'),
         region_name=env('AWS_REGION_NAME'),
         s3_clip_bucket_name=env('AWS_S3_CLIP_BUCKET_NAME'),
-        s3_clip_folder_path=env('AWS_S3_CLIP_FOLDER_PATH'))
+        s3_clip_folder_path=env('AWS_S3_CLIP_FOLDER_PATH'),
+        upload_concurrency=_S3_UPLOAD_CONCURRENCY,
+        skip_existing_uploads=_S3_SKIP_EXISTING_UPLOADS,
+        upload_bandwidth_schedule=_S3_UPLOAD_BANDWIDTH_SCHEDULE,
+        upload_bandwidth_time_zone=_STATION_TIME_ZONE)
 
 
 _detector_names = _get_detector_names()
@@ -235,6 +452,16 @@ app_settings = Bunch(
     project_name=_PROJECT_NAME,
     archive_remote=_ARCHIVE_REMOTE,
     logging_level=_LOGGING_LEVEL,
+    metadata_cache_size=_METADATA_CACHE_SIZE,
+    created_object_retention_period=_CREATED_OBJECT_RETENTION_PERIOD,
+
+    # polling
+    min_poll_period=_MIN_POLL_PERIOD,
+    max_poll_period=_MAX_POLL_PERIOD,
+    poll_backoff_factor=_POLL_BACKOFF_FACTOR,
+    dir_watch_period=_DIR_WATCH_PERIOD,
+    min_sleep_period=_MIN_SLEEP_PERIOD,
+    circuit_breaker=_CIRCUIT_BREAKER,
 
     # stations
     station_names=_STATION_NAMES,
@@ -243,6 +470,7 @@ app_settings = Bunch(
     # recordings
     recorder_names=_RECORDER_NAMES,
     recording_file_wait_period=_FILE_WAIT_PERIOD,
+    file_stability=_FILE_STABILITY,
     
     # clips
     process_old_bird_clips=_PROCESS_OLD_BIRD_CLIPS,
@@ -252,9 +480,20 @@ app_settings = Bunch(
     old_bird_clip_file_name_re=_OLD_BIRD_CLIP_FILE_NAME_RE,
     old_bird_detector_start_time=_OLD_BIRD_DETECTOR_START_TIME,
     old_bird_detector_run_time=_OLD_BIRD_DETECTOR_RUN_TIME,
+    old_bird_conversion_concurrency=_OLD_BIRD_CONVERSION_CONCURRENCY,
     old_bird_clip_device_data=_get_old_bird_clip_device_data(),
     detector_names=_detector_names,
     clip_file_wait_period=_FILE_WAIT_PERIOD,
+    pack_archived_clips=_PACK_ARCHIVED_CLIPS,
+    archived_clip_pack_delay=_ARCHIVED_CLIP_PACK_DELAY,
+    hold_clips_for_recordings=_HOLD_CLIPS_FOR_RECORDINGS,
+    clip_recording_wait_period=_CLIP_RECORDING_WAIT_PERIOD,
+    start_clip_uploads_on_creation=_START_CLIP_UPLOADS_ON_CREATION,
+    hand_off_created_clips=_HAND_OFF_CREATED_CLIPS,
+    created_clip_rescan_period=_CREATED_CLIP_RESCAN_PERIOD,
+    clip_quality_checks=_CLIP_QUALITY_CHECKS,
+    link_local_archive_clip_files=_LINK_LOCAL_ARCHIVE_CLIP_FILES,
+    local_archive_copy_concurrency=_LOCAL_ARCHIVE_COPY_CONCURRENCY,
     
     # paths
     paths=_get_paths(_STATION_NAMES, _RECORDER_NAMES, _detector_names),
@@ -1,20 +1,33 @@
 import logging
-import time
 
+from lrgv.archiver.activity_scheduler import ActivityScheduler
 from lrgv.archiver.app_settings_lighthouse import app_settings
+from lrgv.archiver.archiver_index import ArchiverIndex
 from lrgv.archiver.clip_audio_file_copier import ClipAudioFileCopier
-from lrgv.archiver.clip_audio_file_s3_uploader import ClipAudioFileS3Uploader
+from lrgv.archiver.clip_audio_file_s3_uploader import (
+    ClipAudioFileS3Uploader, ClipAudioFileUploadStarter)
 from lrgv.archiver.clip_lister import ClipLister
 from lrgv.archiver.clip_mover import ClipMover
+from lrgv.archiver.clip_quality_checker import ClipQualityChecker
 from lrgv.archiver.clip_deleter import ClipDeleter
+from lrgv.archiver.clip_handoff import ClipHandoff
+from lrgv.archiver.metadata_cache import MetadataCache
+from lrgv.archiver.night_dir_lister import NightDirLister
+from lrgv.archiver.night_dir_packer import NightDirPacker
 from lrgv.archiver.old_bird_clip_converter import OldBirdClipConverter
 from lrgv.archiver.old_bird_clip_deleter import OldBirdClipDeleter
 from lrgv.archiver.recording_lister import RecordingLister
 from lrgv.archiver.recording_mover import RecordingMover
+from lrgv.archiver.s3_client_factory import get_s3_client
+from lrgv.archiver.s3_transfer_pool import S3TransferPool
+from lrgv.archiver.transition_journal import TransitionJournal
+from lrgv.archiver.vesper_client import VesperClient
 from lrgv.archiver.vesper_clip_creator import VesperClipCreator
 from lrgv.archiver.vesper_recording_creator import VesperRecordingCreator
 from lrgv.dataflow import Graph, LinearGraph
 from lrgv.util.bunch import Bunch
+from lrgv.util.circuit_breaker import CircuitBreakerRegistry
+from lrgv.util.file_copier import FileCopier
 import lrgv.util.logging_utils as logging_utils
 
 
@@ -54,13 +67,15 @@ Archiver (e.g. LRGV)
             RecordingMetadataArchiver
                 RecordingLister
                 VesperRecordingCreator
-        OldBirdClipConverter
+        OldBirdClipArchiver
+            OldBirdClipConverter or OldBirdClipDeleter
         ClipArchiver (e.g. Dick or Nighthawk)
             SyncedClipMover
                 ClipLister
                 ClipMover
             ClipMetadataArchiver
                 ClipLister
+                ClipQualityChecker (if clip quality checks are enabled)
                 VesperClipCreator
             ClipAudioFileS3Archiver
                 ClipLister
@@ -70,6 +85,9 @@ Archiver (e.g. LRGV)
                 ClipLister
                 ClipAudioFileCopier
                 ClipMover
+            ArchivedClipPacker (if archived clips are packed)
+                NightDirLister
+                NightDirPacker
 '''
 
 
@@ -79,20 +97,129 @@ def main():
     logging_utils.configure_logging(s.logging_level, s.paths.log_file_path)
 
     archiver = create_archiver()
+    services = archiver.settings.services
+
+    file_counts = None
 
     while True:
-        logger.info('Looking for new recordings and clips to archive...')
+
+        logger.debug('Looking for new recordings and clips to archive...')
         archiver.process()
-        time.sleep(5)
+
+        file_counts = _log_file_counts(services, file_counts)
+        _log_metadata_cache_stats(services)
+
+        # Sleep until some station recorder or detector is due to be
+        # processed again. See the `ActivityScheduler` class for details.
+        services.scheduler.sleep()
+
+
+def _log_file_counts(services, previous_counts):
+
+    """
+    Logs archiver file counts by stage if they have changed since they
+    were last logged, and returns the current counts.
+    """
+
+    if services.index is None:
+        return None
+
+    counts = services.index.get_file_counts()
+
+    if len(counts) != 0 and counts != previous_counts:
+        text = ', '.join(f'{s} {c}' for s, c in counts.items())
+        logger.info(f'Archiver file counts by stage: {text}.')
+
+    return counts
+
+
+def _log_metadata_cache_stats(services):
+
+    cache = services.metadata_cache
+
+    if cache is not None:
+        logger.debug(
+            f'Metadata cache has {cache.entry_count} entries totaling '
+            f'{cache.size} bytes, with {cache.hit_count} hits, '
+            f'{cache.miss_count} misses, and {cache.eviction_count} '
+            f'evictions so far.')
 
 
 def create_archiver():
-    archiver = Archiver(name=app_settings.project_name)
+    settings = Bunch(services=_create_services())
+    archiver = Archiver(settings, name=app_settings.project_name)
     archiver.connect()
     archiver.start()
     return archiver
 
 
+def _create_services():
+
+    """
+    Creates objects that are shared by the processors of an archiver.
+    """
+
+    s = app_settings
+
+    if s.paths.archiver_index_file_path is None:
+        index = None
+    else:
+        index = ArchiverIndex(s.paths.archiver_index_file_path)
+
+    if s.paths.archiver_journal_file_path is None:
+        journal = None
+    else:
+        journal = TransitionJournal(
+            s.paths.archiver_journal_file_path,
+            s.created_object_retention_period)
+
+    if s.metadata_cache_size is None:
+        metadata_cache = None
+    else:
+        metadata_cache = MetadataCache(s.metadata_cache_size)
+
+    scheduler = ActivityScheduler(
+        s.min_poll_period, s.max_poll_period, s.poll_backoff_factor,
+        s.dir_watch_period, s.min_sleep_period)
+
+    # When a remote service becomes available again after an outage,
+    # immediately resume the processing that its outage blocked.
+    b = s.circuit_breaker
+    circuit_breakers = CircuitBreakerRegistry(
+        failure_threshold=b.failure_threshold,
+        min_open_period=b.min_open_period,
+        max_open_period=b.max_open_period,
+        backoff_factor=b.backoff_factor,
+        jitter=b.jitter,
+        on_close=scheduler.unblock)
+
+    vesper_client = VesperClient(s.vesper, circuit_breakers.get('Vesper'))
+
+    if s.archive_remote:
+
+        # Create the shared S3 client now rather than when the first
+        # clip is uploaded, so that the cost of loading the S3 service
+        # model is paid once, at startup.
+        get_s3_client(s.aws)
+
+        s3_transfer_pool = S3TransferPool(s.aws)
+        file_copier = None
+
+    else:
+        s3_transfer_pool = None
+        file_copier = FileCopier(s.link_local_archive_clip_files)
+
+    return Bunch(
+        index=index,
+        journal=journal,
+        metadata_cache=metadata_cache,
+        scheduler=scheduler,
+        circuit_breakers=circuit_breakers,
+        vesper_client=vesper_client,
+        s3_transfer_pool=s3_transfer_pool,
+        file_copier=file_copier)
+
+
 class Archiver(Graph):
      
 
@@ -103,7 +230,9 @@ class Archiver(Graph):
     
 
     def _create_station_archiver(self, station_name):
-        settings = Bunch(station_name=station_name)
+        settings = Bunch(
+            station_name=station_name,
+            services=self.settings.services)
         return StationArchiver(settings, self, station_name)
 
 
@@ -134,18 +263,9 @@ class StationArchiver(Graph):
 
         if app_settings.process_old_bird_clips:
 
-            if app_settings.delete_old_bird_clips:
-
-                # Delete Old Bird detector clips that appear in a station's
-                # SugarSync directory without archiving them.
-                processor = self._create_old_bird_clip_deleter()
-
-            else:
-
-                # Move Old Bird detector clips that appear in a station's
-                # SugarSync directory to the detector's  `Incoming` clip
-                # directory, and add an accompanying clip metadata file.
-                processor = self._create_old_bird_clip_converter()
+            # Convert or delete Old Bird detector clips that appear in
+            # the station's SugarSync directory.
+            processor = OldBirdClipArchiver(self.settings, self)
 
             processors = (processor, *processors)
     
@@ -162,7 +282,10 @@ class StationArchiver(Graph):
         settings = Bunch(
             recorder_paths=recorder_paths,
             recording_file_wait_period=s.recording_file_wait_period,
-            vesper=s.vesper)
+            file_stability=s.file_stability,
+            station_time_zone=s.station_time_zone,
+            vesper=s.vesper,
+            services=self.settings.services)
 
         return RecordingArchiver(settings, self, recorder_name)
     
@@ -178,7 +301,10 @@ class StationArchiver(Graph):
             archive_remote=s.archive_remote,
             detector_paths=detector_paths,
             clip_file_wait_period=s.clip_file_wait_period,
-            vesper=s.vesper)
+            file_stability=s.file_stability,
+            recording_hold=self._get_recording_hold(detector_name),
+            vesper=s.vesper,
+            services=self.settings.services)
         
         if s.archive_remote:
             settings.aws = s.aws
@@ -188,6 +314,27 @@ class StationArchiver(Graph):
         return ClipArchiver(settings, self, name)
 
 
+    def _get_recording_hold(self, detector_name):
+
+        """
+        Gets the settings with which a clip creator holds back clips
+        until their recordings have been created, or `None` if the
+        creator should not hold back clips.
+        """
+
+        s = app_settings
+
+        # We do not hold back Old Bird detector clips since their
+        # recordings are not archived separately.
+        if not s.hold_clips_for_recordings or \
+                detector_name == s.old_bird_short_detector_name:
+            return None
+
+        return Bunch(
+            time_zone=s.station_time_zone,
+            wait_period=s.clip_recording_wait_period)
+
+
     def _create_clip_deleter(self, detector_name):
             
             s = app_settings
@@ -200,7 +347,35 @@ class StationArchiver(Graph):
                 clip_file_wait_period=s.clip_file_wait_period)
                 
             return ClipDeleter(settings, self)
-        
+
+
+class OldBirdClipArchiver(Graph):
+
+
+    def _create_processors(self):
+
+        s = self.settings
+        station_paths = app_settings.paths.stations[s.station_name]
+
+        # Wake up when new files appear in our synced station directory.
+        s.services.scheduler.watch(
+            self.path, station_paths.synced_station_dir_path)
+
+        if app_settings.delete_old_bird_clips:
+
+            # Delete Old Bird detector clips that appear in the station's
+            # SugarSync directory without archiving them.
+            processor = self._create_old_bird_clip_deleter()
+
+        else:
+
+            # Move Old Bird detector clips that appear in the station's
+            # SugarSync directory to the detector's  `Incoming` clip
+            # directory, and add an accompanying clip metadata file.
+            processor = self._create_old_bird_clip_converter()
+
+        return (processor,)
+
 
     def _create_old_bird_clip_deleter(self):
             
@@ -211,7 +386,8 @@ class StationArchiver(Graph):
             settings = Bunch(
                 source_clip_dir_path=station_paths.synced_station_dir_path,
                 clip_file_name_re=app_settings.old_bird_clip_file_name_re,
-                clip_file_wait_period=s.clip_file_wait_period)
+                clip_file_wait_period=s.clip_file_wait_period,
+                scheduler=self.settings.services.scheduler)
                 
             return OldBirdClipDeleter(settings, self)
     
@@ -235,18 +411,49 @@ class StationArchiver(Graph):
                 clip_file_name_re=s.old_bird_clip_file_name_re,
                 detector_start_time=s.old_bird_detector_start_time,
                 detector_run_time=s.old_bird_detector_run_time,
+                conversion_concurrency=s.old_bird_conversion_concurrency,
                 clip_file_wait_period=s.clip_file_wait_period,
                 station_paths=station_paths,
-                clip_classification=None)
+                clip_classification=None,
+                scheduler=self.settings.services.scheduler,
+                clip_archiver_key=(
+                    f'{self.parent.path}/{s.old_bird_short_detector_name}'))
                 
             return OldBirdClipConverter(settings, self)
         
 
+    def _process(self, input_data):
+
+        # Process only if we are due according to our recent activity.
+        scheduler = self.settings.services.scheduler
+        if not scheduler.is_due(self.path):
+            return {}
+        
+        scheduler.start_run(self.path)
+
+        try:
+            output_data = super()._process(input_data)
+        except Exception as e:
+            scheduler.end_run(failed=True)
+            logger.warning(
+                f'Processor "{self.path}" raised exception. Message '
+                f'was: {e}')
+        else:
+            scheduler.end_run()
+            return output_data
+
+
 class RecordingArchiver(Graph):
 
 
     def _create_processors(self):
+
         s = self.settings
+
+        # Wake up when new files appear in our synced recording directory.
+        s.services.scheduler.watch(
+            self.path, s.recorder_paths.synced_recording_dir_path)
+
         mover = SyncedRecordingMover(s, self)
         metadata_archiver = RecordingMetadataArchiver(s, self)
         return mover, metadata_archiver
@@ -254,6 +461,13 @@ class RecordingArchiver(Graph):
     
     def _process(self, input_data):
 
+        # Process only if we are due according to our recent activity.
+        scheduler = self.settings.services.scheduler
+        if not scheduler.is_due(self.path):
+            return {}
+        
+        scheduler.start_run(self.path)
+
         # If any of our subprocessors raises an exception for a recording,
         # we catch it here and log an error message. Unfortunately, this
         # doesn't allow us to process subsequent recordings for the same
@@ -261,11 +475,15 @@ class RecordingArchiver(Graph):
         # the same recording raise the same exception.
 
         try:
-            return super()._process(input_data)
+            output_data = super()._process(input_data)
         except Exception as e:
+            scheduler.end_run(failed=True)
             logger.warning(
                 f'Processor "{self.path}" raised exception. Message '
                 f'was: {e}')
+        else:
+            scheduler.end_run()
+            return output_data
             
             
 class SyncedRecordingMover(LinearGraph):
@@ -282,11 +500,19 @@ class SyncedRecordingMover(LinearGraph):
 
         settings = Bunch(
             recording_dir_path=s.recorder_paths.synced_recording_dir_path,
-            recording_file_wait_period=s.recording_file_wait_period)
+            recording_file_wait_period=s.recording_file_wait_period,
+            file_stability=s.file_stability,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            scheduler=s.services.scheduler,
+            index_stage='Synced')
         recording_lister = RecordingLister(settings, self)
 
         settings = Bunch(
-            destination_dir_path=s.recorder_paths.incoming_recording_dir_path)
+            destination_dir_path=s.recorder_paths.incoming_recording_dir_path,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            index_stage='Incoming')
         recording_mover = RecordingMover(settings, self)
 
         return recording_lister, recording_mover
@@ -301,13 +527,27 @@ class RecordingMetadataArchiver(LinearGraph):
 
         settings = Bunch(
             recording_dir_path=s.recorder_paths.incoming_recording_dir_path,
-            recording_file_wait_period=s.recording_file_wait_period)
+            recording_file_wait_period=s.recording_file_wait_period,
+            file_stability=s.file_stability,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            scheduler=s.services.scheduler,
+            index_stage='Incoming')
         recording_lister = RecordingLister(settings, self)
 
         settings = Bunch(
             vesper=s.vesper,
             archived_recording_dir_path=(
-                s.recorder_paths.archived_recording_dir_path))
+                s.recorder_paths.archived_recording_dir_path),
+            unconfirmed_recording_dir_path=(
+                s.recorder_paths.unconfirmed_recording_dir_path),
+            vesper_client=s.services.vesper_client,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            scheduler=s.services.scheduler,
+            station_time_zone=s.station_time_zone,
+            journal=s.services.journal,
+            index_stage='Archived')
         recording_creator = VesperRecordingCreator(settings, self)
 
         return recording_lister, recording_creator
@@ -320,20 +560,50 @@ class ClipArchiver(Graph):
 
         s = self.settings
 
+        # Wake up when new files appear in our synced clip directory.
+        s.services.scheduler.watch(
+            self.path, s.detector_paths.synced_clip_dir_path)
+
         settings = Bunch(
             detector_paths=s.detector_paths,
-            clip_file_wait_period=s.clip_file_wait_period)
+            clip_file_wait_period=s.clip_file_wait_period,
+            file_stability=s.file_stability,
+            services=s.services)
         
         mover = SyncedClipMover(settings, self)
 
-        metadata_archiver = ClipMetadataArchiver(s, self)
+        # If we archive clip audio files remotely, start uploading the
+        # audio file of each clip as soon as the clip is created rather
+        # than after all of the clips of this tick have been created.
+        if s.archive_remote and app_settings.start_clip_uploads_on_creation:
+            upload_starter = ClipAudioFileUploadStarter(
+                s.aws, s.services.s3_transfer_pool,
+                s.services.circuit_breakers.get('S3'))
+        else:
+            upload_starter = None
+
+        # Hand created clips to the audio file archiver in memory
+        # rather than having it find them in the created clip directory.
+        if app_settings.hand_off_created_clips:
+            self._handoff = \
+                ClipHandoff(app_settings.created_clip_rescan_period)
+        else:
+            self._handoff = None
+
+        settings = Bunch(
+            s, upload_starter=upload_starter, handoff=self._handoff)
+        metadata_archiver = ClipMetadataArchiver(settings, self)
 
         if s.archive_remote:
 
             settings = Bunch(
                 detector_paths=s.detector_paths,
                 clip_file_wait_period=s.clip_file_wait_period,
-                aws=s.aws)
+                file_stability=s.file_stability,
+                aws=s.aws,
+                upload_starter=upload_starter,
+                handoff=self._handoff,
+                services=s.services)
             
             audio_file_archiver = ClipAudioFileS3Archiver(settings, self)
             
@@ -343,15 +613,37 @@ class ClipArchiver(Graph):
             settings = Bunch(
                 detector_paths=s.detector_paths,
                 clip_file_wait_period=s.clip_file_wait_period,
-                archive_dir_path=app_settings.paths.archive_dir_path)
+                file_stability=s.file_stability,
+                archive_dir_path=app_settings.paths.archive_dir_path,
+                handoff=self._handoff,
+                services=s.services)
             
             audio_file_archiver = ClipAudioFileLocalArchiver(settings, self)
 
-        return mover, metadata_archiver, audio_file_archiver
+        processors = [mover, metadata_archiver, audio_file_archiver]
+
+        if app_settings.pack_archived_clips and \
+                s.detector_paths.night_dir_time_zone is not None:
+
+            settings = Bunch(
+                detector_paths=s.detector_paths,
+                pack_delay=app_settings.archived_clip_pack_delay,
+                services=s.services)
+            
+            processors.append(ArchivedClipPacker(settings, self))
+
+        return processors
 
     
     def _process(self, input_data):
 
+        # Process only if we are due according to our recent activity.
+        scheduler = self.settings.services.scheduler
+        if not scheduler.is_due(self.path):
+            return {}
+        
+        scheduler.start_run(self.path)
+
         # If any of our subprocessors raises an exception for a clip,
         # we catch it here and log an error message. Unfortunately, this
         # doesn't allow us to process subsequent clips for the same
@@ -359,12 +651,46 @@ class ClipArchiver(Graph):
         # the same clip raise the same exception.
 
         try:
-            return super()._process(input_data)
+            output_data = super()._process(input_data)
         except Exception as e:
+            scheduler.end_run(failed=True)
             logger.warning(
                 f'Processor "{self.path}" raised exception. Message '
                 f'was: {e}')
 
+            # Clips may have been left in the created clip directory
+            # without being handed off.
+            if self._handoff is not None:
+                self._handoff.request_scan()
+
+        else:
+            scheduler.end_run()
+            return output_data
+
+
+class ArchivedClipPacker(LinearGraph):
+
+    """
+    Packs the archived clip files of nights that ended at least a
+    certain number of nights ago into clip containers.
+    """
+
+    def _create_processors(self):
+
+        s = self.settings
+
+        settings = Bunch(
+            dir_path=s.detector_paths.archived_clip_dir_path,
+            time_zone=s.detector_paths.night_dir_time_zone,
+            min_night_age=s.pack_delay)
+        night_dir_lister = NightDirLister(settings, self)
+
+        settings = Bunch(
+            index=s.services.index)
+        night_dir_packer = NightDirPacker(settings, self)
+
+        return night_dir_lister, night_dir_packer
+
 
 class SyncedClipMover(LinearGraph):
 
@@ -379,11 +705,20 @@ class SyncedClipMover(LinearGraph):
 
         settings = Bunch(
             clip_dir_path=s.detector_paths.synced_clip_dir_path,
-            clip_file_wait_period=s.clip_file_wait_period)
+            clip_file_wait_period=s.clip_file_wait_period,
+            file_stability=s.file_stability,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            scheduler=s.services.scheduler,
+            index_stage='Synced')
         clip_lister = ClipLister(settings, self)
 
         settings = Bunch(
-            destination_dir_path=s.detector_paths.incoming_clip_dir_path)
+            destination_dir_path=s.detector_paths.incoming_clip_dir_path,
+            night_dir_time_zone=s.detector_paths.night_dir_time_zone,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            index_stage='Incoming')
         clip_mover = ClipMover(settings, self)
 
         return clip_lister, clip_mover
@@ -398,15 +733,45 @@ class ClipMetadataArchiver(LinearGraph):
 
         settings = Bunch(
             clip_dir_path=s.detector_paths.incoming_clip_dir_path,
-            clip_file_wait_period=s.clip_file_wait_period)
+            night_dir_time_zone=s.detector_paths.night_dir_time_zone,
+            clip_file_wait_period=s.clip_file_wait_period,
+            file_stability=s.file_stability,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            scheduler=s.services.scheduler,
+            index_stage='Incoming')
         clip_lister = ClipLister(settings, self)
 
+        processors = [clip_lister]
+
+        checks = app_settings.clip_quality_checks
+        if checks is not None:
+            settings = Bunch(
+                checks,
+                rejected_clip_dir_path=s.detector_paths.rejected_clip_dir_path,
+                index=s.services.index,
+                metadata_cache=s.services.metadata_cache,
+                index_stage='Rejected')
+            processors.append(ClipQualityChecker(settings, self))
+
         settings = Bunch(
             vesper=s.vesper,
-            created_clip_dir_path=s.detector_paths.created_clip_dir_path)
-        clip_creator = VesperClipCreator(settings, self)
+            created_clip_dir_path=s.detector_paths.created_clip_dir_path,
+            unconfirmed_clip_dir_path=(
+                s.detector_paths.unconfirmed_clip_dir_path),
+            vesper_client=s.services.vesper_client,
+            night_dir_time_zone=s.detector_paths.night_dir_time_zone,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            scheduler=s.services.scheduler,
+            recording_hold=s.recording_hold,
+            upload_starter=s.upload_starter,
+            handoff=s.handoff,
+            journal=s.services.journal,
+            index_stage='Created')
+        processors.append(VesperClipCreator(settings, self))
 
-        return clip_lister, clip_creator
+        return processors
 
 
 class ClipAudioFileS3Archiver(LinearGraph):
@@ -418,14 +783,32 @@ class ClipAudioFileS3Archiver(LinearGraph):
 
         settings = Bunch(
             clip_dir_path=s.detector_paths.created_clip_dir_path,
-            clip_file_wait_period=s.clip_file_wait_period)
+            night_dir_time_zone=s.detector_paths.night_dir_time_zone,
+            clip_file_wait_period=s.clip_file_wait_period,
+            file_stability=s.file_stability,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            scheduler=s.services.scheduler,
+            index_stage='Created',
+            drop_metadata=True,
+            handoff=s.handoff)
         clip_lister = ClipLister(settings, self)
 
-        settings = Bunch(aws=s.aws)
+        settings = Bunch(
+            aws=s.aws,
+            transfer_pool=s.services.s3_transfer_pool,
+            circuit_breaker=s.services.circuit_breakers.get('S3'),
+            scheduler=s.services.scheduler,
+            upload_starter=s.upload_starter,
+            handoff=s.handoff)
         audio_file_uploader = ClipAudioFileS3Uploader(settings, self)
 
         settings = Bunch(
-            destination_dir_path=s.detector_paths.archived_clip_dir_path)
+            destination_dir_path=s.detector_paths.archived_clip_dir_path,
+            night_dir_time_zone=s.detector_paths.night_dir_time_zone,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            index_stage='Archived')
         clip_mover = ClipMover(settings, self)
 
         return clip_lister, audio_file_uploader, clip_mover
@@ -440,14 +823,29 @@ class ClipAudioFileLocalArchiver(LinearGraph):
 
         settings = Bunch(
             clip_dir_path=s.detector_paths.created_clip_dir_path,
-            clip_file_wait_period=s.clip_file_wait_period)
+            night_dir_time_zone=s.detector_paths.night_dir_time_zone,
+            clip_file_wait_period=s.clip_file_wait_period,
+            file_stability=s.file_stability,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            scheduler=s.services.scheduler,
+            index_stage='Created',
+            drop_metadata=True,
+            handoff=s.handoff)
         clip_lister = ClipLister(settings, self)
 
-        settings = Bunch(archive_dir_path=s.archive_dir_path)
+        settings = Bunch(
+            archive_dir_path=s.archive_dir_path,
+            file_copier=s.services.file_copier,
+            copy_concurrency=app_settings.local_archive_copy_concurrency)
         audio_file_copier = ClipAudioFileCopier(settings, self)
 
         settings = Bunch(
-            destination_dir_path=s.detector_paths.archived_clip_dir_path)
+            destination_dir_path=s.detector_paths.archived_clip_dir_path,
+            night_dir_time_zone=s.detector_paths.night_dir_time_zone,
+            index=s.services.index,
+            metadata_cache=s.services.metadata_cache,
+            index_stage='Archived')
         clip_mover = ClipMover(settings, self)
 
         return clip_lister, audio_file_copier, clip_mover
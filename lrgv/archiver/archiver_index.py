@@ -0,0 +1,424 @@
+"""
+Persistent SQLite index of the files of archiver directories.
+
+The index records every file that the archiver's clip and recording
+listers see, along with the file's size, last modification time, the
+time at which the file was first seen, and the archiver *stage* (e.g.
+"Incoming", "Created", or "Archived") of the directory that contains
+it. For clip and recording metadata files it also records the station
+name, start time, and serial number parsed from the file name.
+
+The index also records the last modification time of each directory
+it has reconciled against. A lister can use that to avoid listing a
+directory whose set of files has not changed since the previous tick,
+and instead get the directory's files from the index. Since the index
+persists across archiver runs, this also holds for the first tick
+after a restart.
+
+Finally, the index records the recordings that the archiver has created
+in the Vesper archive, so that the archiver can hold back the clips of
+a recording until the recording has been created.
+"""
+
+
+from pathlib import Path
+import sqlite3
+import threading
+import time
+
+from lrgv.archiver.archiver_error import ArchiverError
+from lrgv.util.file_utils import FileInfo
+import lrgv.util.file_utils as file_utils
+
+
+_CREATE_TABLES_SQL = '''
+    CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        dir_path TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        station_name TEXT,
+        start_time TEXT,
+        serial_num INTEGER,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        first_seen_time REAL NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS files_dir_path ON files (dir_path);
+
+    CREATE TABLE IF NOT EXISTS dirs (
+        path TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS recordings (
+        station_name TEXT NOT NULL,
+        recorder_name TEXT NOT NULL,
+        night TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        recording_id INTEGER,
+        PRIMARY KEY (station_name, recorder_name, start_time)
+    );
+
+    CREATE INDEX IF NOT EXISTS recordings_night
+        ON recordings (station_name, recorder_name, night);
+'''
+
+# We do not trust a directory modification time that is more recent
+# than this, since on some file systems modification times have a
+# resolution as coarse as a second or two, so a file might be added to
+# a directory after it is scanned but without changing its modification
+# time.
+_MIN_DIR_AGE = 2 * 1_000_000_000            # nanoseconds
+
+_UPSERT_FILE_SQL = '''
+    INSERT INTO files (
+        path, dir_path, stage, station_name, start_time, serial_num,
+        size, mtime_ns, first_seen_time)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (path) DO UPDATE SET
+        dir_path = excluded.dir_path,
+        stage = excluded.stage,
+        station_name = excluded.station_name,
+        start_time = excluded.start_time,
+        serial_num = excluded.serial_num,
+        size = excluded.size,
+        mtime_ns = excluded.mtime_ns
+'''
+
+
+class ArchiverIndex:
+
+
+    def __init__(self, file_path):
+
+        self._file_path = Path(file_path)
+
+        try:
+            self._file_path.parent.mkdir(
+                mode=0o755, parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(
+                self._file_path, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode = WAL')
+            self._connection.execute('PRAGMA synchronous = NORMAL')
+            self._connection.executescript(_CREATE_TABLES_SQL)
+        except Exception as e:
+            raise ArchiverError(
+                f'Could not open archiver index "{self._file_path}". '
+                f'Error message was: {e}')
+
+        # The index may be used by more than one thread, for example
+        # by processors that do some of their work in thread pools.
+        self._lock = threading.Lock()
+
+
+    @property
+    def file_path(self):
+        return self._file_path
+
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+    def list_dir(self, dir_path, stage, get_name_fields, refresh_period=None):
+
+        """
+        Gets `FileInfo` objects for the files of a directory.
+
+        If the directory has not changed since it was last reconciled,
+        this method gets the files from the index instead of listing
+        the directory, refreshing the sizes and modification times of
+        only those files that were modified within the last
+        `refresh_period` seconds. Otherwise it lists the directory and
+        reconciles the index with the result.
+
+        Parameters
+        ----------
+        dir_path : Path
+            the directory path.
+
+        stage : str
+            the archiver stage of the directory, e.g. "Incoming".
+
+        get_name_fields : Callable[[str], Bunch | None]
+            function that gets name fields from a file name. See the
+            `reconcile` method for details.
+
+        refresh_period : float | None
+            the period in seconds for which recently modified files'
+            sizes and modification times are refreshed, or `None` if
+            they should not be refreshed.
+        """
+
+        dir_mtime_ns = file_utils.get_mtime_ns(dir_path)
+
+        if self.is_dir_unchanged(dir_path, dir_mtime_ns) and \
+                time.time_ns() - dir_mtime_ns >= _MIN_DIR_AGE:
+
+            files = self.get_dir_files(dir_path)
+
+            if refresh_period is not None:
+                files = self._refresh_recent_files(files, refresh_period)
+
+        else:
+
+            files = file_utils.scan_dir(dir_path)
+
+            self.reconcile(
+                dir_path, dir_mtime_ns, stage,
+                ((f, get_name_fields(f.path.name)) for f in files))
+
+        return files
+
+
+    def _refresh_recent_files(self, files, refresh_period):
+
+        threshold = time.time_ns() - int(refresh_period * 1_000_000_000)
+
+        refreshed_files = []
+        updated_files = []
+
+        for f in files:
+
+            if f.mtime_ns >= threshold:
+                # file modified recently
+
+                try:
+                    stat = f.path.stat()
+                except FileNotFoundError:
+                    continue
+
+                if stat.st_size != f.size or stat.st_mtime_ns != f.mtime_ns:
+                    f = FileInfo(f.path, stat.st_size, stat.st_mtime_ns)
+                    updated_files.append(f)
+
+            refreshed_files.append(f)
+
+        if len(updated_files) != 0:
+            self.update_files(updated_files)
+
+        return tuple(refreshed_files)
+
+
+    def is_dir_unchanged(self, dir_path, dir_mtime_ns):
+
+        """
+        Determines whether or not the specified directory has the
+        specified modification time as of its last reconciliation.
+        """
+
+        if dir_mtime_ns is None:
+            return False
+
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT mtime_ns FROM dirs WHERE path = ?',
+                (str(dir_path),)).fetchone()
+
+        return row is not None and row[0] == dir_mtime_ns
+
+
+    def get_dir_files(self, dir_path):
+
+        """Gets `FileInfo` objects for the indexed files of a directory."""
+
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT path, size, mtime_ns FROM files WHERE dir_path = ? '
+                'ORDER BY path',
+                (str(dir_path),)).fetchall()
+
+        return tuple(FileInfo(Path(p), s, m) for p, s, m in rows)
+
+
+    def reconcile(self, dir_path, dir_mtime_ns, stage, files):
+
+        """
+        Reconciles the index with the current contents of a directory.
+
+        Parameters
+        ----------
+        dir_path : Path
+            the directory path.
+
+        dir_mtime_ns : int | None
+            the last modification time of the directory, or `None`
+            if the directory does not exist.
+
+        stage : str
+            the archiver stage of the directory, e.g. "Incoming".
+
+        files : Iterable[tuple[FileInfo, Bunch | None]]
+            (file info, name fields) pairs for the files of the
+            directory. The name fields are `None` for files that are
+            not clip or recording metadata files. Otherwise they have
+            `station_name`, `start_time`, and `serial_num` attributes,
+            the last of which may be `None`.
+        """
+
+        dir_path = str(dir_path)
+        now = time.time()
+
+        def get_row(file, fields):
+            if fields is None:
+                station_name = start_time = serial_num = None
+            else:
+                station_name = fields.station_name
+                start_time = fields.start_time
+                serial_num = fields.serial_num
+            return (
+                str(file.path), dir_path, stage, station_name, start_time,
+                serial_num, file.size, file.mtime_ns, now)
+
+        rows = [get_row(file, fields) for file, fields in files]
+        paths = frozenset(r[0] for r in rows)
+
+        with self._lock, self._connection as c:
+
+            # Delete files that are no longer in the directory.
+            indexed_paths = c.execute(
+                'SELECT path FROM files WHERE dir_path = ?',
+                (dir_path,)).fetchall()
+            c.executemany(
+                'DELETE FROM files WHERE path = ?',
+                ((p,) for (p,) in indexed_paths if p not in paths))
+
+            c.executemany(_UPSERT_FILE_SQL, rows)
+
+            if dir_mtime_ns is None:
+                c.execute('DELETE FROM dirs WHERE path = ?', (dir_path,))
+            else:
+                c.execute(
+                    'INSERT OR REPLACE INTO dirs (path, mtime_ns) '
+                    'VALUES (?, ?)', (dir_path, dir_mtime_ns))
+
+
+    def update_files(self, files):
+
+        """Updates the sizes and modification times of indexed files."""
+
+        with self._lock, self._connection as c:
+            c.executemany(
+                'UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?',
+                ((f.size, f.mtime_ns, str(f.path)) for f in files))
+
+
+    def record_move(self, old_path, new_path, stage):
+
+        """
+        Records that a file has been moved, possibly to a directory of
+        another stage.
+
+        Moving a file preserves its name fields and first-seen time.
+        If the file is not already indexed, a new entry is created for
+        it without name fields.
+        """
+
+        new_path = Path(new_path)
+
+        try:
+            stat = new_path.stat()
+        except FileNotFoundError:
+            return
+
+        with self._lock, self._connection as c:
+
+            # Delete any stale entry for the new path.
+            c.execute('DELETE FROM files WHERE path = ?', (str(new_path),))
+
+            cursor = c.execute(
+                'UPDATE files SET path = ?, dir_path = ?, stage = ?, '
+                'size = ?, mtime_ns = ? WHERE path = ?',
+                (str(new_path), str(new_path.parent), stage, stat.st_size,
+                 stat.st_mtime_ns, str(old_path)))
+
+            if cursor.rowcount == 0:
+                c.execute(
+                    _UPSERT_FILE_SQL,
+                    (str(new_path), str(new_path.parent), stage, None, None,
+                     None, stat.st_size, stat.st_mtime_ns, time.time()))
+
+
+    def record_deletions(self, paths):
+
+        """Records that files have been deleted."""
+
+        with self._lock, self._connection as c:
+            c.executemany(
+                'DELETE FROM files WHERE path = ?',
+                ((str(p),) for p in paths))
+
+
+    def record_recording(
+            self, station_name, recorder_name, night, start_time,
+            recording_id):
+
+        """
+        Records that a recording has been created in the Vesper archive.
+
+        Parameters
+        ----------
+        station_name : str
+            the recording's station name.
+
+        recorder_name : str
+            the recording's recorder name.
+
+        night : date
+            the recording's night.
+
+        start_time : datetime
+            the recording's start time.
+
+        recording_id : int | None
+            the recording's Vesper archive ID.
+        """
+
+        with self._lock, self._connection as c:
+            c.execute(
+                'INSERT OR REPLACE INTO recordings (station_name, '
+                'recorder_name, night, start_time, recording_id) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (station_name, recorder_name, str(night),
+                 start_time.isoformat(), recording_id))
+
+
+    def get_recording_start_times(self, station_name, recorder_name, night):
+
+        """
+        Gets the start times of the recorded recordings of the specified
+        station, recorder, and night, as a set of ISO 8601 strings.
+        """
+
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT start_time FROM recordings WHERE station_name = ? '
+                'AND recorder_name = ? AND night = ?',
+                (station_name, recorder_name, str(night))).fetchall()
+
+        return frozenset(r[0] for r in rows)
+
+
+    def get_file_counts(self, station_name=None):
+
+        """
+        Gets a mapping from stage to number of indexed clip and recording
+        metadata files in that stage, optionally for a single station.
+        """
+
+        sql = (
+            'SELECT stage, COUNT(*) FROM files '
+            'WHERE station_name IS NOT NULL')
+
+        args = ()
+
+        if station_name is not None:
+            sql += ' AND station_name = ?'
+            args = (station_name,)
+
+        sql += ' GROUP BY stage ORDER BY stage'
+
+        with self._lock:
+            return dict(self._connection.execute(sql, args).fetchall())
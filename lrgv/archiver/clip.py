@@ -5,11 +5,19 @@ a WAVE audio file.
 The metadata file format provides for the description of metadata for
 any number of clips, but this class assumes that each file describes
 exactly one clip.
+
+The archiver can have many clips in flight at once, for example when
+it works through a large backlog, so this class is designed to be
+compact. It uses slots, parses its metadata fields just once, when they
+are first needed, and interns strings that are repeated across many
+clips. It can also optionally drop its reference to the parsed contents
+of its metadata file after extracting its fields from them.
 """
 
 
 from datetime import datetime as DateTime
 import json
+import sys
 
 
 _AUDIO_FILE_NAME_EXTENSION = '.wav'
@@ -18,96 +26,192 @@ _AUDIO_FILE_NAME_EXTENSION = '.wav'
 class Clip:
 
 
-    def __init__(self, metadata_file_path):
+    __slots__ = (
+        '_metadata_file_path', '_metadata_cache', '_drop_metadata',
+        '_metadata_file_contents', '_fields_parsed', '_id',
+        '_station_name', '_mic_output_name', '_detector_name',
+        '_start_time', '_serial_num', '_length', '_classification',
+        '_audio_file_contents')
+
+
+    def __init__(
+            self, metadata_file_path, metadata_cache=None,
+            drop_metadata=False, metadata_file_contents=None):
+
+        """
+        Initializes this clip.
+
+        Parameters
+        ----------
+        metadata_file_path : Path
+            the path of the clip's metadata file.
+
+        metadata_cache : MetadataCache | None
+            cache from which to get the parsed contents of the clip's
+            metadata file, or `None` to read the file directly.
+
+        drop_metadata : bool
+            `True` if and only if this clip should not retain the parsed
+            contents of its metadata file after extracting its fields
+            from them. The contents are loaded again if they are needed
+            after that.
+
+        metadata_file_contents : dict | None
+            the parsed contents of the clip's metadata file if they are
+            already at hand, for example since the caller just wrote
+            the file, or `None` to load them when they are needed.
+        """
+
         self._metadata_file_path = metadata_file_path
-        self._metadata_file_contents = None
+        self._metadata_cache = metadata_cache
+        self._drop_metadata = drop_metadata
+        self._metadata_file_contents = metadata_file_contents
+        self._fields_parsed = False
         self._audio_file_contents = None
 
 
     @property
     def metadata_file_path(self):
         return self._metadata_file_path
-    
+
 
     @property
     def metadata_file_contents(self):
 
-        if self._metadata_file_contents is None:
-            with open(self.metadata_file_path, newline='') as file:
-                self._metadata_file_contents = json.load(file)
+        contents = self._metadata_file_contents
 
-        return self._metadata_file_contents
+        if contents is None:
 
- 
-    @property
-    def _clip_metadata(self):
-       return self.metadata_file_contents['clips'][0]
+            contents = self._load_metadata_file_contents()
+
+            # Retain the contents unless we drop them and have already
+            # parsed our fields, in which case `_parse_fields` will not
+            # drop them for us.
+            if not self._drop_metadata or not self._fields_parsed:
+                self._metadata_file_contents = contents
+
+        return contents
+
+
+    def _load_metadata_file_contents(self):
+
+        if self._metadata_cache is None:
+            return _load_metadata_file(self.metadata_file_path)
+
+        else:
+            # Note that the cached contents are shared with other
+            # objects for the same file, so they must not be
+            # modified without first evicting them from the cache.
+            return self._metadata_cache.get(
+                self.metadata_file_path, _load_metadata_file)
+
+
+    def _parse_fields(self):
+
+        contents = self._metadata_file_contents
+        if contents is None:
+            contents = self._load_metadata_file_contents()
+
+        metadata = contents['clips'][0]
+
+        # Not every clip metadata file includes a clip ID, detector name,
+        # serial number, or `Classification` annotation, so we use `None`
+        # for those when they are absent.
+
+        self._id = metadata.get('id')
+        self._station_name = sys.intern(metadata['station'])
+        self._mic_output_name = sys.intern(metadata['mic_output'])
+        self._detector_name = _intern(metadata.get('detector'))
+        self._start_time = _parse_start_time(metadata['start_time'])
+
+        serial_num = metadata.get('serial_num')
+        self._serial_num = None if serial_num is None else int(serial_num)
+
+        self._length = int(metadata['length'])
+        self._classification = _intern(
+            metadata.get('annotations', {}).get('Classification'))
+
+        # Drop the contents if indicated, including contents that were
+        # passed to the initializer or loaded by the
+        # `metadata_file_contents` property before we got here.
+        if self._drop_metadata:
+            self._metadata_file_contents = None
+        else:
+            self._metadata_file_contents = contents
+
+        self._fields_parsed = True
 
 
     @property
     def id(self):
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._id
+
+
+    @id.setter
+    def id(self, id):
+
+        # Parse fields first so parsing does not overwrite the new ID.
+        if not self._fields_parsed:
+            self._parse_fields()
+
+        self._id = id
 
-        # Not every clip metadata file includes a clip ID, so we
-        # return `None` when it is absent.
-        try:
-            return self._clip_metadata['id']
-        except KeyError:
-            return None
-            
 
     @property
     def station_name(self):
-        return self._clip_metadata['station']
-    
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._station_name
+
 
     @property
     def mic_output_name(self):
-        return self._clip_metadata['mic_output']
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._mic_output_name
 
 
     @property
-    def start_time(self):
+    def detector_name(self):
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._detector_name
 
-        # Get start time in ISO 8601 format.
-        date, time, tz = self._clip_metadata['start_time'].split()
-        start_time = f'{date}T{time}{tz}'
 
-        return DateTime.fromisoformat(start_time)
+    @property
+    def start_time(self):
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._start_time
 
 
     @property
     def serial_num(self):
-
-        # Not every clip metadata file includes a clip serial number,
-        # so we return `None` when it is absent.
-        try:
-            serial_num = self._clip_metadata['serial_num']
-        except KeyError:
-            return None
-        
-        return int(serial_num)
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._serial_num
 
 
     @property
     def length(self):
-        return int(self._clip_metadata['length'])
-    
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._length
+
 
     @property
     def classification(self):
-
-        # Not every clip will have a `Classification` annotation, so
-        # we return `None` when it is absent.
-        try:
-            return self._clip_metadata['annotations']['Classification']
-        except KeyError:
-            return None
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._classification
 
 
     @property
     def audio_file_path(self):
         return self.metadata_file_path.with_suffix(_AUDIO_FILE_NAME_EXTENSION)
-    
+
 
     @property
     def audio_file_contents(self):
@@ -117,3 +221,21 @@ class Clip:
                 self._audio_file_contents = file.read()
 
         return self._audio_file_contents
+
+
+def _load_metadata_file(file_path):
+    with open(file_path, newline='') as file:
+        return json.load(file)
+
+
+def _intern(s):
+    return None if s is None else sys.intern(s)
+
+
+def _parse_start_time(start_time):
+
+    # Get start time in ISO 8601 format.
+    date, time, tz = start_time.split()
+    start_time = f'{date}T{time}{tz}'
+
+    return DateTime.fromisoformat(start_time)
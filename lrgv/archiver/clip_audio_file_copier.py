@@ -1,19 +1,88 @@
 """
-Processor that copies a clip audio file into a Vesper archive clip directory.
+Processor that copies clip audio files into a Vesper archive clip directory.
 """
 
 
-import shutil
+from concurrent.futures import ThreadPoolExecutor
+import logging
 
 from lrgv.archiver.archiver_error import ArchiverError
 from lrgv.dataflow import SimpleProcessor
+from lrgv.util.file_copier import FileCopier
 import lrgv.util.vesper_utils as vesper_utils
 
 
+_logger = logging.getLogger(__name__)
+
+
 class ClipAudioFileCopier(SimpleProcessor):
 
 
-    def _process_item(self, clip, finished):
+    """
+    Copies clip audio files into a Vesper archive clip directory.
+
+    The copier copies files with a `FileCopier`, typically shared with
+    other copiers, which clones files with reflinks rather than copying
+    their data when it can. It copies several files at a
+    time if its `copy_concurrency` setting is more than one.
+    """
+
+
+    def __init__(self, settings, parent=None, name=None):
+
+        super().__init__(settings, parent, name)
+
+        # File copier, typically shared with other processors.
+        self._copier = settings.get('file_copier')
+        if self._copier is None:
+            self._copier = FileCopier()
+
+        # Maximum number of files to copy at once, and executor that
+        # copies them when that number is more than one.
+        self._concurrency = settings.get('copy_concurrency') or 1
+        self._executor = None
+
+
+    def _process_items(self, clips, finished):
+
+        if len(clips) == 0:
+            return ()
+
+        if self._concurrency == 1 or len(clips) == 1:
+            errors = map(self._copy_clip_audio_file, clips)
+        else:
+            errors = self._get_executor().map(
+                self._copy_clip_audio_file, clips)
+
+        failed_count = 0
+        for error in errors:
+            if error is not None:
+                _logger.error(str(error))
+                failed_count += 1
+
+        if failed_count != 0:
+            raise ArchiverError(
+                f'Processor "{self.path}" could not copy {failed_count} '
+                f'of {len(clips)} clip audio files. See log for details.')
+
+        return clips
+
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self._concurrency, thread_name_prefix=self.path)
+        return self._executor
+
+
+    def _copy_clip_audio_file(self, clip):
+
+        """
+        Copies the audio file of a clip into the archive.
+
+        Returns `None` if the copy succeeded, or an `ArchiverError` if
+        it failed.
+        """
 
         from_path = clip.audio_file_path
 
@@ -24,16 +93,16 @@ class ClipAudioFileCopier(SimpleProcessor):
         try:
             to_path.parent.mkdir(mode=0o755, parents=True, exist_ok=True)
         except Exception as e:
-            raise ArchiverError(
+            return ArchiverError(
                 f'Processor "{self.path}" could not create one or more '
                 f'parent directories for clip audio file "{to_path}". '
                 f'Error message was: {e}')
 
         try:
-            shutil.copy2(from_path, to_path)
+            self._copier.copy(from_path, to_path)
         except Exception as e:
-            raise ArchiverError(
+            return ArchiverError(
                 f'Processor "{self.path}" could not copy file '
                 f'"{from_path}" to "{to_path}". Error message was: {e}')
-        
-        return clip
+
+        return None
@@ -1,21 +1,49 @@
-"""Processor that uploads a clip audio file to an AWS S3 bucket."""
+"""Processor that uploads clip audio files to an AWS S3 bucket."""
 
 
 import logging
+import threading
+import time
 
-import boto3
-
-from lrgv.archiver.archiver_error import ArchiverError
+from lrgv.archiver.s3_transfer_pool import S3TransferPool
 from lrgv.dataflow import SimpleProcessor
+from lrgv.util.circuit_breaker import CircuitBreaker
 import lrgv.util.vesper_utils as vesper_utils
 
 
 _logger = logging.getLogger(__name__)
 
 
+# Period in seconds after which to retry clips whose uploads failed.
+_FAILED_UPLOAD_RETRY_PERIOD = 60
+
+# Period in seconds after which an upload started on clip creation is
+# forgotten if it has completed and no uploader has claimed it, for
+# example because the clip was set aside before it reached its uploader.
+_STARTED_UPLOAD_RETENTION_PERIOD = 3600
+
+
 class ClipAudioFileS3Uploader(SimpleProcessor):
 
 
+    """
+    Uploads clip audio files to S3 through an `S3TransferPool`, which
+    is typically shared with other uploaders.
+
+    The uploader submits the clips it receives to the pool without
+    waiting for their uploads to complete, with priorities that have
+    the pool upload newer clips first. Since the uploaders of all
+    stations and detectors submit their clips before any uploads
+    complete, the pool can order the uploads of all of them. On each
+    tick, the uploader outputs the clips whose uploads have completed
+    successfully since the previous tick, so that they and only they
+    are moved to the archived clip directory. Clips whose uploads are
+    still in progress are counted as pending by the activity scheduler,
+    so that the uploader runs again soon to collect them. Clips whose
+    uploads failed remain in place and are retried on a later tick.
+    """
+
+
     def __init__(self, settings, parent=None, name=None):
 
         super().__init__(settings, parent, name)
@@ -25,47 +53,297 @@ class ClipAudioFileS3Uploader(SimpleProcessor):
         self._clip_bucket_name = aws.s3_clip_bucket_name
         self._clip_folder_path = aws.s3_clip_folder_path
 
-        session = boto3.Session(
-            aws_access_key_id=aws.access_key_id,
-            aws_secret_access_key=aws.secret_access_key,
-            region_name=aws.region_name)
-        self._s3 = session.resource('s3')
+        # S3 upload pool, typically shared with other processors.
+        self._pool = settings.get('transfer_pool')
+        if self._pool is None:
+            self._pool = S3TransferPool(aws)
+
+        # Optional `CircuitBreaker` for S3, and `ActivityScheduler`,
+        # which we tell when we skip clips because S3 is unavailable
+        # or because their uploads failed.
+        self._breaker = settings.get('circuit_breaker')
+        self._scheduler = settings.get('scheduler')
+
+        # Optional `ClipAudioFileUploadStarter` that may already have
+        # started the uploads of some of our clips.
+        self._upload_starter = settings.get('upload_starter')
+
+        # Optional `ClipHandoff` from which our clips may have come. We
+        # ask it for a listing of our clip directory when we leave clips
+        # there, so that they are retried.
+        self._handoff = settings.get('handoff')
+
+        # Mapping from clip audio file paths to (clip, future) pairs of
+        # uploads that we have submitted but whose results we have not
+        # yet collected.
+        self._uploads = {}
+
+
+    def _process_items(self, clips, finished):
+
+        self._submit_uploads(
+            [c for c in clips if c.audio_file_path not in self._uploads])
+
+        if finished:
+            # no more ticks
+
+            # Wait for all uploads to complete.
+            for _, future in self._uploads.values():
+                future.exception()
+
+        uploaded_clips, failed_count = self._collect_uploads()
+
+        if failed_count != 0:
+
+            self._record_blocked(
+                time.monotonic() + _FAILED_UPLOAD_RETRY_PERIOD)
+
+            if self._handoff is not None:
+                self._handoff.request_scan()
+
+        if self._scheduler is not None:
+
+            # Count clips whose uploads are in progress as pending
+            # rather than as output by our clip lister, so that we run
+            # again soon to collect them, but not right away.
+            deferred_count = sum(
+                1 for c in clips if c.audio_file_path in self._uploads)
+            self._scheduler.record_deferred(deferred_count)
+            self._scheduler.record_activity(
+                0, len(self._uploads) - deferred_count)
+
+        return uploaded_clips
+
 
+    def _submit_uploads(self, clips):
 
-    def _process_item(self, clip, finished):
+        if len(clips) == 0:
+            return
+
+        breaker = self._breaker
+
+        if breaker is not None:
+
+            if not breaker.allow_request():
+                # S3 unavailable
+
+                self._record_blocked(breaker.retry_time, breaker)
+                return
+
+            if breaker.state == CircuitBreaker.HALF_OPEN:
+                # S3 may be available again
+
+                # Upload just one clip as a trial.
+                clips = clips[:1]
+
+        for clip in clips:
+            future = self._submit_upload(clip)
+            self._uploads[clip.audio_file_path] = (clip, future)
+
+
+    def _collect_uploads(self):
+
+        """
+        Collects the results of completed uploads.
+
+        Returns the clips whose uploads succeeded and the number of
+        clips whose uploads failed.
+        """
+
+        uploaded_clips = []
+        failed_count = 0
+
+        for path, (clip, future) in tuple(self._uploads.items()):
+
+            if not future.done():
+                continue
+
+            del self._uploads[path]
+
+            if self._get_upload_result(clip, future):
+                uploaded_clips.append(clip)
+            else:
+                failed_count += 1
+
+        return tuple(uploaded_clips), failed_count
+
+
+    def _submit_upload(self, clip):
+
+        if self._upload_starter is not None:
+            future = self._upload_starter.pop_upload(clip.audio_file_path)
+            if future is not None:
+                return future
 
         object_key = self._get_clip_object_key(clip.id)
-        file_contents = clip.audio_file_contents
+
+        # Upload newer clips first, so that the clip albums of the
+        # current night fill quickly while any backlog of older clips
+        # drains in the background.
+        priority = clip.start_time.timestamp()
+
+        return self._pool.upload(
+            clip.audio_file_path, self._clip_bucket_name, object_key,
+            priority)
+
+
+    def _get_upload_result(self, clip, future):
+
+        """
+        Gets the result of the completed upload of a clip's audio file.
+
+        Returns `True` if and only if the upload succeeded.
+        """
 
         try:
-            obj = self._s3.Object(self._clip_bucket_name, object_key)
-        except Exception as e:
-            raise ArchiverError(
-                f'Processor "{self.path}" not create boto3 S3 object for '
-                f'bucket "{self._clip_bucket_name}", object key '
-                f'"{object_key}". Exception message was: {e}')
-        
-        try:
-            obj.put(Body=file_contents)
+            uploaded = future.result()
+
         except Exception as e:
-            raise ArchiverError(
-                f'Processor "{self.path}" could not put boto3 S3 object to '
-                f'bucket "{self._clip_bucket_name}", object key '
-                f'"{object_key}". Exception message was: {e}')
-        
+
+            if self._breaker is not None:
+                self._breaker.record_failure()
+
+            object_key = self._get_clip_object_key(clip.id)
+            _logger.error(
+                f'Processor "{self.path}" could not upload audio file '
+                f'"{clip.audio_file_path}" to S3 bucket '
+                f'"{self._clip_bucket_name}", object key "{object_key}". '
+                f'Exception message was: {e}')
+
+            return False
+
+        if self._breaker is not None:
+            self._breaker.record_success()
+
+        if uploaded:
+            action = 'uploaded audio file to S3'
+        else:
+            action = 'found audio file already in S3'
+
         _logger.info(
-            f'Processor "{self.path}" uploaded audio file to S3 for clip '
-            f'{clip.id} for station "{clip.station_name}", mic output '
+            f'Processor "{self.path}" {action} for clip {clip.id} for '
+            f'station "{clip.station_name}", mic output '
             f'"{clip.mic_output_name}", and start time {clip.start_time}.')
-        
-        return clip
+
+        return True
+
+
+    def _record_blocked(self, retry_time, cause=None):
+        if self._scheduler is not None:
+            self._scheduler.record_blocked(retry_time, cause)
 
 
     def _get_clip_object_key(self, clip_id):
+        return _get_clip_object_key(self._clip_folder_path, clip_id)
+
+
+class ClipAudioFileUploadStarter:
+
+
+    """
+    Starts uploads of clip audio files to S3 as soon as their clips are
+    created in the Vesper archive.
+
+    A `VesperClipCreator` calls `start_upload` for each clip it creates,
+    after moving the clip's files to the created clip directory. The
+    `ClipAudioFileS3Uploader` that later processes the clip gets the
+    upload with `pop_upload` instead of starting a new one. This lets
+    clip creation and audio file uploading overlap, while leaving the
+    moves of clip files between archiver directories to the processors
+    that usually perform them.
+
+    Completed uploads that no uploader claims within the retention
+    period are forgotten.
+    """
+
+
+    def __init__(
+            self, aws_settings, transfer_pool, breaker=None,
+            retention_period=_STARTED_UPLOAD_RETENTION_PERIOD):
+
+        self._clip_bucket_name = aws_settings.s3_clip_bucket_name
+        self._clip_folder_path = aws_settings.s3_clip_folder_path
+        self._pool = transfer_pool
+        self._breaker = breaker
+        self._retention_period = retention_period
+
+        # Mapping from clip audio file paths to (future, start time)
+        # pairs, in the order in which the uploads were started.
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+
+    def start_upload(self, clip):
+
+        """
+        Starts uploading the audio file of a newly created clip.
+
+        The upload is not started if S3 is or may be unavailable, in
+        which case the `ClipAudioFileS3Uploader` that later processes
+        the clip decides what to do.
+        """
+
+        if self._breaker is not None and \
+                self._breaker.state != CircuitBreaker.CLOSED:
+            return
+
+        object_key = \
+            _get_clip_object_key(self._clip_folder_path, clip.id)
+
+        future = self._pool.upload(
+            clip.audio_file_path, self._clip_bucket_name, object_key,
+            clip.start_time.timestamp())
+
+        now = time.monotonic()
+
+        with self._lock:
+            self._forget_stale_uploads(now)
+            # Pop any earlier upload of the file so that the new one
+            # goes to the end of the start time order.
+            self._uploads.pop(clip.audio_file_path, None)
+            self._uploads[clip.audio_file_path] = (future, now)
+
+
+    def _forget_stale_uploads(self, now):
+
+        """
+        Forgets completed uploads that were started more than our
+        retention period ago.
+
+        Must be called with our lock held.
+        """
+
+        expiration_time = now - self._retention_period
+
+        stale_paths = []
+        for path, (future, start_time) in self._uploads.items():
+            if start_time > expiration_time:
+                break
+            if future.done():
+                stale_paths.append(path)
+
+        for path in stale_paths:
+            del self._uploads[path]
+
+
+    def pop_upload(self, audio_file_path):
+
+        """
+        Gets the started upload of the specified audio file and forgets
+        it, or returns `None` if there is no such upload.
+        """
+
+        with self._lock:
+            upload = self._uploads.pop(audio_file_path, None)
+
+        return None if upload is None else upload[0]
+
+
+def _get_clip_object_key(clip_folder_path, clip_id):
 
-        # Clip object keys have the form
-        # "{clip_folder_path}000/000/Clip 000 000 243.wav". Note that if
-        # the clip folder path is not empty it should end with a "/".
+    # Clip object keys have the form
+    # "{clip_folder_path}000/000/Clip 000 000 243.wav". Note that if
+    # the clip folder path is not empty it should end with a "/".
 
-        clip_file_path = vesper_utils.get_clip_audio_file_path(clip_id)
-        return f'{self._clip_folder_path}' + '/'.join(clip_file_path.parts)
+    clip_file_path = vesper_utils.get_clip_audio_file_path(clip_id)
+    return f'{clip_folder_path}' + '/'.join(clip_file_path.parts)
@@ -0,0 +1,264 @@
+"""
+Containers that pack the archived clip files of a night into one file.
+
+A clip container is an uncompressed (i.e. `ZIP_STORED`) ZIP file, for
+example `Archived/2026-04-15.zip`, together with a sidecar JSON index
+file, for example `Archived/2026-04-15.index.json`. The index maps the
+name of each file in the container to the offset and size of the file's
+data in the container, so that a file can be read with a single seek
+and read, without parsing the ZIP central directory. Since the container
+is a standard ZIP file, it can also be read with any ZIP tool.
+
+Containers are immutable. Clips that are archived for a night after the
+night has been packed are packed into supplementary containers, for
+example `Archived/2026-04-15_1.zip`.
+"""
+
+
+from pathlib import Path
+import json
+import os
+import re
+import struct
+import zipfile
+
+from lrgv.archiver.archiver_error import ArchiverError
+
+
+CONTAINER_FILE_NAME_EXTENSION = '.zip'
+INDEX_FILE_NAME_EXTENSION = '.index.json'
+
+_CONTAINER_FILE_NAME_RE = re.compile(
+    r'^(?P<night>\d\d\d\d-\d\d-\d\d)(?:_(?P<num>\d+))?\.zip$')
+
+_TEMP_FILE_NAME_SUFFIX = '.tmp'
+
+# ZIP local file header structure and size. See section 4.3.7 of the
+# ZIP file format specification.
+_LOCAL_HEADER_STRUCT = struct.Struct('<4s5H3L2H')
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+class ClipContainer:
+
+    """Clip container reader with random access to the packed files."""
+
+
+    def __init__(self, file_path):
+
+        self._file_path = Path(file_path)
+
+        index_file_path = get_index_file_path(self._file_path)
+
+        try:
+            with open(index_file_path) as file:
+                index = json.load(file)
+            self._files = {
+                name: tuple(info) for name, info in index['files'].items()}
+        except FileNotFoundError:
+            # index missing, for example if it was deleted
+
+            self._files = _read_container_index(self._file_path)
+
+
+    @property
+    def file_path(self):
+        return self._file_path
+
+
+    @property
+    def file_names(self):
+        return tuple(self._files.keys())
+
+
+    def __contains__(self, file_name):
+        return file_name in self._files
+
+
+    def get_file_size(self, file_name):
+        return self._files[file_name][1]
+
+
+    def read(self, file_name):
+
+        """Reads the contents of a packed file."""
+
+        offset, size = self._files[file_name]
+
+        with open(self._file_path, 'rb') as file:
+            file.seek(offset)
+            return file.read(size)
+
+
+def get_index_file_path(container_file_path):
+    name = container_file_path.stem + INDEX_FILE_NAME_EXTENSION
+    return container_file_path.with_name(name)
+
+
+def get_container_file_paths(dir_path, night=None):
+
+    """
+    Gets the paths of the clip containers in a directory, optionally
+    for a single night, sorted by night and container number.
+    """
+
+    try:
+        names = os.listdir(dir_path)
+    except FileNotFoundError:
+        return ()
+
+    keys = []
+
+    for name in names:
+
+        m = _CONTAINER_FILE_NAME_RE.match(name)
+
+        if m is not None and (night is None or m['night'] == str(night)):
+            num = 0 if m['num'] is None else int(m['num'])
+            keys.append((m['night'], num, name))
+
+    return tuple(Path(dir_path) / name for _, _, name in sorted(keys))
+
+
+def get_new_container_file_path(dir_path, night):
+
+    """
+    Gets the path of a new clip container for the specified night in
+    the specified directory.
+    """
+
+    num = len(get_container_file_paths(dir_path, night))
+
+    if num == 0:
+        name = f'{night}{CONTAINER_FILE_NAME_EXTENSION}'
+    else:
+        name = f'{night}_{num}{CONTAINER_FILE_NAME_EXTENSION}'
+
+    return Path(dir_path) / name
+
+
+def write_container(file_path, source_file_paths):
+
+    """
+    Writes a new clip container that packs the specified files.
+
+    The container is written to a temporary file that is renamed only
+    after it is complete, so an interrupted write never leaves a partial
+    container behind. The container's index file is written last. The
+    source files are not deleted.
+    """
+
+    file_path = Path(file_path)
+    temp_file_path = _get_temp_file_path(file_path)
+
+    if file_path.exists():
+        raise ArchiverError(f'Clip container "{file_path}" already exists.')
+
+    try:
+
+        with zipfile.ZipFile(
+                temp_file_path, 'w', zipfile.ZIP_STORED,
+                allowZip64=True) as zip_file:
+
+            for path in source_file_paths:
+                zip_file.write(path, arcname=path.name)
+
+        with open(temp_file_path, 'rb') as file:
+            os.fsync(file.fileno())
+
+        os.replace(temp_file_path, file_path)
+
+    except Exception as e:
+        temp_file_path.unlink(missing_ok=True)
+        raise ArchiverError(
+            f'Could not write clip container "{file_path}". Error '
+            f'message was: {e}')
+
+    _write_index(file_path, _read_container_index(file_path))
+
+
+def _get_temp_file_path(file_path):
+    return file_path.with_name(file_path.name + _TEMP_FILE_NAME_SUFFIX)
+
+
+def _read_container_index(file_path):
+
+    """
+    Gets a mapping from file name to (data offset, data size) pair
+    for the files of a clip container by reading the container's ZIP
+    central directory and local file headers.
+    """
+
+    files = {}
+
+    with zipfile.ZipFile(file_path) as zip_file, \
+            open(file_path, 'rb') as file:
+
+        for info in zip_file.infolist():
+
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ArchiverError(
+                    f'File "{info.filename}" of clip container '
+                    f'"{file_path}" is compressed.')
+
+            file.seek(info.header_offset)
+            header = _LOCAL_HEADER_STRUCT.unpack(
+                file.read(_LOCAL_HEADER_STRUCT.size))
+
+            if header[0] != _LOCAL_HEADER_SIGNATURE:
+                raise ArchiverError(
+                    f'Bad local file header for file "{info.filename}" '
+                    f'of clip container "{file_path}".')
+
+            name_length, extra_length = header[-2:]
+
+            offset = \
+                info.header_offset + _LOCAL_HEADER_STRUCT.size + \
+                name_length + extra_length
+
+            files[info.filename] = (offset, info.file_size)
+
+    return files
+
+
+def _write_index(container_file_path, files):
+
+    index_file_path = get_index_file_path(container_file_path)
+    temp_file_path = _get_temp_file_path(index_file_path)
+
+    index = {
+        'container': container_file_path.name,
+        'files': {name: list(info) for name, info in files.items()}
+    }
+
+    try:
+        with open(temp_file_path, 'wt') as file:
+            json.dump(index, file)
+        os.replace(temp_file_path, index_file_path)
+    except Exception as e:
+        raise ArchiverError(
+            f'Could not write clip container index file '
+            f'"{index_file_path}". Error message was: {e}')
+
+
+def unpack_container(file_path, dir_path):
+
+    """
+    Unpacks a clip container into the specified directory.
+
+    Returns the paths of the unpacked files. The container is not
+    deleted.
+    """
+
+    container = ClipContainer(file_path)
+
+    dir_path.mkdir(mode=0o755, parents=True, exist_ok=True)
+
+    paths = []
+
+    for name in container.file_names:
+        path = dir_path / name
+        path.write_bytes(container.read(name))
+        paths.append(path)
+
+    return tuple(paths)
@@ -0,0 +1,103 @@
+"""
+In-memory handoff of clips from one archiver pipeline to the next.
+
+A clip archiver archives a clip in two pipelines. The first creates the
+clip in the Vesper archive and moves its files to the Created clip
+directory, and the second archives the clip's audio file and moves the
+clip's files to the Archived clip directory. Without a handoff, the
+second pipeline finds the clip by listing the Created clip directory,
+parsing again the metadata file that the first pipeline just wrote, and
+waiting for the file wait period to elapse before processing the clip.
+
+With a handoff, the first pipeline puts each clip it creates into the
+handoff, and the second pipeline takes the clips from it in the same
+tick. The Created clip directory remains the durable record of the
+clips between the two pipelines, but the second pipeline lists it only
+to recover clips that the handoff does not hold: when the archiver
+starts, when processing a clip fails, and periodically as a safeguard.
+"""
+
+
+import threading
+import time
+
+
+class ClipHandoff:
+
+
+    def __init__(self, rescan_period=None):
+
+        """
+        Initializes this handoff.
+
+        Parameters
+        ----------
+        rescan_period : float | None
+            the maximum period in seconds between listings of the clip
+            directory of the receiving pipeline, or `None` to list the
+            directory only when a listing is requested.
+        """
+
+        self._rescan_period = rescan_period
+
+        self._clips = []
+
+        # The receiving pipeline must list its directory before it
+        # first relies on the handoff, since the directory may contain
+        # clips left there before the archiver started.
+        self._scan_needed = True
+        self._last_scan_time = None
+
+        self._lock = threading.Lock()
+
+
+    def put(self, clip):
+        with self._lock:
+            self._clips.append(clip)
+
+
+    def take(self):
+
+        """Gets and removes all of the clips of this handoff."""
+
+        with self._lock:
+            clips = tuple(self._clips)
+            self._clips.clear()
+            return clips
+
+
+    def request_scan(self):
+
+        """
+        Requests that the receiving pipeline list its clip directory
+        on its next tick, for example since it could not process some
+        clips that it took from this handoff.
+        """
+
+        with self._lock:
+            self._scan_needed = True
+
+
+    def start_scan(self, now=None):
+
+        """
+        Determines whether or not the receiving pipeline should list
+        its clip directory, and if so notes that it is doing so.
+        """
+
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+
+            if not self._scan_needed and \
+                    self._rescan_period is not None and \
+                    now - self._last_scan_time >= self._rescan_period:
+                self._scan_needed = True
+
+            if not self._scan_needed:
+                return False
+
+            self._scan_needed = False
+            self._last_scan_time = now
+            return True
@@ -1,9 +1,13 @@
+from datetime import datetime as DateTime
 import re
 import time
 
 from lrgv.archiver.clip import Clip
+from lrgv.archiver.file_stability_detector import FileStabilityDetector
 from lrgv.dataflow import SimpleSource
 from lrgv.util.bunch import Bunch
+import lrgv.archiver.night_dirs as night_dirs
+import lrgv.util.file_utils as file_utils
 
 
 _CLIP_METADATA_FILE_NAME_RE = re.compile(
@@ -26,61 +30,234 @@ _AUDIO_FILE_NAME_EXTENSION = '.wav'
 class ClipLister(SimpleSource):
 
 
+    def __init__(self, settings, parent=None, name=None):
+
+        super().__init__(settings, parent, name)
+
+        # Optional `ArchiverIndex` and the archiver stage of our clip
+        # directory in it.
+        self._index = settings.get('index')
+        self._index_stage = settings.get('index_stage')
+
+        # Optional `MetadataCache`.
+        self._metadata_cache = settings.get('metadata_cache')
+
+        # `True` if and only if the clips we create should drop the
+        # parsed contents of their metadata files after extracting their
+        # fields. This saves memory when our consumers need only the
+        # fields.
+        self._drop_metadata = settings.get('drop_metadata', False)
+
+        # Time zone in which to compute the nights of clips if our clip
+        # directory is partitioned by night, or `None` if it is not.
+        self._night_dir_time_zone = settings.get('night_dir_time_zone')
+
+        # Optional `ActivityScheduler` to which we report activity.
+        self._scheduler = settings.get('scheduler')
+
+        # Optional `FileStabilityDetector`. If we have one, we use it
+        # instead of just our file wait period to decide when files
+        # are ready.
+        stability = settings.get('file_stability')
+        if stability is None:
+            self._stability_detector = None
+        else:
+            self._stability_detector = FileStabilityDetector(
+                stability.period, settings.clip_file_wait_period,
+                stability.validate_wave_headers,
+                stability.get('validate_json_files', False))
+
+        # Optional `ClipHandoff` from which we take clips that a
+        # preceding pipeline put there during the current tick. If we
+        # have one, we list our clip directory only when the handoff
+        # says to.
+        self._handoff = settings.get('handoff')
+
+
     def _process_items(self):
 
-        s = self.settings
+        if self._handoff is None:
+            return self._list_clips(), False
+
+        clips = self._handoff.take()
+
+        if self._scheduler is not None:
+            self._scheduler.record_activity(len(clips))
+
+        if self._handoff.start_scan():
+
+            # Add any listed clips that were not handed off, for
+            # example clips left behind by a previous archiver run.
+            handed_off_paths = frozenset(c.metadata_file_path for c in clips)
+            clips += tuple(
+                c for c in self._list_clips()
+                if c.metadata_file_path not in handed_off_paths)
+
+        return clips, False
+
 
-        # Start with all file paths, sorted lexicographically.
-        file_paths = tuple(sorted(p for p in s.clip_dir_path.glob('*')))
+    def _list_clips(self):
+
+        # Start with all files, sorted lexicographically by path.
+        dir_files = self._get_dir_files()
 
         # Exclude files that aren't clip metadata files.
-        files = self._get_matching_files(file_paths)
+        files = self._get_matching_files(dir_files)
+        matching_file_count = len(files)
 
-        # If indicated, exclude files that were modified too recently.
-        if s.clip_file_wait_period is not None:
-            files = tuple(
-                f for f in files
-                if _time_from_last_mod(f.path) >= s.clip_file_wait_period)
+        # Exclude files that are not yet ready, for example since they
+        # were modified too recently.
+        is_ready = self._get_readiness_test(dir_files)
+        files = tuple(f for f in files if is_ready(f.info))
             
-        # Exclude files that don't have a matching audio file.
-        files = tuple(f for f in files if self._has_matching_audio_file(f))
+        # Exclude files that don't have a matching audio file that is
+        # ready.
+        dir_files = {f.path: f for f in dir_files}
+        files = tuple(
+            f for f in files
+            if self._has_matching_audio_file(f, dir_files, is_ready))
 
         # Create clips.
-        clips = tuple(Clip(f.path) for f in files)
+        clips = tuple(
+            Clip(f.path, self._metadata_cache, self._drop_metadata)
+            for f in files)
             
-        return clips, False
+        if self._scheduler is not None:
+            self._scheduler.record_activity(
+                len(clips), matching_file_count - len(clips))
+
+        return clips
     
 
-    def _get_matching_files(self, file_paths):
+    def _get_dir_files(self):
+
+        dir_path = self.settings.clip_dir_path
+
+        if self._night_dir_time_zone is None:
+            return self._list_dir(dir_path)
+        
+        else:
+            # clip directory partitioned by night
+
+            # Include any files that are not in night subdirectories,
+            # for example files that have not yet been migrated to them.
+            dir_files = list(self._list_dir(dir_path))
+
+            time_zone = self._night_dir_time_zone
+            current_night_dir_path = night_dirs.get_night_dir_path(
+                dir_path, DateTime.now(time_zone), time_zone)
+
+            for night_dir_path in night_dirs.get_night_dir_paths(dir_path):
+
+                night_dir_files = self._list_dir(night_dir_path)
+
+                if len(night_dir_files) == 0 and \
+                        night_dir_path != current_night_dir_path:
+                    # night directory emptied by our consumers
+
+                    # Remove the directory so that we need not list it
+                    # again. Otherwise the number of directories we list
+                    # would grow by one every night. A processor that
+                    # moves a late clip of the night here creates the
+                    # directory again.
+                    _remove_dir(night_dir_path)
+
+                dir_files.extend(night_dir_files)
+
+            return tuple(dir_files)
+
+
+    def _list_dir(self, dir_path):
+
+        if self._index is None:
+            return file_utils.scan_dir(dir_path)
+        
+        else:
+            return self._index.list_dir(
+                dir_path, self._index_stage, get_clip_file_name_fields,
+                self.settings.clip_file_wait_period)
+        
+
+    def _get_matching_files(self, dir_files):
 
             files = []
 
-            for p in file_paths:
+            for f in dir_files:
 
-                m = _CLIP_METADATA_FILE_NAME_RE.match(p.name)
+                m = _CLIP_METADATA_FILE_NAME_RE.match(f.path.name)
 
                 if m is not None:
-                    files.append(Bunch(path=p, name_match=m))
+                    files.append(Bunch(path=f.path, info=f, name_match=m))
 
             return tuple(files)
     
 
-    def _has_matching_audio_file(self, file):
+    def _get_readiness_test(self, dir_files):
+
+        """
+        Gets a function that determines whether or not a file of the
+        specified directory files is ready to be output.
+        """
+
+        wait_period = self.settings.clip_file_wait_period
+
+        if self._stability_detector is not None:
+            stable_paths = self._stability_detector.get_stable_paths(dir_files)
+            return lambda f: f.path in stable_paths
+        
+        elif wait_period is not None:
+            return lambda f: _time_from_last_mod(f) >= wait_period
+        
+        else:
+            return lambda f: True
+
+
+    def _has_matching_audio_file(self, file, dir_files, is_ready):
 
         audio_file_path = file.path.with_suffix(_AUDIO_FILE_NAME_EXTENSION)
 
         # Check that audio file exists.
-        if not audio_file_path.exists():
+        audio_file = dir_files.get(audio_file_path)
+        if audio_file is None:
             return False
         
-        # If indicated, check that audio file was not modified too recently.
-        wait_period = self.settings.clip_file_wait_period
-        if wait_period is not None and \
-                _time_from_last_mod(audio_file_path) < wait_period:
-            return False
-            
-        return True
+        # Check that audio file is ready.
+        return is_ready(audio_file)
+
+
+def get_clip_file_name_fields(file_name):
+
+    """
+    Gets the station name, start time, and serial number of a clip
+    from the name of its metadata file.
+
+    Returns `None` if the file name is not a clip metadata file name.
+    """
+
+    m = _CLIP_METADATA_FILE_NAME_RE.match(file_name)
+
+    if m is None:
+        return None
+    
+    start_time = (
+        f'{m["year"]}-{m["month"]}-{m["day"]} '
+        f'{m["hour"]}:{m["minute"]}:{m["second"]}.{m["millis"]} Z')
+    
+    return Bunch(
+        station_name=m['station_name'],
+        start_time=start_time,
+        serial_num=int(m['num']))
+
+
+def _time_from_last_mod(file):
+    return time.time() - file.mtime
+
 
+def _remove_dir(dir_path):
+    try:
+        dir_path.rmdir()
+    except OSError:
+        # directory not empty, for example because another processor
+        # just moved a file to it, or already removed
 
-def _time_from_last_mod(file_path):
-    return time.time() - file_path.stat().st_mtime
+        pass
@@ -1,19 +1,45 @@
 from lrgv.archiver.archiver_error import ArchiverError
+from lrgv.archiver.file_move_recorder import FileMoveRecorder
 from lrgv.dataflow import SimpleSink
+import lrgv.archiver.night_dirs as night_dirs
 
 
-class ClipMover(SimpleSink):
+class ClipMover(FileMoveRecorder, SimpleSink):
+
+
+    def __init__(self, settings, parent=None, name=None):
+
+        super().__init__(settings, parent, name)
+
+        self._init_file_move_recorder(settings)
+
+        # Time zone in which to compute the nights of clips if our destination
+        # directory is partitioned by night, or `None` if it is not.
+        self._night_dir_time_zone = settings.get('night_dir_time_zone')
 
 
     def _process_item(self, clip, finished):
-        self._move_clip_file(clip.audio_file_path)
-        self._move_clip_file(clip.metadata_file_path)
+        dir_path = self._get_destination_dir_path(clip)
+        self._move_clip_file(clip.audio_file_path, dir_path)
+        self._move_clip_file(clip.metadata_file_path, dir_path)
         
 
-    def _move_clip_file(self, old_file_path):
+    def _get_destination_dir_path(self, clip):
+
+        dir_path = self.settings.destination_dir_path
+
+        if self._night_dir_time_zone is None:
+            return dir_path
+        
+        else:
+            return night_dirs.get_night_dir_path(
+                dir_path, clip.start_time, self._night_dir_time_zone)
+
+
+    def _move_clip_file(self, old_file_path, dir_path):
 
         file_name = old_file_path.name
-        new_file_path = self.settings.destination_dir_path / file_name
+        new_file_path = dir_path / file_name
 
         try:
             new_file_path.parent.mkdir(mode=0o755, parents=True, exist_ok=True)
@@ -30,3 +56,5 @@ class ClipMover(SimpleSink):
                 f'Processor "{self.path}" could not move file '
                 f'"{old_file_path}" to "{new_file_path}". Error message '
                 f'was: {e}')
+        
+        self._record_move(old_file_path, new_file_path)
@@ -0,0 +1,360 @@
+"""
+Processor that checks clips before they are created in the Vesper
+archive, rejecting clips whose audio files are corrupt, truncated,
+silent, or clipped.
+"""
+
+
+import logging
+
+import numpy as np
+
+from lrgv.archiver.archiver_error import ArchiverError
+from lrgv.archiver.file_move_recorder import FileMoveRecorder
+from lrgv.dataflow import SimpleProcessor
+from lrgv.util.wave_utils import WaveFileError
+import lrgv.util.wave_utils as wave_utils
+
+
+_logger = logging.getLogger(__name__)
+
+
+# WAVE format tags of integer PCM sample data.
+_PCM_FORMAT_TAGS = (1, 0xFFFE)
+
+# NumPy data types of the integer PCM samples whose levels we check, by
+# sample width in bytes.
+_SAMPLE_DTYPES = {
+    2: np.dtype('<i2'),
+    4: np.dtype('<i4'),
+}
+
+# Maximum number of samples whose levels we compute at once, to bound
+# our memory use.
+_MAX_CHUNK_SAMPLE_COUNT = 10_000_000
+
+
+class ClipQualityChecker(FileMoveRecorder, SimpleProcessor):
+
+
+    """
+    Checks clips before they are created in the Vesper archive.
+
+    The checker first reads the header of each clip's audio file,
+    rejecting the clip if the header is invalid, if the file is shorter
+    than the header says it should be, if the clip's length differs
+    from that of its metadata by more than the `max_length_difference`
+    setting (in sample frames), or if the clip's sample rate differs
+    from that of its recording in its metadata. It then reads the
+    samples of the remaining clips with NumPy and computes their peak
+    and RMS levels and the fractions of their samples that are at full
+    scale, for many clips at once. Clips whose samples are all zero,
+    whose RMS level is below the `min_rms_level` setting (in dBFS), or
+    more than the `max_clipped_fraction` setting of whose samples are
+    at full scale are rejected, too.
+
+    The checker moves the files of rejected clips to the
+    `rejected_clip_dir_path` directory and outputs the other clips.
+    """
+
+
+    def __init__(self, settings, parent=None, name=None):
+
+        super().__init__(settings, parent, name)
+
+        self._init_file_move_recorder(settings)
+
+        # Minimum RMS level in dBFS, or `None` for no minimum.
+        self._min_rms_level = settings.get('min_rms_level')
+
+        # Maximum fraction of samples at full scale, or `None` for no
+        # maximum.
+        self._max_clipped_fraction = settings.get('max_clipped_fraction')
+
+        # Maximum difference in sample frames between the length of a
+        # clip's audio file and the length in its metadata, or `None`
+        # for no maximum. Clip extractors compute the two lengths
+        # separately, so they may differ by a frame due to rounding.
+        self._max_length_difference = settings.get('max_length_difference')
+
+
+    def _process_items(self, clips, finished):
+
+        if len(clips) == 0:
+            return ()
+
+        # Reasons for which clips are rejected, or `None` for clips
+        # that pass. A reason is one or more sentences.
+        reasons = [None] * len(clips)
+
+        # Indices of clips that we could not check, which we leave in
+        # place and neither output nor reject.
+        unchecked = set()
+
+        # (index, clip, header) triples of clips whose headers pass
+        # and whose sample levels we can check.
+        level_clips = []
+
+        for i, clip in enumerate(clips):
+
+            try:
+                reason, header = self._check_header(clip)
+            except OSError as e:
+                _logger.error(
+                    f'Processor "{self.path}" could not read audio file '
+                    f'"{clip.audio_file_path}". Error message was: {e}')
+                unchecked.add(i)
+                continue
+
+            if reason is not None:
+                reasons[i] = reason
+
+            elif header.format_tag in _PCM_FORMAT_TAGS and \
+                    header.sample_width in _SAMPLE_DTYPES:
+                level_clips.append((i, clip, header))
+
+        for chunk in _get_chunks(level_clips):
+
+            try:
+                chunk_reasons = self._check_levels(chunk)
+            except OSError as e:
+                raise ArchiverError(
+                    f'Processor "{self.path}" could not read clip audio '
+                    f'files. Error message was: {e}')
+
+            for (i, _, _), reason in zip(chunk, chunk_reasons):
+                reasons[i] = reason
+
+        output_clips = []
+
+        for i, (clip, reason) in enumerate(zip(clips, reasons)):
+            if i in unchecked:
+                continue
+            elif reason is None:
+                output_clips.append(clip)
+            else:
+                self._reject_clip(clip, reason)
+
+        return output_clips
+
+
+    def _check_header(self, clip):
+
+        """
+        Checks the header of a clip's audio file.
+
+        Returns a `(reason, header)` pair, where `reason` is the reason
+        for which the clip is rejected, or `None` if the header passes,
+        and `header` is the header, or `None` if it could not be read.
+        """
+
+        file_path = clip.audio_file_path
+
+        try:
+            header = wave_utils.read_wave_file_header(file_path)
+        except WaveFileError as e:
+            return f'Its audio file header is invalid: {e}', None
+
+        if header.frame_count == 0:
+            return 'Its audio file contains no samples.', header
+
+        file_size = file_path.stat().st_size
+        if header.data_offset + header.data_size > file_size:
+            return (
+                f'Its audio file is truncated. The file header declares '
+                f'{header.data_size} bytes of sample data, but the file '
+                f'contains only {file_size - header.data_offset}.'), header
+
+        length_difference = abs(header.frame_count - clip.length)
+        max_length_difference = self._max_length_difference
+        if max_length_difference is not None and \
+                length_difference > max_length_difference:
+            return (
+                f'Its audio file contains {header.frame_count} sample '
+                f'frames, but its metadata say that it is {clip.length} '
+                f'sample frames long.'), header
+        elif length_difference != 0:
+            _logger.debug(
+                f'Processor "{self.path}" found that audio file '
+                f'"{file_path}" contains {header.frame_count} sample '
+                f'frames, but its metadata say that it is {clip.length} '
+                f'sample frames long.')
+
+        sample_rate = _get_metadata_sample_rate(clip)
+        if sample_rate is not None and header.sample_rate != sample_rate:
+            return (
+                f'Its audio file has sample rate {header.sample_rate} Hz, '
+                f'but its metadata say that its sample rate is '
+                f'{sample_rate} Hz.'), header
+
+        return None, header
+
+
+    def _check_levels(self, chunk):
+
+        """
+        Checks the sample levels of a chunk of clips.
+
+        Returns the reasons for which the clips are rejected, with
+        `None` for clips that pass.
+        """
+
+        samples = []
+        clipped = []
+
+        for _, clip, header in chunk:
+            s, c = _read_samples(clip.audio_file_path, header)
+            samples.append(s)
+            clipped.append(c)
+
+        # Compute per-clip statistics over the concatenated samples of
+        # all of the clips, for efficiency.
+        lengths = np.array([len(s) for s in samples])
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        samples = np.concatenate(samples)
+        clipped = np.concatenate(clipped)
+
+        peaks = np.maximum.reduceat(np.abs(samples), starts)
+        energies = np.add.reduceat(
+            np.square(samples, dtype=np.float64), starts)
+        rms_values = np.sqrt(energies / lengths)
+        clipped_fractions = np.add.reduceat(clipped, starts) / lengths
+
+        with np.errstate(divide='ignore'):
+            rms_levels = 20 * np.log10(rms_values)
+
+        min_rms_level = self._min_rms_level
+        max_clipped_fraction = self._max_clipped_fraction
+
+        reasons = []
+
+        for peak, rms_level, clipped_fraction in \
+                zip(peaks, rms_levels, clipped_fractions):
+
+            if peak == 0:
+                reason = 'All of its samples are zero.'
+
+            elif min_rms_level is not None and rms_level < min_rms_level:
+                reason = (
+                    f'Its RMS level of {rms_level:.1f} dBFS is below the '
+                    f'minimum of {min_rms_level} dBFS.')
+
+            elif max_clipped_fraction is not None and \
+                    clipped_fraction > max_clipped_fraction:
+                reason = (
+                    f'{clipped_fraction:.1%} of its samples are at full '
+                    f'scale, more than the maximum of '
+                    f'{max_clipped_fraction:.1%}.')
+
+            else:
+                reason = None
+
+            reasons.append(reason)
+
+        return reasons
+
+
+    def _reject_clip(self, clip, reason):
+
+        dir_path = self.settings.rejected_clip_dir_path
+
+        # Create rejected clip directory if needed.
+        try:
+            dir_path.mkdir(mode=0o755, parents=True, exist_ok=True)
+        except Exception as e:
+            raise ArchiverError(
+                f'Processor "{self.path}" could not create directory '
+                f'"{dir_path}". Error message was: {e}')
+
+        # Move rejected clip files.
+        for old_file_path in (clip.audio_file_path, clip.metadata_file_path):
+
+            new_file_path = dir_path / old_file_path.name
+
+            try:
+                old_file_path.rename(new_file_path)
+            except Exception as e:
+                raise ArchiverError(
+                    f'Processor "{self.path}" could not move file '
+                    f'"{old_file_path}" to "{new_file_path}". Error '
+                    f'message was: {e}')
+
+            self._record_move(old_file_path, new_file_path)
+
+        _logger.warning(
+            f'Processor "{self.path}" rejected clip '
+            f'"{clip.metadata_file_path}". {reason} The clip will not be '
+            f'archived and its files have been moved to "{dir_path}".')
+
+
+def _get_metadata_sample_rate(clip):
+
+    """
+    Gets the sample rate of a clip's recording from the clip's metadata,
+    or `None` if the metadata do not identify a single recording of the
+    clip's station and mic output, or do not include its sample rate.
+    """
+
+    recordings = [
+        r for r in clip.metadata_file_contents.get('recordings', ())
+        if r.get('station') == clip.station_name and
+        clip.mic_output_name in r.get('mic_outputs', ())]
+
+    if len(recordings) != 1:
+        return None
+
+    return recordings[0].get('sample_rate')
+
+
+def _get_chunks(clips):
+
+    """
+    Partitions (index, clip, header) triples into chunks whose total
+    sample counts do not exceed `_MAX_CHUNK_SAMPLE_COUNT`, except for
+    chunks of a single long clip.
+    """
+
+    chunk = []
+    sample_count = 0
+
+    for item in clips:
+
+        header = item[2]
+        count = header.frame_count * header.channel_count
+
+        if len(chunk) != 0 and \
+                sample_count + count > _MAX_CHUNK_SAMPLE_COUNT:
+            yield chunk
+            chunk = []
+            sample_count = 0
+
+        chunk.append(item)
+        sample_count += count
+
+    if len(chunk) != 0:
+        yield chunk
+
+
+def _read_samples(file_path, header):
+
+    """
+    Reads the samples of a WAVE file.
+
+    Returns a pair of NumPy arrays: the samples as `float32` values
+    scaled so that full scale is one, and a boolean array that
+    indicates which samples are at full scale.
+    """
+
+    dtype = _SAMPLE_DTYPES[header.sample_width]
+
+    samples = np.fromfile(
+        file_path, dtype=dtype,
+        count=header.frame_count * header.channel_count,
+        offset=header.data_offset)
+
+    info = np.iinfo(dtype)
+    clipped = (samples >= info.max) | (samples <= info.min)
+
+    samples = samples.astype(np.float32) / -float(info.min)
+
+    return samples, clipped
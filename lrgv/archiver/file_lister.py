@@ -3,6 +3,7 @@ import time
 
 from lrgv.dataflow import SimpleSource
 from lrgv.util.bunch import Bunch
+import lrgv.util.file_utils as file_utils
 
 
 class FileLister(SimpleSource):
@@ -23,45 +24,54 @@ class FileLister(SimpleSource):
 
         self._file_wait_period = settings.file_wait_period
 
+        # Optional `ActivityScheduler`.
+        self._scheduler = settings.get('scheduler')
+
 
     def _process_items(self):
 
-        # Start with all file paths, sorted lexicographically.
-        pattern = '**/*' if self._recursive else '*'
-        file_paths = tuple(sorted(p for p in self._dir_path.glob(pattern)))
+        # Start with all files, sorted lexicographically by path.
+        dir_files = file_utils.scan_dir(self._dir_path, self._recursive)
 
         # If indicated, output only files whose names are matched by
         # `self._file_name_re`.
-        files = self._get_matching_files(file_paths)
+        files = self._get_matching_files(dir_files)
+
+        matching_file_count = len(files)
 
         # If indicated, output only files that were last modified at
         # least `self._wait_period` seconds ago.
         if self._file_wait_period is not None:
             mod_time_threshold = time.time() - self._file_wait_period
             files = tuple(
-                f for f in files
-                if f.path.stat().st_mtime <= mod_time_threshold)
+                f for f in files if f.info.mtime <= mod_time_threshold)
             
+        if self._scheduler is not None:
+            self._scheduler.record_activity(
+                len(files), matching_file_count - len(files))
+
         return files, False
     
 
-    def _get_matching_files(self, file_paths):
+    def _get_matching_files(self, dir_files):
 
         if self._file_name_re is None:
             # not filtering files by name
 
-            return tuple(Bunch(path=p, name_match=None) for p in file_paths)
+            return tuple(
+                Bunch(path=f.path, info=f, name_match=None)
+                for f in dir_files)
         
         else:
             # filtering files by name
 
             files = []
 
-            for p in file_paths:
+            for f in dir_files:
 
-                m = self._file_name_re.match(p.name)
+                m = self._file_name_re.match(f.path.name)
 
                 if m is not None:
-                    files.append(Bunch(path=p, name_match=m))
+                    files.append(Bunch(path=f.path, info=f, name_match=m))
 
             return tuple(files)
@@ -0,0 +1,46 @@
+"""
+Mixin for archiver processors that move clip and recording files.
+
+When a processor moves a file it must record the move in the archiver
+index, if there is one, and evict the file's parsed metadata from the
+metadata cache, if there is one, so that neither describes the file at
+its old path. This mixin does both.
+"""
+
+
+class FileMoveRecorder:
+
+
+    def _init_file_move_recorder(self, settings):
+
+        """
+        Initializes this mixin from a processor's settings.
+
+        The optional `index` setting is an `ArchiverIndex` and the
+        `index_stage` setting is the archiver stage in it of the
+        processor's destination directory. The optional `metadata_cache`
+        setting is a `MetadataCache`.
+        """
+
+        self._index = settings.get('index')
+        self._index_stage = settings.get('index_stage')
+        self._metadata_cache = settings.get('metadata_cache')
+
+
+    def _record_move(self, old_path, new_path, stage=None):
+
+        """
+        Records the move of a file in our index and evicts the file from
+        our metadata cache.
+
+        `stage` is the archiver stage of the file's new directory, and
+        defaults to that of our destination directory.
+        """
+
+        if self._index is not None:
+            if stage is None:
+                stage = self._index_stage
+            self._index.record_move(old_path, new_path, stage)
+
+        if self._metadata_cache is not None:
+            self._metadata_cache.evict(old_path)
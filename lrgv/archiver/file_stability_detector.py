@@ -0,0 +1,243 @@
+"""
+Detector of files that have stopped changing.
+
+Files appear in synced station directories as SugarSync downloads them,
+and an archiver lister must not output a file before it is complete.
+A simple way to ensure that is to wait until a file has not been
+modified for a generous period, such as 30 seconds, but that delays
+every file by at least that period. A `FileStabilityDetector` instead
+releases a file as soon as:
+
+    1. No temporary file for it exists in its directory. File sync
+       clients like SugarSync typically download a file to a temporary
+       file and then rename it.
+
+    2. Its size and modification time have not changed across
+       observations spanning at least a short stability period.
+
+    3. If it is a WAVE file and WAVE header validation is enabled, its
+       size is consistent with the chunk sizes declared in its header.
+
+    4. If it is a JSON file and JSON validation is enabled, it parses.
+       A partially written metadata file may stop changing briefly,
+       for example while a sync client waits for more data, and
+       unlike a WAVE file it has no header that declares its size.
+
+A file whose last modification is at least a maximum wait period ago is
+always considered stable, so the detector never holds a file longer than
+a plain wait period of that length would.
+"""
+
+
+import json
+import re
+import time
+
+import lrgv.util.wave_utils as wave_utils
+
+
+# Regular expressions for the names of temporary files that file sync
+# clients create while downloading files. The "name" group of a match
+# is the name of the file being downloaded.
+TEMP_FILE_NAME_RES = (
+
+    # e.g. "name.tmp", ".name.part", "name.sstmp"
+    re.compile(
+        r'^\.?(?P<name>.+)\.(?:tmp|temp|part|partial|download|sstmp)$',
+        re.IGNORECASE),
+
+    # e.g. "~name", "~$name"
+    re.compile(r'^~\$?(?P<name>.+)$'),
+
+    # e.g. ".name.Ab12Cd" (rsync style)
+    re.compile(r'^\.(?P<name>.+\.[A-Za-z0-9]+)\.[A-Za-z0-9]{6}$'),
+
+)
+
+_WAVE_FILE_NAME_EXTENSIONS = frozenset(('.wav', '.WAV'))
+
+_JSON_FILE_NAME_EXTENSIONS = frozenset(('.json', '.JSON'))
+
+
+class FileStabilityDetector:
+
+
+    def __init__(
+            self, stability_period, max_wait_period=None,
+            validate_wave_headers=False, validate_json_files=False,
+            temp_file_name_res=TEMP_FILE_NAME_RES):
+
+        """
+        Initializes this detector.
+
+        Parameters
+        ----------
+        stability_period : float
+            the minimum period in seconds over which a file's size and
+            modification time must be observed not to change for the
+            file to be considered stable.
+
+        max_wait_period : float | None
+            period in seconds after its last modification after which
+            a file is considered stable regardless of other criteria,
+            or `None` for no such period.
+
+        validate_wave_headers : bool
+            `True` if and only if WAVE file sizes should be checked
+            against their headers.
+
+        validate_json_files : bool
+            `True` if and only if JSON files should be parsed to check
+            that they are complete.
+
+        temp_file_name_res : Iterable[re.Pattern]
+            regular expressions for temporary file names.
+        """
+
+        self._stability_period = stability_period
+        self._max_wait_period = max_wait_period
+        self._validate_wave_headers = validate_wave_headers
+        self._validate_json_files = validate_json_files
+        self._temp_file_name_res = tuple(temp_file_name_res)
+
+        # Mapping from file path to `_FileState`.
+        self._states = {}
+
+
+    def get_stable_paths(self, files, now=None):
+
+        """
+        Observes the files of a directory listing, and gets the paths
+        of those that are stable.
+
+        Parameters
+        ----------
+        files : Iterable[FileInfo]
+            the files of one or more directories, including any
+            temporary files. The detector forgets files that it
+            observed previously but that are not included.
+
+        now : float | None
+            the current time, or `None` to use the current time.
+
+        Returns
+        -------
+        frozenset[Path]
+            the paths of the stable files.
+        """
+
+        if now is None:
+            now = time.time()
+
+        files = tuple(files)
+
+        temp_file_targets = self._get_temp_file_targets(files)
+
+        old_states = self._states
+        self._states = {}
+
+        stable_paths = []
+
+        for f in files:
+
+            state = old_states.get(f.path)
+
+            if state is None or state.key != (f.size, f.mtime_ns):
+                # file new or changed
+
+                state = _FileState((f.size, f.mtime_ns), now)
+
+            self._states[f.path] = state
+
+            if self._is_stable(f, state, temp_file_targets, now):
+                stable_paths.append(f.path)
+
+        return frozenset(stable_paths)
+
+
+    def _get_temp_file_targets(self, files):
+
+        """
+        Gets the paths of the files that are being downloaded to the
+        specified temporary files.
+        """
+
+        targets = set()
+
+        for f in files:
+            for r in self._temp_file_name_res:
+                m = r.match(f.path.name)
+                if m is not None:
+                    targets.add(f.path.with_name(m['name']))
+
+        return targets
+
+
+    def _is_stable(self, file, state, temp_file_targets, now):
+
+        age = now - file.mtime
+
+        if self._max_wait_period is not None and \
+                age >= self._max_wait_period:
+            return True
+
+        if file.path in temp_file_targets:
+            return False
+
+        # Require that both the file's last modification and our first
+        # observation of its current size and modification time be at
+        # least the stability period ago. The first condition guards
+        # against files that were modified so recently that their
+        # modification times have not yet changed, for example on file
+        # systems with coarse modification time resolution.
+        if age < self._stability_period or \
+                now - state.first_observation_time < self._stability_period:
+            return False
+
+        suffix = file.path.suffix
+
+        if self._validate_wave_headers and \
+                suffix in _WAVE_FILE_NAME_EXTENSIONS:
+
+            if state.contents_valid is None:
+                state.contents_valid = \
+                    wave_utils.is_wave_file_complete(file.path, file.size)
+
+            return state.contents_valid
+
+        if self._validate_json_files and \
+                suffix in _JSON_FILE_NAME_EXTENSIONS:
+
+            if state.contents_valid is None:
+                state.contents_valid = _is_json_file_complete(file.path)
+
+            return state.contents_valid
+
+        return True
+
+
+class _FileState:
+
+    def __init__(self, key, first_observation_time):
+
+        # (size, mtime_ns) pair
+        self.key = key
+
+        self.first_observation_time = first_observation_time
+
+        # Whether or not the file's contents are complete according to
+        # its WAVE header or JSON parse, or `None` if not yet checked.
+        self.contents_valid = None
+
+
+def _is_json_file_complete(path):
+
+    """Determines whether or not a JSON file parses."""
+
+    try:
+        with open(path, 'rb') as file:
+            json.load(file)
+    except (OSError, ValueError):
+        return False
+    else:
+        return True
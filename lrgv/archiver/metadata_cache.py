@@ -0,0 +1,153 @@
+"""
+Bounded in-memory cache of parsed clip and recording metadata files.
+
+Clips and recordings can remain in a directory for many archiver ticks,
+for example while they wait to be synced completely, while the Vesper
+server is unavailable, or while a large backlog drains. Each tick, the
+archiver creates new `Clip` and `Recording` objects for them. With a
+`MetadataCache`, those objects get their metadata from the cache
+instead of reading and parsing their metadata files again.
+
+Cache entries are keyed by metadata file path, size, and modification
+time, so a file that is modified is read again. Entries are evicted
+in least-recently-used order to keep the total size of the cached
+metadata files below a configurable bound, and should be evicted
+explicitly when a file moves to another directory.
+"""
+
+
+from collections import OrderedDict
+import threading
+
+
+class MetadataCache:
+
+
+    def __init__(self, max_size):
+
+        """
+        Initializes this cache.
+
+        Parameters
+        ----------
+        max_size : int
+            the maximum total size in bytes of the metadata files whose
+            contents are cached. Note that parsed metadata typically
+            occupy several times as much memory as the files they are
+            parsed from.
+        """
+
+        self._max_size = max_size
+
+        # Mapping from file path to (size, mtime_ns, contents) tuple,
+        # in least-recently-used order.
+        self._entries = OrderedDict()
+
+        self._size = 0
+        self._hit_count = 0
+        self._miss_count = 0
+        self._eviction_count = 0
+
+        self._lock = threading.Lock()
+
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+
+    @property
+    def size(self):
+        """the total size in bytes of the files whose contents are cached."""
+        return self._size
+
+
+    @property
+    def entry_count(self):
+        return len(self._entries)
+
+
+    @property
+    def hit_count(self):
+        return self._hit_count
+
+
+    @property
+    def miss_count(self):
+        return self._miss_count
+
+
+    @property
+    def eviction_count(self):
+        return self._eviction_count
+
+
+    def get(self, file_path, load):
+
+        """
+        Gets the contents of a metadata file.
+
+        Parameters
+        ----------
+        file_path : Path
+            the metadata file path.
+
+        load : Callable[[Path], Any]
+            function that reads and parses a metadata file. The function
+            is called only if the file's contents are not already cached.
+        """
+
+        stat = file_path.stat()
+        size = stat.st_size
+        mtime_ns = stat.st_mtime_ns
+
+        with self._lock:
+
+            entry = self._entries.get(file_path)
+
+            if entry is not None:
+
+                if entry[:2] == (size, mtime_ns):
+                    self._entries.move_to_end(file_path)
+                    self._hit_count += 1
+                    return entry[2]
+
+                else:
+                    # file changed since it was cached
+
+                    self._remove(file_path)
+
+            self._miss_count += 1
+
+        contents = load(file_path)
+
+        if size <= self._max_size:
+
+            with self._lock:
+
+                if file_path in self._entries:
+                    self._remove(file_path)
+
+                self._entries[file_path] = (size, mtime_ns, contents)
+                self._size += size
+
+                while self._size > self._max_size:
+                    oldest_path = next(iter(self._entries))
+                    self._remove(oldest_path)
+                    self._eviction_count += 1
+
+        return contents
+
+
+    def _remove(self, file_path):
+        size = self._entries.pop(file_path)[0]
+        self._size -= size
+
+
+    def evict(self, file_path):
+
+        """Evicts the contents of a file from this cache, if present."""
+
+        with self._lock:
+            if file_path in self._entries:
+                self._remove(file_path)
@@ -0,0 +1,36 @@
+from datetime import datetime as DateTime, timedelta as TimeDelta
+
+from lrgv.dataflow import SimpleSource
+from lrgv.util.bunch import Bunch
+import lrgv.archiver.night_dirs as night_dirs
+
+
+class NightDirLister(SimpleSource):
+
+    """
+    Lists the night subdirectories of a night-partitioned clip directory
+    whose nights ended at least a certain number of nights ago.
+
+    The lister outputs a `Bunch` with `path` and `night` attributes for
+    each such subdirectory, in order of increasing night.
+    """
+
+
+    def _process_items(self):
+
+        s = self.settings
+
+        now = DateTime.now(s.time_zone)
+        current_night = night_dirs.get_night_date(now, s.time_zone)
+        last_night = current_night - TimeDelta(days=s.min_night_age)
+
+        dirs = []
+
+        for path in night_dirs.get_night_dir_paths(s.dir_path):
+
+            night = DateTime.strptime(path.name, '%Y-%m-%d').date()
+
+            if night <= last_night:
+                dirs.append(Bunch(path=path, night=night))
+
+        return tuple(dirs), False
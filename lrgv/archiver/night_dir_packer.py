@@ -0,0 +1,104 @@
+import logging
+
+from lrgv.archiver.archiver_error import ArchiverError
+from lrgv.archiver.clip_container import ClipContainer
+from lrgv.dataflow import SimpleSink
+import lrgv.archiver.clip_container as clip_container
+import lrgv.util.file_utils as file_utils
+
+
+_logger = logging.getLogger(__name__)
+
+
+class NightDirPacker(SimpleSink):
+
+    """
+    Packs the files of night subdirectories of a clip directory into
+    clip containers.
+
+    The processor packs the files of each night subdirectory it receives
+    into a new clip container in the parent of the subdirectory, and then
+    deletes the files and the subdirectory. See the `clip_container`
+    module for more about clip containers.
+    """
+
+
+    def __init__(self, settings, parent=None, name=None):
+
+        super().__init__(settings, parent, name)
+
+        # Optional `ArchiverIndex`.
+        self._index = settings.get('index')
+
+
+    def _process_item(self, night_dir, finished):
+
+        dir_path = night_dir.path
+        parent_dir_path = dir_path.parent
+
+        file_paths = tuple(f.path for f in file_utils.scan_dir(dir_path))
+
+        # Delete any files that were already packed, for example by a
+        # previous attempt to pack this directory that was interrupted
+        # after writing its container but before deleting its files.
+        packed_file_paths = self._get_packed_file_paths(
+            file_paths, parent_dir_path, night_dir.night)
+        self._delete_files(packed_file_paths)
+
+        packed_file_paths = frozenset(packed_file_paths)
+        file_paths = tuple(p for p in file_paths if p not in packed_file_paths)
+
+        if len(file_paths) != 0:
+
+            container_file_path = clip_container.get_new_container_file_path(
+                parent_dir_path, night_dir.night)
+
+            clip_container.write_container(container_file_path, file_paths)
+
+            self._delete_files(file_paths)
+
+            _logger.info(
+                f'Processor "{self.path}" packed {len(file_paths)} files '
+                f'of directory "{dir_path}" into clip container '
+                f'"{container_file_path}".')
+
+        # Delete night directory, which should now be empty. Some other
+        # processor may have added files to it in the meantime, in which
+        # case we will pack them the next time around.
+        try:
+            dir_path.rmdir()
+        except OSError:
+            pass
+
+
+    def _get_packed_file_paths(self, file_paths, dir_path, night):
+
+        container_file_paths = \
+            clip_container.get_container_file_paths(dir_path, night)
+
+        if len(container_file_paths) == 0:
+            return ()
+
+        containers = tuple(ClipContainer(p) for p in container_file_paths)
+
+        def is_packed(path):
+            size = path.stat().st_size
+            return any(
+                path.name in c and c.get_file_size(path.name) == size
+                for c in containers)
+
+        return tuple(p for p in file_paths if is_packed(p))
+
+
+    def _delete_files(self, file_paths):
+
+        for path in file_paths:
+            try:
+                path.unlink()
+            except Exception as e:
+                raise ArchiverError(
+                    f'Processor "{self.path}" could not delete packed '
+                    f'file "{path}". Error message was: {e}')
+
+        if self._index is not None and len(file_paths) != 0:
+            self._index.record_deletions(file_paths)
@@ -0,0 +1,68 @@
+"""
+Utility functions for clip directories that are partitioned by night.
+
+The archiver `Incoming`, `Created`, and `Archived` clip directories of
+a detector can optionally be partitioned into night subdirectories,
+for example `Archived/2026-04-15`. The night of a clip is the date in
+the station time zone of the noon preceding the clip's start time.
+Partitioning keeps the number of files per directory small, so that
+the costs of listing a directory and of moving files into and out of
+it do not grow over the course of a season.
+"""
+
+
+from datetime import timedelta as TimeDelta
+import os
+from pathlib import Path
+import re
+
+
+_NIGHT_DIR_NAME_RE = re.compile(r'^\d\d\d\d-\d\d-\d\d$')
+
+_ONE_DAY = TimeDelta(days=1)
+
+
+def get_night_date(time, time_zone):
+
+    """
+    Gets the night date of the specified time in the specified time zone.
+    """
+
+    time = time.astimezone(time_zone)
+
+    night_date = time.date()
+    if time.hour < 12:
+        night_date -= _ONE_DAY
+
+    return night_date
+
+
+def get_night_dir_path(dir_path, time, time_zone):
+
+    """
+    Gets the path of the night subdirectory of the specified directory
+    for the specified time.
+    """
+
+    night_date = get_night_date(time, time_zone)
+    return dir_path / str(night_date)
+
+
+def get_night_dir_paths(dir_path):
+
+    """
+    Gets the paths of the existing night subdirectories of the specified
+    directory, sorted by night.
+
+    A directory that does not exist has no night subdirectories.
+    """
+
+    try:
+        with os.scandir(dir_path) as entries:
+            names = [
+                e.name for e in entries
+                if e.is_dir() and _NIGHT_DIR_NAME_RE.match(e.name)]
+    except FileNotFoundError:
+        return ()
+
+    return tuple(Path(dir_path) / name for name in sorted(names))
@@ -1,13 +1,18 @@
-from datetime import datetime as DateTime, timedelta as TimeDelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import (
+    date as Date, datetime as DateTime, timedelta as TimeDelta)
 from zoneinfo import ZoneInfo
 import json
 import logging
-import wave
+import threading
 
 from lrgv.archiver.archiver_error import ArchiverError
 from lrgv.archiver.file_lister import FileLister
 from lrgv.dataflow import LinearGraph, SimpleSink
 from lrgv.util.bunch import Bunch
+from lrgv.util.wave_utils import WaveFileError
+import lrgv.archiver.night_dirs as night_dirs
+import lrgv.util.wave_utils as wave_utils
 
 
 _logger = logging.getLogger(__name__)
@@ -31,19 +36,13 @@ class OldBirdClipConverter(LinearGraph):
             dir_path=s.source_clip_dir_path,
             file_name_re=s.clip_file_name_re,
             recursive=False,
-            file_wait_period=s.clip_file_wait_period)
+            file_wait_period=s.clip_file_wait_period,
+            scheduler=s.get('scheduler'))
         
         lister = FileLister(settings, self)
 
         paths = s.station_paths.detectors[s.short_detector_name]
 
-        # As of this writing, the Old Bird clip converter is the only
-        # processor that uses the `Rejected` clip directory. If in the
-        # future we want to use it more widely we can add a
-        # `paths.rejected_clip_dir_path` setting and use it instead of
-        # the following.
-        rejected_dir_path = paths.incoming_clip_dir_path.parent / 'Rejected'
-
         settings = Bunch(
             station_name=s.station_name,
             recorder_name=s.recorder_name,
@@ -53,8 +52,12 @@ class OldBirdClipConverter(LinearGraph):
             detector_run_time=s.detector_run_time,
             full_detector_name=s.full_detector_name,
             destination_dir_path=paths.incoming_clip_dir_path,
-            rejected_dir_path=rejected_dir_path,
-            clip_classification=s.clip_classification)
+            night_dir_time_zone=paths.night_dir_time_zone,
+            rejected_dir_path=paths.rejected_clip_dir_path,
+            clip_classification=s.clip_classification,
+            conversion_concurrency=s.get('conversion_concurrency'),
+            scheduler=s.get('scheduler'),
+            clip_archiver_key=s.get('clip_archiver_key'))
         
         mover = _ClipFileMover(settings, self)
 
@@ -64,10 +67,121 @@ class OldBirdClipConverter(LinearGraph):
 class _ClipFileMover(SimpleSink):
 
 
-    def _process_item(self, audio_file, finished):
+    """
+    Converts Old Bird clips to Vesper clips, writing a metadata file for
+    each clip and moving its audio file.
+
+    The mover converts several clips at a time if its
+    `conversion_concurrency` setting is more than one, on the threads of
+    a thread pool. It reads only the header of each clip's audio file,
+    and computes the start time and length of the recording of a night's
+    clips only once. The recordings and directories that the threads
+    share are guarded by a lock.
+    """
+
+
+    def __init__(self, settings, parent=None, name=None):
+
+        super().__init__(settings, parent, name)
+
+        # Optional `ActivityScheduler`, and the key with which it
+        # schedules the archiver of the clips that we convert. We wake
+        # that archiver when we move clips into its `Incoming` clip
+        # directory, which it does not watch.
+        self._scheduler = settings.get('scheduler')
+        self._clip_archiver_key = settings.get('clip_archiver_key')
+
+        # Time zone in which to compute the nights of clips if our
+        # destination directory is partitioned by night, or `None` if
+        # it is not.
+        self._night_dir_time_zone = settings.get('night_dir_time_zone')
+
+        # Maximum number of clips to convert at once, and executor that
+        # converts them when that number is more than one.
+        self._concurrency = settings.get('conversion_concurrency') or 1
+        self._executor = None
+
+        # Mapping from (night, sample rate) pairs to (recording start
+        # time, recording length, recording end time) triples. The Old
+        # Bird detector runs at the same time each night, so all of the
+        # clips of a night have the same recording.
+        self._recordings = {}
+
+        # Directories that we have created or found to exist while
+        # processing the current items.
+        self._dir_paths = set()
+
+        # Lock that guards `self._recordings` and `self._dir_paths`,
+        # which are shared by the threads that convert clips.
+        self._lock = threading.Lock()
+
+
+    def _process_items(self, audio_files, finished):
+
+        if len(audio_files) == 0:
+            return
+
+        self._dir_paths = set()
 
         _logger.info(
-            f'Processor "{self.path}" processing file "{audio_file.path}"...')
+            f'Processor "{self.path}" processing {len(audio_files)} '
+            f'files...')
+
+        if self._concurrency == 1 or len(audio_files) == 1:
+            results = map(self._process_audio_file, audio_files)
+        else:
+            results = self._get_executor().map(
+                self._process_audio_file, audio_files)
+
+        failed_count = 0
+        moved_count = 0
+
+        for error, new_file_path in results:
+
+            if error is not None:
+                _logger.error(str(error))
+                failed_count += 1
+
+            if new_file_path is not None:
+                moved_count += 1
+
+        # Wake the archiver of our clips if we moved any, even if only
+        # to our rejected clip directory, which is harmless.
+        if moved_count != 0 and self._scheduler is not None and \
+                self._clip_archiver_key is not None:
+            self._scheduler.wake(self._clip_archiver_key)
+
+        if failed_count != 0:
+            raise ArchiverError(
+                f'Processor "{self.path}" could not process {failed_count} '
+                f'of {len(audio_files)} files. See log for details.')
+
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self._concurrency, thread_name_prefix=self.path)
+        return self._executor
+
+
+    def _process_audio_file(self, audio_file):
+
+        """
+        Converts one Old Bird clip.
+
+        Returns an `(error, new_file_path)` pair. `error` is an
+        `ArchiverError` if the conversion failed, or `None` if it
+        succeeded. `new_file_path` is the path to which the clip's
+        audio file was moved, or `None` if it was not moved.
+        """
+
+        try:
+            return None, self._convert_clip(audio_file)
+        except ArchiverError as e:
+            return e, None
+
+
+    def _convert_clip(self, audio_file):
 
         s = self.settings
 
@@ -76,26 +190,26 @@ class _ClipFileMover(SimpleSink):
         clip_start_time = _get_clip_start_time(match, s.station_time_zone)
         clip_serial_num = int(match.group('num'))
 
-        # Get clip length and sample rate from audio file.
-        with wave.open(str(audio_file.path), 'rb') as wave_reader:
-            clip_length = wave_reader.getnframes()
-            sample_rate = wave_reader.getframerate()
-        
+        # Get clip length and sample rate from audio file header.
+        try:
+            header = wave_utils.read_wave_file_header(audio_file.path)
+        except (OSError, WaveFileError) as e:
+            raise ArchiverError(
+                f'Processor "{self.path}" could not read header of audio '
+                f'file "{audio_file.path}". Error message was: {e}')
+        clip_length = header.frame_count
+        sample_rate = header.sample_rate
+
         # Get recording start time and length.
-        recording_start_time = _get_recording_start_time(
-            clip_start_time, s.detector_start_time, s.station_time_zone)
-        recording_length = \
-            int(round(s.detector_run_time * 3600 * sample_rate))
-        
+        night = _get_night(match)
+        recording_start_time, recording_length, recording_end_time = \
+            self._get_recording(night, sample_rate)
+
         clip_dur = TimeDelta(seconds=clip_length / sample_rate)
         clip_end_time = clip_start_time + clip_dur
 
-        recording_dur = TimeDelta(seconds=recording_length / sample_rate)
-        recording_end_time = recording_start_time + recording_dur
-
         if clip_end_time > recording_end_time:
-            self._reject_clip(audio_file)
-            return
+            return self._reject_clip(audio_file)
 
         # Get clip annotations.
         if s.clip_classification is None:
@@ -116,21 +230,21 @@ class _ClipFileMover(SimpleSink):
         file_name_stem = _get_clip_file_name_stem(
             s.station_name, clip_start_time, clip_serial_num)
         metadata_file_name = f'{file_name_stem}{_METADATA_FILE_NAME_EXTENSION}'
-        metadata_file_path = s.destination_dir_path / metadata_file_name
+        metadata_file_path = \
+            self._get_destination_dir_path(clip_start_time) / \
+            metadata_file_name
 
         # Create metadata file parent directories if needed.
+        self._create_dir(metadata_file_path.parent)
+
+        # Write metadata file.
         try:
-            metadata_file_path.parent.mkdir(
-                mode=0o755, parents=True, exist_ok=True)
+            with open(metadata_file_path, 'wt') as file:
+                json.dump(metadata, file, indent=4)
         except Exception as e:
             raise ArchiverError(
-                f'Processor "{self.path}" could not create one or more '
-                f'parent directories for file "{metadata_file_path}". '
-                f'Error message was: {e}')
-
-        # Write metadata file.
-        with open(metadata_file_path, 'wt') as file:
-            json.dump(metadata, file, indent=4)
+                f'Processor "{self.path}" could not write file '
+                f'"{metadata_file_path}". Error message was: {e}')
 
         new_audio_file_path = \
             metadata_file_path.with_suffix(_AUDIO_FILE_NAME_EXTENSION)
@@ -143,22 +257,77 @@ class _ClipFileMover(SimpleSink):
                 f'"{audio_file.path}" to "{new_audio_file_path}". '
                 f'Error message was: {e}')
         
+        return new_audio_file_path
 
-    def _reject_clip(self, audio_file):
 
-        s = self.settings
+    def _get_recording(self, night, sample_rate):
 
-        rejected_file_path = s.rejected_dir_path / audio_file.path.name
+        """
+        Gets the start time, length, and end time of the recording of
+        the specified night with the specified sample rate.
+        """
+
+        key = (night, sample_rate)
+
+        with self._lock:
+
+            recording = self._recordings.get(key)
 
-        # Create rejected clip parent directories if needed.
+            if recording is None:
+                s = self.settings
+                start_time = _get_recording_start_time(
+                    night, s.detector_start_time, s.station_time_zone)
+                length = int(round(
+                    s.detector_run_time * 3600 * sample_rate))
+                end_time = \
+                    start_time + TimeDelta(seconds=length / sample_rate)
+                recording = (start_time, length, end_time)
+                self._recordings[key] = recording
+
+        return recording
+
+
+    def _create_dir(self, dir_path):
+
+        with self._lock:
+            if dir_path in self._dir_paths:
+                return
+
+        # We create the directory without holding the lock so that
+        # threads creating different directories do not wait for each
+        # other. Threads that create the same directory at once are
+        # harmless since `mkdir` tolerates existing directories.
         try:
-            rejected_file_path.parent.mkdir(
-                mode=0o755, parents=True, exist_ok=True)
+            dir_path.mkdir(mode=0o755, parents=True, exist_ok=True)
         except Exception as e:
             raise ArchiverError(
-                f'Processor "{self.path}" could not create one or more '
-                f'parent directories for file "{rejected_file_path}". '
-                f'Error message was: {e}')
+                f'Processor "{self.path}" could not create directory '
+                f'"{dir_path}". Error message was: {e}')
+
+        with self._lock:
+            self._dir_paths.add(dir_path)
+
+
+    def _get_destination_dir_path(self, clip_start_time):
+
+        dir_path = self.settings.destination_dir_path
+
+        if self._night_dir_time_zone is None:
+            return dir_path
+        
+        else:
+            return night_dirs.get_night_dir_path(
+                dir_path, clip_start_time, self._night_dir_time_zone)
+
+
+    def _reject_clip(self, audio_file):
+
+        s = self.settings
+
+        rejected_file_path = s.rejected_dir_path / audio_file.path.name
+
+        # Create rejected clip directory if needed.
+        self._create_dir(rejected_file_path.parent)
 
         # Move rejected clip.
         try:
@@ -168,13 +337,15 @@ class _ClipFileMover(SimpleSink):
                 f'Processor "{self.path}" could not move file '
                 f'"{audio_file.path}" to "{rejected_file_path}". '
                 f'Error message was: {e}')
-
+        
         _logger.warning(
             f'Processor "{self.path}" rejected clip "{audio_file.path}", '
             f'which ends after the recording that is supposed to contain '
             f'it. The clip will not be archived and has been moved to '
             f'"{rejected_file_path}".')
 
+        return rejected_file_path
+
 
 def _get_clip_start_time(match, station_time_zone):
 
@@ -201,16 +372,26 @@ def _get_clip_file_name_stem(station_name, start_time, serial_num):
     return f'{station_name}_{start_time_text}_{serial_num:02d}'
 
 
-def _get_recording_start_time(
-        clip_start_time, detector_start_time, station_time_zone):
+def _get_night(match):
+
+    # Clip file names contain local start times, so we get the night of
+    # a clip from its file name without any time zone conversion.
+
+    group = match.group
+
+    night = Date(
+        int(group('year')), int(group('month')), int(group('day')))
+
+    if int(group('hour')) < 12:
+        night -= TimeDelta(days=1)
 
-    dt = clip_start_time.astimezone(station_time_zone)
+    return night
 
-    date = dt.date()
-    if dt.hour < 12:
-        date -= TimeDelta(days=1)
 
-    dt = DateTime.combine(date, detector_start_time, station_time_zone)
+def _get_recording_start_time(
+        night, detector_start_time, station_time_zone):
+
+    dt = DateTime.combine(night, detector_start_time, station_time_zone)
 
     return dt.astimezone(_UTC)
 
@@ -15,7 +15,8 @@ class OldBirdClipDeleter(LinearGraph):
             dir_path=s.source_clip_dir_path,
             file_name_re=s.clip_file_name_re,
             recursive=False,
-            file_wait_period=s.clip_file_wait_period)
+            file_wait_period=s.clip_file_wait_period,
+            scheduler=s.get('scheduler'))
         lister = FileLister(settings, self)
 
         deleter = FileDeleter(settings, self)
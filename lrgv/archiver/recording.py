@@ -4,82 +4,181 @@ Convenience interface for recording data stored in a JSON metadata file.
 The metadata file format provides for the description of metadata for
 any number of recordings, but this class assumes that each file describes
 exactly one recording.
+
+Like `Clip`, this class uses slots, parses its metadata fields just
+once, interns repeated strings, and can optionally drop its reference
+to the parsed contents of its metadata file after extracting its fields
+from them.
 """
 
 
 from datetime import datetime as DateTime
 import json
+import sys
 
 
 class Recording:
 
 
-    def __init__(self, metadata_file_path):
+    __slots__ = (
+        '_metadata_file_path', '_metadata_cache', '_drop_metadata',
+        '_metadata_file_contents', '_fields_parsed', '_id',
+        '_station_name', '_recorder_name', '_mic_output_names',
+        '_start_time', '_length', '_sample_rate')
+
+
+    def __init__(
+            self, metadata_file_path, metadata_cache=None,
+            drop_metadata=False):
+
+        """
+        Initializes this recording.
+
+        See `Clip.__init__` for a description of the parameters.
+        """
+
         self._metadata_file_path = metadata_file_path
+        self._metadata_cache = metadata_cache
+        self._drop_metadata = drop_metadata
         self._metadata_file_contents = None
+        self._fields_parsed = False
 
 
     @property
     def metadata_file_path(self):
         return self._metadata_file_path
-    
+
 
     @property
     def metadata_file_contents(self):
 
-        if self._metadata_file_contents is None:
-            with open(self.metadata_file_path, newline='') as file:
-                self._metadata_file_contents = json.load(file)
+        contents = self._metadata_file_contents
 
-        return self._metadata_file_contents
+        if contents is None:
 
- 
-    @property
-    def _metadata(self):
-       return self.metadata_file_contents['recordings'][0]
+            contents = self._load_metadata_file_contents()
+
+            # Retain the contents unless we drop them and have already
+            # parsed our fields, in which case `_parse_fields` will not
+            # drop them for us.
+            if not self._drop_metadata or not self._fields_parsed:
+                self._metadata_file_contents = contents
+
+        return contents
+
+
+    def _load_metadata_file_contents(self):
+
+        if self._metadata_cache is None:
+            return _load_metadata_file(self.metadata_file_path)
+
+        else:
+            # Note that the cached contents are shared with other
+            # objects for the same file, so they must not be
+            # modified without first evicting them from the cache.
+            return self._metadata_cache.get(
+                self.metadata_file_path, _load_metadata_file)
+
+
+    def _parse_fields(self):
+
+        contents = self._metadata_file_contents
+        if contents is None:
+            contents = self._load_metadata_file_contents()
+
+        metadata = contents['recordings'][0]
+
+        # Not every recording metadata file includes a recording ID,
+        # so we use `None` when it is absent.
+        self._id = metadata.get('id')
+
+        self._station_name = sys.intern(metadata['station'])
+        self._recorder_name = sys.intern(metadata['recorder'])
+        self._mic_output_names = \
+            [sys.intern(n) for n in metadata['mic_outputs']]
+        self._start_time = _parse_start_time(metadata['start_time'])
+        self._length = int(metadata['length'])
+        self._sample_rate = int(metadata['sample_rate'])
+
+        # Drop the contents if indicated, including contents that were
+        # passed to the initializer or loaded by the
+        # `metadata_file_contents` property before we got here.
+        if self._drop_metadata:
+            self._metadata_file_contents = None
+        else:
+            self._metadata_file_contents = contents
+
+        self._fields_parsed = True
 
 
     @property
     def id(self):
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._id
+
+
+    @id.setter
+    def id(self, id):
+
+        # Parse fields first so parsing does not overwrite the new ID.
+        if not self._fields_parsed:
+            self._parse_fields()
+
+        self._id = id
 
-        # Not every recording metadata file includes a clip ID, so we
-        # return `None` when it is absent.
-        try:
-            return self._metadata['id']
-        except KeyError:
-            return None
-            
 
     @property
     def station_name(self):
-        return self._metadata['station']
-    
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._station_name
+
 
     @property
     def recorder_name(self):
-        return self._metadata['recorder']
-    
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._recorder_name
+
 
     @property
     def mic_output_names(self):
-        return self._metadata['mic_outputs']
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._mic_output_names
 
 
     @property
     def start_time(self):
-
-        # Get start time in ISO 8601 format.
-        date, time, tz = self._metadata['start_time'].split()
-        start_time = f'{date}T{time}{tz}'
-
-        return DateTime.fromisoformat(start_time)
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._start_time
 
 
     @property
     def length(self):
-        return int(self._metadata['length'])
-    
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._length
+
 
     @property
     def sample_rate(self):
-        return int(self._metadata['sample_rate'])
+        if not self._fields_parsed:
+            self._parse_fields()
+        return self._sample_rate
+
+
+def _load_metadata_file(file_path):
+    with open(file_path, newline='') as file:
+        return json.load(file)
+
+
+def _parse_start_time(start_time):
+
+    # Get start time in ISO 8601 format.
+    date, time, tz = start_time.split()
+    start_time = f'{date}T{time}{tz}'
+
+    return DateTime.fromisoformat(start_time)
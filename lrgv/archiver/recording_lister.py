@@ -2,8 +2,10 @@ import re
 import time
 
 from lrgv.archiver.recording import Recording
+from lrgv.archiver.file_stability_detector import FileStabilityDetector
 from lrgv.dataflow import SimpleSource
 from lrgv.util.bunch import Bunch
+import lrgv.util.file_utils as file_utils
 
 
 _RECORDING_METADATA_FILE_NAME_RE = re.compile(
@@ -22,41 +24,124 @@ _RECORDING_METADATA_FILE_NAME_RE = re.compile(
 class RecordingLister(SimpleSource):
 
 
+    def __init__(self, settings, parent=None, name=None):
+
+        super().__init__(settings, parent, name)
+
+        # Optional `ArchiverIndex` and the archiver stage of our
+        # recording directory in it.
+        self._index = settings.get('index')
+        self._index_stage = settings.get('index_stage')
+
+        # Optional `MetadataCache`.
+        self._metadata_cache = settings.get('metadata_cache')
+
+        # `True` if and only if the recordings we create should drop the
+        # parsed contents of their metadata files after extracting their
+        # fields. This saves memory when our consumers need only the
+        # fields.
+        self._drop_metadata = settings.get('drop_metadata', False)
+
+        # Optional `ActivityScheduler` to which we report activity.
+        self._scheduler = settings.get('scheduler')
+
+        # Optional `FileStabilityDetector`. If we have one, we use it
+        # instead of just our file wait period to decide when files
+        # are ready.
+        stability = settings.get('file_stability')
+        if stability is None:
+            self._stability_detector = None
+        else:
+            self._stability_detector = FileStabilityDetector(
+                stability.period, settings.recording_file_wait_period,
+                stability.validate_wave_headers,
+                stability.get('validate_json_files', False))
+
+
     def _process_items(self):
 
         s = self.settings
 
-        # Start with all file paths, sorted lexicographically.
-        file_paths = tuple(sorted(p for p in s.recording_dir_path.glob('*')))
+        # Start with all files, sorted lexicographically by path.
+        dir_files = self._get_dir_files()
 
         # Exclude files that aren't recording metadata files.
-        files = self._get_matching_files(file_paths)
+        files = self._get_matching_files(dir_files)
+        matching_file_count = len(files)
+
+        # Exclude files that are not yet ready, for example since they
+        # were modified too recently.
+        if self._stability_detector is not None:
+            stable_paths = self._stability_detector.get_stable_paths(dir_files)
+            files = tuple(f for f in files if f.path in stable_paths)
 
-        # If indicated, exclude files that were modified too recently.
-        if s.recording_file_wait_period is not None:
+        elif s.recording_file_wait_period is not None:
             files = tuple(
                 f for f in files
-                if _time_from_last_mod(f.path) >= s.recording_file_wait_period)
+                if _time_from_last_mod(f.info) >= s.recording_file_wait_period)
 
         # Create recordings.
-        recordings = tuple(Recording(f.path) for f in files)
+        recordings = tuple(
+            Recording(f.path, self._metadata_cache, self._drop_metadata)
+            for f in files)
+
+        if self._scheduler is not None:
+            self._scheduler.record_activity(
+                len(recordings), matching_file_count - len(recordings))
 
         return recordings, False
 
 
-    def _get_matching_files(self, file_paths):
+    def _get_dir_files(self):
+
+        dir_path = self.settings.recording_dir_path
+
+        if self._index is None:
+            return file_utils.scan_dir(dir_path)
+        
+        else:
+            return self._index.list_dir(
+                dir_path, self._index_stage, get_recording_file_name_fields,
+                self.settings.recording_file_wait_period)
+        
+
+    def _get_matching_files(self, dir_files):
 
             files = []
 
-            for p in file_paths:
+            for f in dir_files:
 
-                m = _RECORDING_METADATA_FILE_NAME_RE.match(p.name)
+                m = _RECORDING_METADATA_FILE_NAME_RE.match(f.path.name)
 
                 if m is not None:
-                    files.append(Bunch(path=p, name_match=m))
+                    files.append(Bunch(path=f.path, info=f, name_match=m))
 
             return tuple(files)
     
 
-def _time_from_last_mod(file_path):
-    return time.time() - file_path.stat().st_mtime
+def get_recording_file_name_fields(file_name):
+
+    """
+    Gets the station name and start time of a recording from the name
+    of its metadata file.
+
+    Returns `None` if the file name is not a recording metadata file name.
+    """
+
+    m = _RECORDING_METADATA_FILE_NAME_RE.match(file_name)
+
+    if m is None:
+        return None
+    
+    start_time = (
+        f'{m["year"]}-{m["month"]}-{m["day"]} '
+        f'{m["hour"]}:{m["minute"]}:{m["second"]} Z')
+    
+    return Bunch(
+        station_name=m['station_name'],
+        start_time=start_time,
+        serial_num=None)
+
+
+def _time_from_last_mod(file):
+    return time.time() - file.mtime
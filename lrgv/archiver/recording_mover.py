@@ -1,8 +1,16 @@
 from lrgv.archiver.archiver_error import ArchiverError
+from lrgv.archiver.file_move_recorder import FileMoveRecorder
 from lrgv.dataflow import SimpleSink
 
 
-class RecordingMover(SimpleSink):
+class RecordingMover(FileMoveRecorder, SimpleSink):
+
+
+    def __init__(self, settings, parent=None, name=None):
+
+        super().__init__(settings, parent, name)
+
+        self._init_file_move_recorder(settings)
 
 
     def _process_item(self, recording, finished):
@@ -26,3 +34,5 @@ class RecordingMover(SimpleSink):
                 f'Processor "{self.path}" could not move file '
                 f'"{old_file_path}" to "{new_file_path}". Error message '
                 f'was: {e}')
+        
+        self._record_move(old_file_path, new_file_path)
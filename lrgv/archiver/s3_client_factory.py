@@ -0,0 +1,101 @@
+"""
+Process-wide factory for AWS S3 clients.
+
+Creating a boto3 S3 client is slow, since botocore loads and parses
+large service model files for it, and each client keeps its own pool of
+HTTP connections. Low-level boto3 clients are thread safe, however, so
+one client can serve every processor of an archiver. This module
+creates one client per set of AWS credentials and region, and returns
+that client to all callers.
+"""
+
+
+import logging
+import threading
+import time
+
+from botocore.config import Config
+import boto3
+
+
+_logger = logging.getLogger(__name__)
+
+
+_DEFAULT_MAX_POOL_CONNECTIONS = 10
+
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_s3_client(aws_settings):
+
+    """
+    Gets the shared S3 client for the specified AWS settings, creating
+    it if needed.
+
+    Parameters
+    ----------
+    aws_settings : Bunch
+        AWS settings, including `access_key_id`, `secret_access_key`,
+        and `region_name`, and optionally `upload_concurrency`, the
+        maximum number of concurrent S3 requests. The client's
+        connection pool has one connection per concurrent request.
+
+    Returns
+    -------
+    botocore.client.S3
+        the shared client.
+    """
+
+    aws = aws_settings
+
+    key = (aws.access_key_id, aws.secret_access_key, aws.region_name)
+
+    with _lock:
+
+        client = _clients.get(key)
+
+        if client is None:
+
+            max_pool_connections = \
+                aws.get('upload_concurrency') or \
+                _DEFAULT_MAX_POOL_CONNECTIONS
+
+            start_time = time.perf_counter()
+
+            session = boto3.Session(
+                aws_access_key_id=aws.access_key_id,
+                aws_secret_access_key=aws.secret_access_key,
+                region_name=aws.region_name)
+
+            client = session.client(
+                's3',
+                config=Config(max_pool_connections=max_pool_connections))
+
+            elapsed_time = time.perf_counter() - start_time
+
+            _logger.info(
+                f'Created S3 client for region "{aws.region_name}" with '
+                f'{max_pool_connections} pooled connections in '
+                f'{elapsed_time:.2f} seconds.')
+
+            _clients[key] = client
+
+        return client
+
+
+def clear_s3_clients():
+
+    """
+    Discards the shared S3 clients, closing their connections.
+
+    Subsequent calls to `get_s3_client` create new clients.
+    """
+
+    with _lock:
+        clients = tuple(_clients.values())
+        _clients.clear()
+
+    for client in clients:
+        client.close()
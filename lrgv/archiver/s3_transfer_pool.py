@@ -0,0 +1,270 @@
+"""
+Pool of threads that upload files to AWS S3, shared by all of the clip
+audio file uploaders of an archiver.
+
+The pool sends up to a configurable number of upload requests to S3
+concurrently, across all of the uploads submitted to it. Sharing one
+pool among the uploaders of all stations and detectors bounds the total
+number of concurrent uploads regardless of how many uploaders have
+clips to upload.
+
+The pool streams each file from disk rather than reading it into
+memory, and sends the file's MD5 digest with it so that S3 verifies the
+integrity of the uploaded bytes. It uploads each file with a single
+`PutObject` request rather than with boto3's transfer manager
+(`upload_file` with a `TransferConfig`). Clip audio files are much
+smaller than the transfer manager's multipart threshold, so it would
+also send each with a single request, but through a thread pool of its
+own that would duplicate ours. A single-request upload also gives the
+object an ETag that is the MD5 digest of its contents, which the pool
+relies on to detect objects that are already present. Computing the
+digest reads each file once before it is uploaded. Optionally, the pool
+first checks whether an identical object is already present in S3, in
+which case it skips the upload. That happens, for example, when the
+archiver stops after uploading a clip's audio file but before moving
+the clip to its archived clip directory.
+
+Uploads wait in a priority queue, so that a caller can have some files,
+for example those of the current night's clips, uploaded before others.
+The pool can also limit its total upload bandwidth according to a
+time-of-day schedule, so that it does not saturate a network link that
+it shares with other applications.
+"""
+
+
+from concurrent.futures import Future
+import base64
+import hashlib
+import itertools
+import os
+import queue
+import threading
+
+from botocore.exceptions import ClientError
+
+from lrgv.archiver.s3_client_factory import get_s3_client
+from lrgv.util.bandwidth_limiter import BandwidthLimiter
+
+
+_DEFAULT_CONCURRENCY = 10
+
+_CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+
+class S3TransferPool:
+
+
+    def __init__(self, aws_settings, client=None):
+
+        """
+        Initializes this pool.
+
+        Parameters
+        ----------
+        aws_settings : Bunch
+            AWS settings, including `access_key_id`, `secret_access_key`,
+            and `region_name`, and optionally:
+
+            `upload_concurrency`
+                the maximum number of concurrent upload requests.
+
+            `skip_existing_uploads`
+                whether or not to skip uploads of files whose contents
+                are already present in S3.
+
+            `upload_bandwidth_schedule`
+                the schedule of a `BandwidthLimiter` for uploads, or
+                `None` for no limit.
+
+            `upload_bandwidth_time_zone`
+                the time zone of the bandwidth schedule.
+
+        client : botocore.client.S3 | None
+            the S3 client with which to upload files, or `None` to use
+            the shared client for `aws_settings`.
+        """
+
+        self._aws_settings = aws_settings
+        self._concurrency = \
+            aws_settings.get('upload_concurrency') or _DEFAULT_CONCURRENCY
+        self._skip_existing = \
+            aws_settings.get('skip_existing_uploads', False)
+
+        schedule = aws_settings.get('upload_bandwidth_schedule')
+        if schedule is None:
+            self._limiter = None
+        else:
+            self._limiter = BandwidthLimiter(
+                schedule, aws_settings.get('upload_bandwidth_time_zone'))
+
+        # Queue of pending uploads. Each item is a tuple whose first two
+        # elements are the negated priority of the upload and a
+        # sequence number, so that uploads with higher priorities start
+        # first, and uploads with the same priority start in the order
+        # in which they were submitted.
+        self._queue = queue.PriorityQueue()
+        self._sequence_nums = itertools.count()
+
+        # We get the shared S3 client, if we were not given a client,
+        # and start the worker threads when they are first needed.
+        self._client = client
+        self._threads = None
+        self._lock = threading.Lock()
+
+
+    @property
+    def concurrency(self):
+        return self._concurrency
+
+
+    def upload(self, file_path, bucket_name, object_key, priority=0):
+
+        """
+        Submits a file for upload to S3.
+
+        Uploads with higher priorities start before uploads with lower
+        ones.
+
+        Returns a `concurrent.futures.Future` whose `result` method
+        blocks until the upload completes. The result is `True` if the
+        file was uploaded and `False` if the upload was skipped since
+        the file's contents were already present in S3. The `result`
+        method raises an exception if the upload failed.
+        """
+
+        self._start()
+
+        future = Future()
+
+        self._queue.put((
+            -priority, next(self._sequence_nums), future, file_path,
+            bucket_name, object_key))
+
+        return future
+
+
+    def _start(self):
+
+        with self._lock:
+
+            if self._threads is None:
+
+                if self._client is None:
+                    self._client = get_s3_client(self._aws_settings)
+
+                # The threads are daemon threads so that they do not
+                # keep the archiver running when it exits without
+                # shutting the pool down. An upload interrupted that way
+                # is retried when the archiver restarts.
+                self._threads = tuple(
+                    threading.Thread(
+                        target=self._run, name=f'S3TransferPool-{i}',
+                        daemon=True)
+                    for i in range(self._concurrency))
+
+                for thread in self._threads:
+                    thread.start()
+
+
+    def _run(self):
+
+        while True:
+
+            _, _, future, file_path, bucket_name, object_key = \
+                self._queue.get()
+
+            if future is None:
+                # pool shutting down
+
+                return
+
+            if not future.set_running_or_notify_cancel():
+                # upload cancelled
+
+                continue
+
+            try:
+                result = _upload(
+                    self._client, file_path, bucket_name, object_key,
+                    self._skip_existing, self._limiter)
+
+            except Exception as e:
+                future.set_exception(e)
+
+            else:
+                future.set_result(result)
+
+
+    def shutdown(self):
+
+        """Waits for submitted uploads to complete and stops the pool."""
+
+        with self._lock:
+
+            if self._threads is not None:
+
+                # Queue one stop item per thread, after all uploads.
+                for _ in self._threads:
+                    self._queue.put((
+                        float('inf'), next(self._sequence_nums), None,
+                        None, None, None))
+
+                for thread in self._threads:
+                    thread.join()
+
+                self._threads = None
+
+
+def _upload(
+        client, file_path, bucket_name, object_key, skip_existing,
+        limiter):
+
+    md5 = _get_md5_digest(file_path)
+
+    if skip_existing and \
+            _is_object_present(client, bucket_name, object_key, md5):
+        return False
+
+    if limiter is not None:
+        limiter.acquire(os.path.getsize(file_path))
+
+    with open(file_path, 'rb') as file:
+        client.put_object(
+            Bucket=bucket_name, Key=object_key, Body=file,
+            ContentMD5=base64.b64encode(md5).decode('ascii'))
+
+    return True
+
+
+def _get_md5_digest(file_path):
+
+    md5 = hashlib.md5()
+
+    with open(file_path, 'rb') as file:
+        while chunk := file.read(_CHECKSUM_CHUNK_SIZE):
+            md5.update(chunk)
+
+    return md5.digest()
+
+
+def _is_object_present(client, bucket_name, object_key, md5):
+
+    """
+    Determines whether or not an object with the specified MD5 digest
+    is present in S3.
+
+    The ETag of an object that was uploaded with a single `PutObject`
+    request is the hexadecimal MD5 digest of its contents, in quotes.
+    """
+
+    try:
+        response = client.head_object(Bucket=bucket_name, Key=object_key)
+
+    except ClientError as e:
+
+        if e.response.get('Error', {}).get('Code') in ('404', 'NotFound'):
+            return False
+
+        raise
+
+    return response.get('ETag', '').strip('"') == md5.hex()
@@ -0,0 +1,170 @@
+from pathlib import Path
+import os
+import tempfile
+import time
+
+from lrgv.archiver.activity_scheduler import ActivityScheduler
+from lrgv.util.test_case import TestCase
+
+
+_KEY = 'Station/Detector'
+
+
+class ActivitySchedulerTests(TestCase):
+
+
+    def _run(self, scheduler, now, item_count=0, pending_count=0):
+        scheduler.start_run(_KEY)
+        scheduler.record_activity(item_count, pending_count)
+        scheduler.end_run(now=now)
+
+
+    def test_periods(self):
+
+        scheduler = ActivityScheduler(1, 10, 2)
+
+        # New keys are due immediately.
+        self.assertTrue(scheduler.is_due(_KEY, now=0))
+
+        # Busy keys remain due.
+        self._run(scheduler, 100, item_count=3)
+        self.assertEqual(scheduler.get_period(_KEY), 0)
+        self.assertTrue(scheduler.is_due(_KEY, now=100))
+
+        # Keys with pending items are due after the minimum period.
+        self._run(scheduler, 100, pending_count=1)
+        self.assertEqual(scheduler.get_period(_KEY), 1)
+        self.assertFalse(scheduler.is_due(_KEY, now=100.5))
+        self.assertTrue(scheduler.is_due(_KEY, now=101))
+
+        # Idle keys back off up to the maximum period.
+        periods = []
+        for _ in range(5):
+            self._run(scheduler, 100)
+            periods.append(scheduler.get_period(_KEY))
+        self.assertEqual(periods, [2, 4, 8, 10, 10])
+        self.assertEqual(scheduler.get_next_due_time(), 110)
+
+        # Failed runs also back off.
+        self._run(scheduler, 100, item_count=1)
+        scheduler.start_run(_KEY)
+        scheduler.record_activity(1)
+        scheduler.end_run(failed=True, now=100)
+        self.assertEqual(scheduler.get_period(_KEY), 2)
+
+
+    def test_blocked(self):
+
+        scheduler = ActivityScheduler(1, 10, 2)
+
+        # A busy key that was blocked is not due until the retry time.
+        scheduler.start_run(_KEY)
+        scheduler.record_activity(3)
+        scheduler.record_blocked(105)
+        scheduler.record_blocked(104)
+        scheduler.end_run(now=100)
+        self.assertFalse(scheduler.is_due(_KEY, now=104))
+        self.assertTrue(scheduler.is_due(_KEY, now=105))
+
+        # Blocks do not carry over to later runs.
+        self._run(scheduler, 110, item_count=1)
+        self.assertTrue(scheduler.is_due(_KEY, now=110))
+
+
+    def test_unblock(self):
+
+        scheduler = ActivityScheduler(1, 10, 2)
+        other_key = 'Station/Other Detector'
+
+        def run(key, cause):
+            scheduler.start_run(key)
+            scheduler.record_activity(1)
+            scheduler.record_blocked(200, cause)
+            scheduler.end_run(now=100)
+
+        run(_KEY, 'Vesper')
+        run(other_key, 'S3')
+
+        # Removing a cause of no block does nothing.
+        scheduler.unblock('Recordings')
+        self.assertFalse(scheduler.is_due(_KEY, now=100))
+        self.assertFalse(scheduler.is_due(other_key, now=100))
+
+        # Removing a cause makes due only the keys it blocked.
+        scheduler.unblock('Vesper')
+        self.assertTrue(scheduler.is_due(_KEY, now=100))
+        self.assertFalse(scheduler.is_due(other_key, now=100))
+
+        # A later run that is not blocked by the cause is not unblocked
+        # by it.
+        self._run(scheduler, 100)
+        scheduler.unblock('Vesper')
+        self.assertFalse(scheduler.is_due(_KEY, now=100))
+
+
+    def test_deferred(self):
+
+        scheduler = ActivityScheduler(1, 10, 2)
+
+        # A key whose output items were all deferred has pending items.
+        scheduler.start_run(_KEY)
+        scheduler.record_activity(3)
+        scheduler.record_deferred(3)
+        scheduler.end_run(now=100)
+        self.assertEqual(scheduler.get_period(_KEY), 1)
+
+        # A key with output items that were not deferred is busy.
+        scheduler.start_run(_KEY)
+        scheduler.record_activity(3)
+        scheduler.record_deferred(2)
+        scheduler.end_run(now=100)
+        self.assertEqual(scheduler.get_period(_KEY), 0)
+
+
+    def test_wake(self):
+
+        scheduler = ActivityScheduler(1, 10, 2)
+
+        for _ in range(3):
+            self._run(scheduler, 100)
+        self.assertFalse(scheduler.is_due(_KEY, now=100))
+
+        scheduler.wake(_KEY)
+        self.assertTrue(scheduler.is_due(_KEY, now=100))
+
+        # `sleep` returns immediately since the key is due.
+        scheduler.sleep()
+
+
+    def test_min_sleep_period(self):
+
+        scheduler = ActivityScheduler(1, 10, 2, min_sleep_period=.05)
+
+        # `sleep` sleeps for the minimum period even though the key is
+        # due.
+        self._run(scheduler, 0, item_count=1)
+        start_time = time.monotonic()
+        scheduler.sleep()
+        self.assertGreaterEqual(time.monotonic() - start_time, .05)
+
+
+    def test_watch(self):
+
+        with tempfile.TemporaryDirectory() as dir_name:
+
+            dir_path = Path(dir_name)
+
+            scheduler = ActivityScheduler(1, 10, 2, watch_period=.01)
+            scheduler.watch(_KEY, dir_path)
+
+            for _ in range(3):
+                self._run(scheduler, 1e12)
+            self.assertFalse(scheduler.is_due(_KEY))
+
+            # Change directory modification time.
+            stat = dir_path.stat()
+            os.utime(
+                dir_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+            scheduler.sleep()
+            self.assertTrue(scheduler.is_due(_KEY))
@@ -0,0 +1,130 @@
+from datetime import date as Date, datetime as DateTime
+from pathlib import Path
+import os
+import tempfile
+
+from lrgv.archiver.archiver_index import ArchiverIndex
+from lrgv.archiver.clip_lister import get_clip_file_name_fields
+from lrgv.util.test_case import TestCase
+
+
+_CLIP_FILE_NAMES = (
+    'Alamo_2025-08-05_04.00.00.000_Z_00.json',
+    'Alamo_2025-08-05_04.00.00.000_Z_00.wav',
+    'Alamo_2025-08-05_04.01.00.000_Z_01.json',
+    'Alamo_2025-08-05_04.01.00.000_Z_01.wav',
+)
+
+
+class ArchiverIndexTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+        self._index = ArchiverIndex(self._dir_path / 'Index.sqlite')
+
+
+    def tearDown(self):
+        self._index.close()
+        self._temp_dir.cleanup()
+
+
+    def test_list_dir(self):
+
+        dir_path = self._create_clip_dir()
+
+        files = self._index.list_dir(
+            dir_path, 'Incoming', get_clip_file_name_fields)
+
+        self.assertEqual(
+            tuple(f.path.name for f in files), _CLIP_FILE_NAMES)
+        self.assertEqual(self._index.get_file_counts(), {'Incoming': 2})
+        self.assertEqual(
+            self._index.get_file_counts('Donna'), {})
+        
+        # Make directory look old enough that index will trust its
+        # modification time, and list it again. The files should come
+        # from the index.
+        _set_mtime(dir_path, 100)
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+        self._index.reconcile(
+            dir_path, mtime_ns, 'Incoming',
+            ((f, get_clip_file_name_fields(f.path.name)) for f in files))
+        self.assertTrue(self._index.is_dir_unchanged(dir_path, mtime_ns))
+        files = self._index.list_dir(
+            dir_path, 'Incoming', get_clip_file_name_fields)
+        self.assertEqual(
+            tuple(f.path.name for f in files), _CLIP_FILE_NAMES)
+
+        # Remove a file. The directory modification time changes, so
+        # the directory is listed again and the index is reconciled.
+        (dir_path / _CLIP_FILE_NAMES[0]).unlink()
+        files = self._index.list_dir(
+            dir_path, 'Incoming', get_clip_file_name_fields)
+        self.assertEqual(
+            tuple(f.path.name for f in files), _CLIP_FILE_NAMES[1:])
+        self.assertEqual(self._index.get_file_counts(), {'Incoming': 1})
+
+
+    def _create_clip_dir(self):
+        dir_path = self._dir_path / 'Incoming'
+        dir_path.mkdir()
+        for name in _CLIP_FILE_NAMES:
+            (dir_path / name).write_text('')
+        return dir_path
+
+
+    def test_record_move(self):
+
+        dir_path = self._create_clip_dir()
+        self._index.list_dir(dir_path, 'Incoming', get_clip_file_name_fields)
+
+        archived_dir_path = self._dir_path / 'Archived'
+        archived_dir_path.mkdir()
+
+        for name in _CLIP_FILE_NAMES[:2]:
+            old_path = dir_path / name
+            new_path = archived_dir_path / name
+            old_path.rename(new_path)
+            self._index.record_move(old_path, new_path, 'Archived')
+
+        self.assertEqual(
+            self._index.get_file_counts(), {'Archived': 1, 'Incoming': 1})
+        self.assertEqual(
+            len(self._index.get_dir_files(archived_dir_path)), 2)
+
+
+
+    def test_record_recording(self):
+
+        night = Date(2025, 8, 4)
+        start_times = (
+            DateTime.fromisoformat('2025-08-05T02:00:00Z'),
+            DateTime.fromisoformat('2025-08-05T06:00:00Z'))
+
+        for i, start_time in enumerate(start_times):
+            self._index.record_recording(
+                'Alamo', 'Vesper Recorder 0', night, start_time, i)
+
+        # Recording the same recording again has no effect.
+        self._index.record_recording(
+            'Alamo', 'Vesper Recorder 0', night, start_times[0], 0)
+
+        cases = (
+            ('Alamo', 'Vesper Recorder 0', night, start_times),
+            ('Alamo', 'Vesper Recorder 1', night, ()),
+            ('Donna', 'Vesper Recorder 0', night, ()),
+            ('Alamo', 'Vesper Recorder 0', Date(2025, 8, 5), ()),
+        )
+
+        for station_name, recorder_name, night, expected in cases:
+            result = self._index.get_recording_start_times(
+                station_name, recorder_name, night)
+            expected = frozenset(t.isoformat() for t in expected)
+            self.assertEqual(result, expected)
+
+
+def _set_mtime(path, age):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime - age, stat.st_mtime - age))
@@ -65,6 +65,48 @@ class ClipTests(TestCase):
         self.assertEqual(clip.audio_file_path, audio_file_path)
 
 
+    def test_drop_metadata(self):
+
+        metadata_file_path = _create_metadata_file_path(1)
+        clip = Clip(metadata_file_path, drop_metadata=True)
+
+        # Fields remain available after metadata are dropped.
+        self._check_constant_attributes(clip)
+        self.assertIsNone(clip._metadata_file_contents)
+
+        # Metadata are loaded again if needed, but not retained.
+        contents = clip.metadata_file_contents
+        self.assertEqual(contents['clips'][0]['id'], _EXPECTED_ID)
+        self.assertIsNone(clip._metadata_file_contents)
+
+        # Metadata passed to the initializer are dropped, too.
+        clip = Clip(
+            metadata_file_path, drop_metadata=True,
+            metadata_file_contents=contents)
+        self._check_constant_attributes(clip)
+        self.assertIsNone(clip._metadata_file_contents)
+
+        # So are metadata loaded before fields are parsed.
+        clip = Clip(metadata_file_path, drop_metadata=True)
+        clip.metadata_file_contents
+        self._check_constant_attributes(clip)
+        self.assertIsNone(clip._metadata_file_contents)
+
+
+    def test_id_setter(self):
+        clip = Clip(_create_metadata_file_path(0))
+        clip.id = _EXPECTED_ID
+        self.assertEqual(clip.id, _EXPECTED_ID)
+        self._check_constant_attributes(clip)
+
+
+    def test_interning(self):
+        clip_0 = Clip(_create_metadata_file_path(0))
+        clip_1 = Clip(_create_metadata_file_path(1))
+        self.assertIs(clip_0.station_name, clip_1.station_name)
+        self.assertIs(clip_0.mic_output_name, clip_1.mic_output_name)
+
+
 def _create_metadata_file_path(num):
     file_name = f'Clip {num}.json'
     return _DATA_DIR_PATH / file_name
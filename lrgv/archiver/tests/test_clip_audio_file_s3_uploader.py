@@ -0,0 +1,158 @@
+from concurrent.futures import Future
+from pathlib import Path
+import shutil
+import tempfile
+
+from lrgv.archiver.activity_scheduler import ActivityScheduler
+from lrgv.archiver.clip import Clip
+from lrgv.archiver.clip_audio_file_s3_uploader import (
+    ClipAudioFileS3Uploader, ClipAudioFileUploadStarter)
+from lrgv.util.bunch import Bunch
+from lrgv.util.test_case import TestCase
+
+
+_DATA_DIR_PATH = Path(__file__).parent / 'data'
+_KEY = 'Station/Detector'
+_AWS = Bunch(s3_clip_bucket_name='Bucket', s3_clip_folder_path='')
+
+
+class ClipAudioFileS3UploaderTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_uploads_collected_on_later_ticks(self):
+
+        clips = [self._create_clip(i) for i in (0, 1)]
+        pool = _Pool()
+        scheduler = ActivityScheduler(1, 10, 2)
+        uploader = _create_uploader(pool, scheduler)
+
+        # Uploads are submitted without waiting for them to complete.
+        output = self._run(uploader, scheduler, clips)
+        self.assertEqual(output, ())
+        self.assertEqual(len(pool.futures), 2)
+
+        # Clips whose uploads are in progress count as pending, even
+        # if they are listed again.
+        self.assertEqual(scheduler.get_period(_KEY), 1)
+        output = self._run(uploader, scheduler, clips)
+        self.assertEqual(output, ())
+        self.assertEqual(len(pool.futures), 2)
+        self.assertEqual(scheduler.get_period(_KEY), 1)
+
+        # Completed uploads are output on the next tick, whether or not
+        # their clips are listed again.
+        futures = [pool.futures[k] for k in sorted(pool.futures)]
+        futures[0].set_result(True)
+        futures[1].set_exception(OSError('Upload failed.'))
+        output = self._run(uploader, scheduler, ())
+        self.assertEqual(output, (clips[0],))
+
+        # The failed upload is retried when its clip is listed again.
+        output = self._run(uploader, scheduler, clips[1:])
+        self.assertEqual(output, ())
+        self.assertEqual(pool.submission_count, 3)
+
+
+    def test_finished(self):
+
+        clip = self._create_clip(0)
+        pool = _Pool(complete=True)
+        uploader = _create_uploader(pool)
+
+        output = uploader._process_items((clip,), True)
+        self.assertEqual(output, (clip,))
+
+
+    def test_started_uploads(self):
+
+        clips = [self._create_clip(i) for i in (0, 1)]
+        pool = _Pool()
+        starter = ClipAudioFileUploadStarter(_AWS, pool)
+        uploader = _create_uploader(pool, upload_starter=starter)
+
+        # The uploader uses the upload that the starter started for the
+        # first clip, and starts its own upload for the second.
+        starter.start_upload(clips[0])
+        self.assertEqual(pool.submission_count, 1)
+        uploader._process_items(tuple(clips), False)
+        self.assertEqual(pool.submission_count, 2)
+        self.assertEqual(len(pool.futures), 2)
+
+        # The starter forgets an upload once it is popped.
+        self.assertIsNone(starter.pop_upload(clips[0].audio_file_path))
+
+        for future in pool.futures.values():
+            future.set_result(True)
+        output = uploader._process_items((), False)
+        self.assertEqual(output, tuple(clips))
+
+
+    def test_stale_started_uploads(self):
+
+        clips = [self._create_clip(i) for i in (0, 1, 2)]
+        pool = _Pool()
+        starter = ClipAudioFileUploadStarter(_AWS, pool, retention_period=0)
+
+        for clip in clips[:2]:
+            starter.start_upload(clip)
+        futures = list(pool.futures.values())
+        futures[0].set_result(True)
+
+        # Starting another upload forgets the completed upload that
+        # was never popped, for example because its clip was set
+        # aside, but not the upload that is still in progress.
+        starter.start_upload(clips[2])
+        self.assertIsNone(starter.pop_upload(clips[0].audio_file_path))
+        self.assertIs(starter.pop_upload(clips[1].audio_file_path), futures[1])
+        self.assertIsNotNone(starter.pop_upload(clips[2].audio_file_path))
+
+
+    def _create_clip(self, num):
+        metadata_file_path = self._dir_path / f'Clip {num}.json'
+        shutil.copy(
+            _DATA_DIR_PATH / f'Clip {num % 2}.json', metadata_file_path)
+        clip = Clip(metadata_file_path)
+        clip.id = num + 1
+        return clip
+
+
+    def _run(self, uploader, scheduler, clips):
+        scheduler.start_run(_KEY)
+        scheduler.record_activity(len(clips))
+        output = uploader._process_items(tuple(clips), False)
+        scheduler.end_run(now=0)
+        return output
+
+
+def _create_uploader(pool, scheduler=None, upload_starter=None):
+    settings = Bunch(
+        aws=_AWS, transfer_pool=pool, scheduler=scheduler,
+        upload_starter=upload_starter)
+    return ClipAudioFileS3Uploader(settings)
+
+
+class _Pool:
+
+    """S3 transfer pool whose uploads complete when a test says so."""
+
+    def __init__(self, complete=False):
+        self._complete = complete
+        self.futures = {}
+        self.submission_count = 0
+
+    def upload(self, file_path, bucket_name, object_key, priority=0):
+        future = Future()
+        if self._complete:
+            future.set_result(True)
+        self.futures[object_key] = future
+        self.submission_count += 1
+        return future
@@ -0,0 +1,103 @@
+from pathlib import Path
+import tempfile
+import zipfile
+
+from lrgv.archiver.clip_container import ClipContainer
+import lrgv.archiver.clip_container as clip_container
+from lrgv.util.test_case import TestCase
+
+
+_NIGHT = '2026-04-15'
+
+
+class ClipContainerTests(TestCase):
+
+
+    def setUp(self):
+
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+
+        night_dir_path = self._dir_path / _NIGHT
+        night_dir_path.mkdir()
+
+        self._contents = {
+            'a.json': b'{"clips": []}',
+            'a.wav': bytes(range(256)) * 10,
+            'b.wav': b'',
+        }
+
+        self._file_paths = []
+        for name, contents in self._contents.items():
+            path = night_dir_path / name
+            path.write_bytes(contents)
+            self._file_paths.append(path)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_write_and_read(self):
+
+        file_path = clip_container.get_new_container_file_path(
+            self._dir_path, _NIGHT)
+        self.assertEqual(file_path.name, f'{_NIGHT}.zip')
+
+        clip_container.write_container(file_path, self._file_paths)
+
+        # Container is a standard, uncompressed ZIP file.
+        with zipfile.ZipFile(file_path) as zip_file:
+            for info in zip_file.infolist():
+                self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(
+                    zip_file.read(info), self._contents[info.filename])
+
+        self._check_container(ClipContainer(file_path))
+
+        # Container can also be read without its index file.
+        clip_container.get_index_file_path(file_path).unlink()
+        self._check_container(ClipContainer(file_path))
+
+
+    def _check_container(self, container):
+
+        self.assertEqual(
+            sorted(container.file_names), sorted(self._contents.keys()))
+
+        for name, contents in self._contents.items():
+            self.assertIn(name, container)
+            self.assertEqual(container.get_file_size(name), len(contents))
+            self.assertEqual(container.read(name), contents)
+
+
+    def test_supplementary_containers(self):
+
+        paths = []
+
+        for _ in range(3):
+            path = clip_container.get_new_container_file_path(
+                self._dir_path, _NIGHT)
+            clip_container.write_container(path, self._file_paths[:1])
+            paths.append(path)
+
+        names = [p.name for p in paths]
+        expected = [f'{_NIGHT}.zip', f'{_NIGHT}_1.zip', f'{_NIGHT}_2.zip']
+        self.assertEqual(names, expected)
+
+        found_paths = clip_container.get_container_file_paths(
+            self._dir_path, _NIGHT)
+        self.assertEqual(list(found_paths), paths)
+
+
+    def test_unpack(self):
+
+        file_path = self._dir_path / f'{_NIGHT}.zip'
+        clip_container.write_container(file_path, self._file_paths)
+
+        dir_path = self._dir_path / 'Unpacked'
+        paths = clip_container.unpack_container(file_path, dir_path)
+
+        self.assertEqual(len(paths), len(self._contents))
+        for path in paths:
+            self.assertEqual(path.read_bytes(), self._contents[path.name])
@@ -0,0 +1,40 @@
+from lrgv.archiver.clip_handoff import ClipHandoff
+from lrgv.util.test_case import TestCase
+
+
+class ClipHandoffTests(TestCase):
+
+
+    def test_put_and_take(self):
+
+        handoff = ClipHandoff()
+        self.assertEqual(handoff.take(), ())
+
+        handoff.put(1)
+        handoff.put(2)
+        self.assertEqual(handoff.take(), (1, 2))
+        self.assertEqual(handoff.take(), ())
+
+
+    def test_start_scan(self):
+
+        handoff = ClipHandoff(rescan_period=10)
+
+        # Scan needed initially.
+        self.assertTrue(handoff.start_scan(now=0))
+        self.assertFalse(handoff.start_scan(now=1))
+
+        # Scan needed when requested.
+        handoff.request_scan()
+        self.assertTrue(handoff.start_scan(now=2))
+        self.assertFalse(handoff.start_scan(now=11))
+
+        # Scan needed after rescan period.
+        self.assertTrue(handoff.start_scan(now=12))
+        self.assertFalse(handoff.start_scan(now=13))
+
+
+    def test_no_rescan_period(self):
+        handoff = ClipHandoff()
+        self.assertTrue(handoff.start_scan(now=0))
+        self.assertFalse(handoff.start_scan(now=1e6))
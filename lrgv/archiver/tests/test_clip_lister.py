@@ -0,0 +1,60 @@
+from datetime import datetime as DateTime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+import shutil
+import tempfile
+
+from lrgv.archiver.clip_lister import ClipLister
+from lrgv.util.bunch import Bunch
+from lrgv.util.test_case import TestCase
+import lrgv.archiver.night_dirs as night_dirs
+
+
+_DATA_DIR_PATH = Path(__file__).parent / 'data'
+_TIME_ZONE = ZoneInfo('US/Central')
+_CLIP_FILE_NAME = 'Alamo_2026-04-16_03.00.00.000_Z_00'
+
+
+class ClipListerTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_night_dirs(self):
+
+        current_night_dir_path = night_dirs.get_night_dir_path(
+            self._dir_path, DateTime.now(_TIME_ZONE), _TIME_ZONE)
+        current_night_dir_path.mkdir()
+
+        # Empty night directory of an earlier night.
+        (self._dir_path / '2026-04-14').mkdir()
+
+        # Night directory with a clip.
+        night_dir_path = self._dir_path / '2026-04-15'
+        night_dir_path.mkdir()
+        metadata_file_path = night_dir_path / f'{_CLIP_FILE_NAME}.json'
+        shutil.copy(_DATA_DIR_PATH / 'Clip 0.json', metadata_file_path)
+        metadata_file_path.with_suffix('.wav').touch()
+
+        lister = ClipLister(Bunch(
+            clip_dir_path=self._dir_path,
+            clip_file_wait_period=None,
+            night_dir_time_zone=_TIME_ZONE))
+
+        clips = lister._list_clips()
+
+        self.assertEqual(
+            [c.metadata_file_path for c in clips], [metadata_file_path])
+
+        # The emptied night directory of the earlier night is removed,
+        # but that of the current night is not.
+        self.assertEqual(
+            night_dirs.get_night_dir_paths(self._dir_path),
+            tuple(sorted((night_dir_path, current_night_dir_path))))
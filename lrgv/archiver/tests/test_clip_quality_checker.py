@@ -0,0 +1,154 @@
+from pathlib import Path
+import json
+import tempfile
+import wave
+
+import numpy as np
+
+from lrgv.archiver.clip import Clip
+from lrgv.archiver.clip_quality_checker import ClipQualityChecker
+from lrgv.util.bunch import Bunch
+from lrgv.util.test_case import TestCase
+import lrgv.archiver.clip_quality_checker as clip_quality_checker
+
+
+_DATA_DIR_PATH = Path(__file__).parent / 'data'
+_LENGTH = 1000
+_SAMPLE_RATE = 22050
+
+
+class ClipQualityCheckerTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+        self._clip_dir_path = self._dir_path / 'Incoming'
+        self._rejected_dir_path = self._dir_path / 'Rejected'
+        self._clip_dir_path.mkdir()
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_process_items(self):
+
+        rng = np.random.default_rng(0)
+        noise = (rng.standard_normal(_LENGTH) * 1000).astype('<i2')
+        quiet = (rng.standard_normal(_LENGTH) * 3).astype('<i2')
+        clipped = np.where(noise >= 0, 32767, -32768).astype('<i2')
+
+        cases = (
+            ('Good', noise, {}, True),
+            ('Silent', np.zeros(_LENGTH, '<i2'), {}, False),
+            ('Quiet', quiet, {}, False),
+            ('Clipped', clipped, {}, False),
+            ('Off By One', noise[:-1], {}, True),
+            ('Short', noise[:-3], {}, False),
+            ('Empty', noise[:0], {}, False),
+            ('Rate', noise, {'sample_rate': 44100}, False),
+            ('Ambiguous Rate', noise,
+             {'sample_rate': 44100, 'recording_count': 2}, True),
+            ('Unknown Rate', noise,
+             {'sample_rate': 44100, 'omit_metadata_sample_rate': True},
+             True),
+            ('Truncated', noise, {'truncate': True}, False),
+            ('Corrupt', noise, {'corrupt': True}, False),
+        )
+
+        clips = [
+            self._create_clip(name, samples, **kwargs)
+            for name, samples, kwargs, _ in cases]
+
+        checker = self._create_checker(
+            max_length_difference=2, min_rms_level=-60,
+            max_clipped_fraction=.5)
+        output_clips = checker._process_items(clips, False)
+
+        expected = [c for c, case in zip(clips, cases) if case[3]]
+        self.assertEqual(output_clips, expected)
+
+        def get_file_names(dir_path):
+            return sorted(p.name for p in dir_path.iterdir())
+
+        def get_expected_file_names(accepted):
+            return sorted(
+                f'{case[0]}{suffix}' for case in cases
+                if case[3] == accepted
+                for suffix in ('.json', '.wav'))
+
+        self.assertEqual(
+            get_file_names(self._clip_dir_path),
+            get_expected_file_names(True))
+        self.assertEqual(
+            get_file_names(self._rejected_dir_path),
+            get_expected_file_names(False))
+
+
+    def test_disabled_level_checks(self):
+
+        samples = np.full(_LENGTH, 1, '<i2')
+        clip = self._create_clip('Quiet', samples)
+
+        checker = self._create_checker()
+        self.assertEqual(checker._process_items([clip], False), [clip])
+
+
+    def test_get_chunks(self):
+
+        def item(frame_count):
+            return None, None, Bunch(frame_count=frame_count, channel_count=1)
+
+        max_count = clip_quality_checker._MAX_CHUNK_SAMPLE_COUNT
+        items = [item(max_count // 2), item(max_count // 2), item(1),
+                 item(max_count + 1)]
+
+        chunks = list(clip_quality_checker._get_chunks(items))
+        self.assertEqual([len(c) for c in chunks], [2, 1, 1])
+
+
+    def _create_clip(
+            self, name, samples, sample_rate=_SAMPLE_RATE, truncate=False,
+            corrupt=False, recording_count=1,
+            omit_metadata_sample_rate=False):
+
+        with open(_DATA_DIR_PATH / 'Clip 0.json') as file:
+            metadata = json.load(file)
+        metadata['clips'][0]['length'] = _LENGTH
+
+        # Add recordings of the clip's station and mic output with
+        # different start times, so the clip's recording is ambiguous.
+        recording = metadata['recordings'][0]
+        if omit_metadata_sample_rate:
+            del recording['sample_rate']
+        for i in range(1, recording_count):
+            metadata['recordings'].append(
+                dict(recording, start_time=f'2025-08-0{5 + i} 02:00:00 Z'))
+
+        metadata_file_path = self._clip_dir_path / f'{name}.json'
+        with open(metadata_file_path, 'wt') as file:
+            json.dump(metadata, file)
+
+        audio_file_path = metadata_file_path.with_suffix('.wav')
+        with wave.open(str(audio_file_path), 'wb') as writer:
+            writer.setnchannels(1)
+            writer.setsampwidth(2)
+            writer.setframerate(sample_rate)
+            writer.writeframes(samples.tobytes())
+
+        if truncate:
+            with open(audio_file_path, 'r+b') as file:
+                file.truncate(audio_file_path.stat().st_size - 10)
+
+        if corrupt:
+            with open(audio_file_path, 'r+b') as file:
+                file.write(b'RIFX')
+
+        return Clip(metadata_file_path)
+
+
+    def _create_checker(self, **kwargs):
+        settings = Bunch(
+            rejected_clip_dir_path=self._rejected_dir_path, **kwargs)
+        return ClipQualityChecker(settings)
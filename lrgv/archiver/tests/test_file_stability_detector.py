@@ -0,0 +1,138 @@
+from pathlib import Path
+import tempfile
+import wave
+
+from lrgv.archiver.file_stability_detector import FileStabilityDetector
+from lrgv.util.file_utils import FileInfo
+from lrgv.util.test_case import TestCase
+
+
+_NOW = 1_000_000
+
+
+def _file(name, size=100, mtime=_NOW - 10, dir_path=Path('/dir')):
+    return FileInfo(dir_path / name, size, int(mtime * 1e9))
+
+
+class FileStabilityDetectorTests(TestCase):
+
+
+    def test_stability_period(self):
+
+        detector = FileStabilityDetector(2, 30)
+        file = _file('a.json')
+
+        # A file is not stable when first observed...
+        paths = detector.get_stable_paths((file,), _NOW)
+        self.assertEqual(paths, frozenset())
+
+        # ...or before the stability period has elapsed...
+        paths = detector.get_stable_paths((file,), _NOW + 1)
+        self.assertEqual(paths, frozenset())
+
+        # ...but it is after that.
+        paths = detector.get_stable_paths((file,), _NOW + 2)
+        self.assertEqual(paths, frozenset((file.path,)))
+
+        # A change restarts the stability period.
+        file = _file('a.json', size=200)
+        paths = detector.get_stable_paths((file,), _NOW + 3)
+        self.assertEqual(paths, frozenset())
+
+
+    def test_recent_modification(self):
+
+        # A file modified less than the stability period ago is not
+        # stable, even if it has been observed for longer than that.
+        detector = FileStabilityDetector(2, 30)
+        file = _file('a.json', mtime=_NOW + 9)
+        detector.get_stable_paths((file,), _NOW)
+        paths = detector.get_stable_paths((file,), _NOW + 10)
+        self.assertEqual(paths, frozenset())
+
+
+    def test_max_wait_period(self):
+
+        detector = FileStabilityDetector(2, 30)
+
+        # A file modified at least the max wait period ago is stable
+        # as soon as it is observed, even if it has a temporary file.
+        files = (_file('a.wav', mtime=_NOW - 30), _file('a.wav.tmp'))
+        paths = detector.get_stable_paths(files, _NOW)
+        self.assertEqual(paths, frozenset((files[0].path,)))
+
+
+    def test_temp_files(self):
+
+        detector = FileStabilityDetector(2, 30)
+
+        names = (
+            'a.wav', 'a.wav.tmp', 'b.wav', '.b.wav.part', 'c.wav', '~c.wav',
+            'd.wav', '.d.wav.Ab12Cd', 'e.wav')
+        files = tuple(_file(n) for n in names)
+
+        detector.get_stable_paths(files, _NOW)
+        paths = detector.get_stable_paths(files, _NOW + 2)
+
+        names = frozenset(p.name for p in paths)
+        for name in ('a.wav', 'b.wav', 'c.wav', 'd.wav'):
+            self.assertNotIn(name, names)
+        self.assertIn('e.wav', names)
+
+
+    def test_wave_header_validation(self):
+
+        with tempfile.TemporaryDirectory() as dir_name:
+
+            dir_path = Path(dir_name)
+            path = dir_path / 'a.wav'
+
+            with wave.open(str(path), 'wb') as writer:
+                writer.setnchannels(1)
+                writer.setsampwidth(2)
+                writer.setframerate(22050)
+                writer.writeframes(b'\x00\x00' * 100)
+
+            size = path.stat().st_size
+
+            detector = FileStabilityDetector(2, 30, True)
+            good_file = FileInfo(path, size, int((_NOW - 10) * 1e9))
+            detector.get_stable_paths((good_file,), _NOW)
+            paths = detector.get_stable_paths((good_file,), _NOW + 2)
+            self.assertEqual(paths, frozenset((path,)))
+
+            # Truncate file.
+            path.write_bytes(path.read_bytes()[:-20])
+
+            detector = FileStabilityDetector(2, 30, True)
+            bad_file = FileInfo(path, size - 20, int((_NOW - 10) * 1e9))
+            detector.get_stable_paths((bad_file,), _NOW)
+            paths = detector.get_stable_paths((bad_file,), _NOW + 2)
+            self.assertEqual(paths, frozenset())
+
+
+    def test_json_validation(self):
+
+        with tempfile.TemporaryDirectory() as dir_name:
+
+            dir_path = Path(dir_name)
+            path = dir_path / 'a.json'
+
+            def get_stable_paths(contents, validate=True):
+                path.write_text(contents)
+                detector = FileStabilityDetector(
+                    2, 30, validate_json_files=validate)
+                file = FileInfo(
+                    path, len(contents), int((_NOW - 10) * 1e9))
+                detector.get_stable_paths((file,), _NOW)
+                return detector.get_stable_paths((file,), _NOW + 2)
+
+            complete = '{"clips": [{"length": 1000}]}'
+            partial = complete[:-5]
+
+            self.assertEqual(get_stable_paths(complete), frozenset((path,)))
+            self.assertEqual(get_stable_paths(partial), frozenset())
+
+            # Without validation, a partial file is stable.
+            self.assertEqual(
+                get_stable_paths(partial, False), frozenset((path,)))
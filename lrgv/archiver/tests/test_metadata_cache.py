@@ -0,0 +1,107 @@
+from pathlib import Path
+import json
+import os
+import tempfile
+
+from lrgv.archiver.metadata_cache import MetadataCache
+from lrgv.util.test_case import TestCase
+
+
+class MetadataCacheTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+        self._load_count = 0
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def _write(self, name, contents):
+        path = self._dir_path / name
+        path.write_text(json.dumps(contents))
+        return path
+
+
+    def _load(self, path):
+        self._load_count += 1
+        with open(path) as file:
+            return json.load(file)
+
+
+    def test_get(self):
+
+        cache = MetadataCache(1000)
+        path = self._write('a.json', {'a': 1})
+
+        contents = cache.get(path, self._load)
+        self.assertEqual(contents, {'a': 1})
+
+        # Second get is a hit that returns the same object.
+        self.assertIs(cache.get(path, self._load), contents)
+
+        self.assertEqual(self._load_count, 1)
+        self.assertEqual(cache.hit_count, 1)
+        self.assertEqual(cache.miss_count, 1)
+        self.assertEqual(cache.entry_count, 1)
+        self.assertEqual(cache.size, path.stat().st_size)
+
+
+    def test_modified_file(self):
+
+        cache = MetadataCache(1000)
+        path = self._write('a.json', {'a': 1})
+        cache.get(path, self._load)
+
+        path = self._write('a.json', {'a': 22})
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        self.assertEqual(cache.get(path, self._load), {'a': 22})
+        self.assertEqual(self._load_count, 2)
+        self.assertEqual(cache.entry_count, 1)
+
+
+    def test_size_bound(self):
+
+        paths = [self._write(f'{i}.json', {'i': i}) for i in range(3)]
+        file_size = paths[0].stat().st_size
+
+        cache = MetadataCache(2 * file_size)
+
+        cache.get(paths[0], self._load)
+        cache.get(paths[1], self._load)
+
+        # Make `paths[0]` the most recently used entry.
+        cache.get(paths[0], self._load)
+
+        # Adding a third entry evicts least recently used `paths[1]`.
+        cache.get(paths[2], self._load)
+        self.assertEqual(cache.entry_count, 2)
+        self.assertEqual(cache.eviction_count, 1)
+        self.assertEqual(cache.size, 2 * file_size)
+
+        cache.get(paths[0], self._load)
+        self.assertEqual(self._load_count, 3)
+        cache.get(paths[1], self._load)
+        self.assertEqual(self._load_count, 4)
+
+
+    def test_evict(self):
+
+        cache = MetadataCache(1000)
+        path = self._write('a.json', {'a': 1})
+        cache.get(path, self._load)
+
+        cache.evict(path)
+        self.assertEqual(cache.entry_count, 0)
+        self.assertEqual(cache.size, 0)
+
+        # Evicting a file that is not cached does nothing.
+        cache.evict(self._dir_path / 'b.json')
+
+        cache.get(path, self._load)
+        self.assertEqual(self._load_count, 2)
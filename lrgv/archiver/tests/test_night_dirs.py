@@ -0,0 +1,59 @@
+from datetime import date as Date, datetime as DateTime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+import tempfile
+
+import lrgv.archiver.night_dirs as night_dirs
+from lrgv.util.test_case import TestCase
+
+
+_TIME_ZONE = ZoneInfo('US/Central')
+
+
+class NightDirsTests(TestCase):
+
+
+    def test_get_night_date(self):
+
+        cases = (
+
+            # evening, before local midnight
+            ('2026-04-16T03:30:00Z', Date(2026, 4, 15)),
+
+            # morning, after local midnight
+            ('2026-04-16T10:00:00Z', Date(2026, 4, 15)),
+
+            # just after local noon
+            ('2026-04-16T17:00:00Z', Date(2026, 4, 16)),
+
+        )
+
+        for time, expected in cases:
+            time = DateTime.fromisoformat(time)
+            night_date = night_dirs.get_night_date(time, _TIME_ZONE)
+            self.assertEqual(night_date, expected)
+
+
+    def test_get_night_dir_path(self):
+        dir_path = Path('Archived')
+        time = DateTime.fromisoformat('2026-04-16T03:30:00Z')
+        path = night_dirs.get_night_dir_path(dir_path, time, _TIME_ZONE)
+        self.assertEqual(path, dir_path / '2026-04-15')
+
+
+    def test_get_night_dir_paths(self):
+
+        with tempfile.TemporaryDirectory() as dir_name:
+
+            dir_path = Path(dir_name)
+            (dir_path / '2026-04-16').mkdir()
+            (dir_path / '2026-04-15').mkdir()
+            (dir_path / 'Other').mkdir()
+            (dir_path / '2026-04-17').write_text('')
+
+            paths = night_dirs.get_night_dir_paths(dir_path)
+            expected = (dir_path / '2026-04-15', dir_path / '2026-04-16')
+            self.assertEqual(paths, expected)
+
+            paths = night_dirs.get_night_dir_paths(dir_path / 'Missing')
+            self.assertEqual(paths, ())
@@ -0,0 +1,189 @@
+from datetime import time as Time
+from pathlib import Path
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+import json
+import re
+import tempfile
+import wave
+
+from lrgv.archiver.activity_scheduler import ActivityScheduler
+from lrgv.archiver.archiver_error import ArchiverError
+from lrgv.archiver.old_bird_clip_converter import _ClipFileMover
+import lrgv.archiver.old_bird_clip_converter as old_bird_clip_converter
+from lrgv.util.bunch import Bunch
+from lrgv.util.test_case import TestCase
+
+
+_TIME_ZONE = ZoneInfo('US/Central')
+
+_FILE_NAME_RE = re.compile(
+    r'^Tseep_'
+    r'(?P<year>\d\d\d\d)-(?P<month>\d\d)-(?P<day>\d\d)_'
+    r'(?P<hour>\d\d)\.(?P<minute>\d\d)\.(?P<second>\d\d)_'
+    r'(?P<num>\d\d)\.wav$')
+
+_SAMPLE_RATE = 22050
+
+
+class OldBirdClipConverterTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+        self._source_dir_path = self._dir_path / 'Synced'
+        self._destination_dir_path = self._dir_path / 'Incoming'
+        self._rejected_dir_path = self._dir_path / 'Rejected'
+        self._source_dir_path.mkdir()
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_process_items(self):
+
+        # Clips of one night, converted concurrently.
+        good_names = [
+            f'Tseep_2026-04-15_22.00.{i:02d}_00.wav' for i in range(20)]
+
+        # Clip that ends after the night's recording, which ends at
+        # 05:00 local time.
+        late_name = 'Tseep_2026-04-16_04.59.59_00.wav'
+
+        # Clips whose audio files are not WAVE files.
+        bad_names = [
+            'Tseep_2026-04-15_23.00.00_00.wav',
+            'Tseep_2026-04-15_23.00.01_00.wav']
+
+        files = [self._create_audio_file(n) for n in good_names]
+        files.append(self._create_audio_file(late_name))
+        files.extend(
+            self._create_audio_file(n, valid=False) for n in bad_names)
+
+        mover = self._create_mover(concurrency=4)
+
+        # The mover converts the clips it can, and then raises a single
+        # error for the others.
+        with patch.object(
+                old_bird_clip_converter, '_get_recording_start_time',
+                wraps=old_bird_clip_converter._get_recording_start_time) \
+                as get_recording_start_time:
+            with self.assertRaises(ArchiverError) as context:
+                mover._process_items(files, False)
+        self.assertIn(
+            f'could not process 2 of {len(files)} files',
+            str(context.exception))
+        self.assertIsNotNone(mover._executor)
+
+        # Good clips are converted.
+        expected = sorted(
+            f'Alamo_2026-04-16_03.00.{i:02d}.000_Z_00{suffix}'
+            for i in range(len(good_names))
+            for suffix in ('.json', '.wav'))
+        self.assertEqual(
+            _get_file_names(self._destination_dir_path), expected)
+
+        path = self._destination_dir_path / expected[0]
+        with open(path) as file:
+            metadata = json.load(file)
+        recording = metadata['recordings'][0]
+        self.assertEqual(recording['start_time'], '2026-04-16 02:00:00 Z')
+        self.assertEqual(recording['length'], 8 * 3600 * _SAMPLE_RATE)
+        clip = metadata['clips'][0]
+        self.assertEqual(clip['start_time'], '2026-04-16 03:00:00.000 Z')
+        self.assertEqual(clip['length'], 2 * _SAMPLE_RATE)
+
+        # All of the clips of the night share one recording, whose
+        # start time is computed only once.
+        self.assertEqual(len(mover._recordings), 1)
+        self.assertEqual(get_recording_start_time.call_count, 1)
+
+        # The late clip is rejected.
+        self.assertEqual(
+            _get_file_names(self._rejected_dir_path), [late_name])
+
+        # The bad clips are left in place.
+        self.assertEqual(
+            _get_file_names(self._source_dir_path), sorted(bad_names))
+
+
+    def test_sequential_processing(self):
+
+        names = [f'Tseep_2026-04-15_22.00.{i:02d}_00.wav' for i in range(3)]
+        files = [self._create_audio_file(n) for n in names]
+
+        mover = self._create_mover(concurrency=1)
+        mover._process_items(files, False)
+
+        self.assertEqual(len(_get_file_names(self._destination_dir_path)), 6)
+        self.assertEqual(_get_file_names(self._source_dir_path), [])
+        self.assertIsNone(mover._executor)
+
+
+    def test_wake_clip_archiver(self):
+
+        key = '/Archiver/Alamo/Tseep'
+        scheduler = ActivityScheduler(1, 300, 2)
+
+        # Let clip archiver back off.
+        for _ in range(5):
+            scheduler.start_run(key)
+            scheduler.end_run()
+        self.assertFalse(scheduler.is_due(key))
+
+        mover = self._create_mover(
+            concurrency=1, scheduler=scheduler, clip_archiver_key=key)
+
+        # Processing no clips does not wake the archiver.
+        mover._process_items([], False)
+        self.assertFalse(scheduler.is_due(key))
+
+        # Converting clips wakes it.
+        name = 'Tseep_2026-04-15_22.00.00_00.wav'
+        mover._process_items([self._create_audio_file(name)], False)
+        self.assertTrue(scheduler.is_due(key))
+
+
+    def _create_audio_file(self, name, valid=True):
+
+        path = self._source_dir_path / name
+
+        if valid:
+            with wave.open(str(path), 'wb') as writer:
+                writer.setnchannels(1)
+                writer.setsampwidth(2)
+                writer.setframerate(_SAMPLE_RATE)
+                writer.writeframes(b'\x01\x00' * 2 * _SAMPLE_RATE)
+        else:
+            path.write_bytes(b'not a WAVE file')
+
+        return Bunch(
+            path=path, info=None, name_match=_FILE_NAME_RE.match(name))
+
+
+    def _create_mover(self, concurrency, **kwargs):
+
+        settings = Bunch(
+            station_name='Alamo',
+            recorder_name='Old Bird Recorder',
+            mic_output_name='21c 0 Output',
+            station_time_zone=_TIME_ZONE,
+            detector_start_time=Time(hour=21),
+            detector_run_time=8,
+            full_detector_name='Old Bird Tseep Detector',
+            destination_dir_path=self._destination_dir_path,
+            night_dir_time_zone=None,
+            rejected_dir_path=self._rejected_dir_path,
+            clip_classification=None,
+            conversion_concurrency=concurrency,
+            **kwargs)
+
+        return _ClipFileMover(settings)
+
+
+def _get_file_names(dir_path):
+    if not dir_path.exists():
+        return []
+    return sorted(p.name for p in dir_path.iterdir())
@@ -0,0 +1,37 @@
+from lrgv.archiver.s3_client_factory import clear_s3_clients, get_s3_client
+from lrgv.util.bunch import Bunch
+from lrgv.util.test_case import TestCase
+
+
+class S3ClientFactoryTests(TestCase):
+
+
+    def tearDown(self):
+        clear_s3_clients()
+
+
+    def test_get_s3_client(self):
+
+        settings = _create_aws_settings('us-east-1')
+
+        client = get_s3_client(settings)
+        self.assertEqual(client.meta.config.max_pool_connections, 5)
+
+        # same settings
+        self.assertIs(get_s3_client(settings), client)
+        self.assertIs(get_s3_client(_create_aws_settings('us-east-1')), client)
+
+        # different region
+        other_client = get_s3_client(_create_aws_settings('us-west-2'))
+        self.assertIsNot(other_client, client)
+
+        clear_s3_clients()
+        self.assertIsNot(get_s3_client(settings), client)
+
+
+def _create_aws_settings(region_name):
+    return Bunch(
+        access_key_id='key',
+        secret_access_key='secret',
+        region_name=region_name,
+        upload_concurrency=5)
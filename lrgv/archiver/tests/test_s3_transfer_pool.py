@@ -0,0 +1,163 @@
+from pathlib import Path
+import base64
+import hashlib
+import tempfile
+import threading
+
+from botocore.exceptions import ClientError
+
+from lrgv.archiver.s3_transfer_pool import S3TransferPool
+from lrgv.util.bunch import Bunch
+from lrgv.util.test_case import TestCase
+
+
+_BUCKET_NAME = 'bucket'
+
+
+class S3TransferPoolTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_upload(self):
+
+        client = _Client()
+        pool = _create_pool(client)
+
+        future = self._upload(pool, 'Clip')
+        pool.shutdown()
+
+        # The upload includes the base64-encoded MD5 digest of the file.
+        self.assertTrue(future.result())
+        self.assertEqual(client.put_keys, ['Clip'])
+        self.assertEqual(client.objects['Clip'], _get_md5(b'Clip'))
+        self.assertEqual(client.head_keys, [])
+
+
+    def test_skip_existing(self):
+
+        client = _Client()
+        client.objects = {
+            'Same': _get_md5(b'Same'),
+            'Different': _get_md5(b'Other contents'),
+        }
+        pool = _create_pool(client, skip_existing_uploads=True)
+
+        futures = [
+            self._upload(pool, name)
+            for name in ('Same', 'Different', 'Absent')]
+        pool.shutdown()
+
+        # An object that is present with the same contents is not
+        # uploaded again. Others are uploaded.
+        self.assertEqual([f.result() for f in futures], [False, True, True])
+        self.assertEqual(client.put_keys, ['Different', 'Absent'])
+        self.assertEqual(client.head_keys, ['Same', 'Different', 'Absent'])
+
+
+    def test_head_error(self):
+
+        client = _Client(head_error_code='403')
+        pool = _create_pool(client, skip_existing_uploads=True)
+
+        future = self._upload(pool, 'Clip')
+        pool.shutdown()
+
+        # Errors other than absence of the object fail the upload.
+        with self.assertRaises(ClientError):
+            future.result()
+        self.assertEqual(client.put_keys, [])
+
+
+    def test_priority(self):
+
+        client = _Client(block=True)
+        pool = _create_pool(client)
+
+        # The pool's single thread starts the first upload and waits
+        # until we let the client complete it.
+        futures = [self._upload(pool, 'First', 0)]
+        client.started.wait()
+
+        # Newer clips, with later start times and so higher priorities,
+        # are uploaded first. Uploads with the same priority are
+        # uploaded in the order in which they were submitted.
+        start_times = (1000, 3000, 2000, 3000)
+        futures.extend(
+            self._upload(pool, f'Clip {i}', t)
+            for i, t in enumerate(start_times))
+
+        client.release.set()
+        pool.shutdown()
+
+        self.assertEqual(
+            client.put_keys,
+            ['First', 'Clip 1', 'Clip 3', 'Clip 2', 'Clip 0'])
+        self.assertTrue(all(f.result() for f in futures))
+
+
+    def _upload(self, pool, name, priority=0):
+        file_path = self._dir_path / f'{name}.wav'
+        file_path.write_bytes(name.encode('utf-8'))
+        return pool.upload(file_path, _BUCKET_NAME, name, priority)
+
+
+def _create_pool(client, **kwargs):
+    settings = Bunch(upload_concurrency=1, **kwargs)
+    return S3TransferPool(settings, client)
+
+
+def _get_md5(data):
+    return hashlib.md5(data).digest()
+
+
+class _Client:
+
+    """
+    S3 client that keeps the MD5 digests of the objects put to it, and
+    records the keys of its requests.
+    """
+
+
+    def __init__(self, block=False, head_error_code=None):
+        self.objects = {}
+        self.put_keys = []
+        self.head_keys = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+        self._head_error_code = head_error_code
+
+
+    def put_object(self, Bucket, Key, Body, ContentMD5):
+        self.started.set()
+        self.release.wait()
+        self.put_keys.append(Key)
+        md5 = _get_md5(Body.read())
+        if base64.b64decode(ContentMD5) != md5:
+            raise ClientError(
+                {'Error': {'Code': 'BadDigest'}}, 'PutObject')
+        self.objects[Key] = md5
+
+
+    def head_object(self, Bucket, Key):
+
+        self.head_keys.append(Key)
+
+        code = self._head_error_code
+        if code is None and Key not in self.objects:
+            code = '404'
+
+        if code is not None:
+            raise ClientError({'Error': {'Code': code}}, 'HeadObject')
+
+        # Like S3, return the hexadecimal MD5 digest in quotes.
+        return {'ETag': f'"{self.objects[Key].hex()}"'}
@@ -0,0 +1,180 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest.mock import patch
+
+from lrgv.archiver.transition_journal import TransitionJournal
+import lrgv.archiver.transition_journal as transition_journal
+from lrgv.util.test_case import TestCase
+
+
+class TransitionJournalTests(TestCase):
+
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self._file_path = Path(self._dir.name) / 'Journal.jsonl'
+
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+
+    def test_transitions(self):
+
+        journal = TransitionJournal(self._file_path)
+
+        nums = journal.start('/A', ['a0', 'a1', 'a2'])
+        self.assertEqual(nums, [1, 2, 3])
+        self.assertEqual(journal.start('/B', ['b0']), [4])
+
+        journal.commit([(1, {'clip_id': 10}), (2, {'clip_id': 11})])
+        journal.end([2, 3])
+
+        expected = [(1, _committed('/A', 'a0', clip_id=10))]
+        self.assertEqual(journal.get_open_transitions('/A'), expected)
+        expected = [(4, _started('/B', 'b0'))]
+        self.assertEqual(journal.get_open_transitions('/B'), expected)
+
+
+    def test_reopen(self):
+
+        journal = TransitionJournal(self._file_path)
+        journal.start('/A', ['a0', 'a1', 'a2'])
+        journal.commit([(2, {'clip_id': 11})])
+        journal.end([1])
+
+        # Reopen journal, as after the archiver restarts.
+        journal = TransitionJournal(self._file_path)
+        expected = [
+            (2, _committed('/A', 'a1', clip_id=11)),
+            (3, _started('/A', 'a2'))]
+        self.assertEqual(journal.get_open_transitions('/A'), expected)
+
+        # New transition numbers follow those of open transitions.
+        self.assertEqual(journal.start('/A', ['a3']), [4])
+
+        journal.end([2, 3, 4])
+        journal = TransitionJournal(self._file_path)
+        self.assertEqual(journal.get_open_transitions('/A'), [])
+
+
+    def test_partial_last_line(self):
+
+        journal = TransitionJournal(self._file_path)
+        journal.start('/A', ['a0'])
+
+        with open(self._file_path, 'a') as file:
+            file.write('{"num":2,"rec')
+
+        journal = TransitionJournal(self._file_path)
+        expected = [(1, _started('/A', 'a0'))]
+        self.assertEqual(journal.get_open_transitions('/A'), expected)
+
+
+    def test_concurrent_starts(self):
+
+        journal = TransitionJournal(self._file_path)
+
+        def start(i):
+            for j in range(20):
+                journal.start('/A', [f'{i} {j}'])
+
+        threads = [Thread(target=start, args=(i,)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        journal = TransitionJournal(self._file_path)
+        transitions = journal.get_open_transitions('/A')
+        self.assertEqual(len(transitions), 100)
+        self.assertEqual(
+            sorted(num for num, _ in transitions), list(range(1, 101)))
+
+
+    def test_created_objects(self):
+
+        journal = TransitionJournal(self._file_path, 100)
+
+        with _time(1000):
+            journal.start('/A', ['a0', 'a1', 'a2'])
+            journal.commit([
+                (1, {'created_object': ['a', 10]}),
+                (2, {'created_object': ['b', 11]}),
+                (3, {'clip_id': None})])
+            journal.end([1, 2, 3])
+
+        with _time(1050):
+            journal.start('/A', ['a3'])
+            journal.commit([(4, {'created_object': ['c', 12]})])
+
+        with _time(1060):
+            self.assertEqual(
+                journal.get_created_object_ids(['a', 'b', 'c', 'd']),
+                {'a': 10, 'b': 11, 'c': 12})
+
+        # Reopen journal, as after the archiver restarts. Created
+        # objects are remembered after their transitions end, and
+        # survive compaction of the journal file.
+        with _time(1060):
+            journal = TransitionJournal(self._file_path, 100)
+            journal = TransitionJournal(self._file_path, 100)
+            self.assertEqual(
+                journal.get_created_object_ids(['a', 'b', 'c']),
+                {'a': 10, 'b': 11, 'c': 12})
+
+        # Objects created before the retention period are forgotten.
+        with _time(1101):
+            self.assertEqual(
+                journal.get_created_object_ids(['a', 'b', 'c']), {'c': 12})
+            journal = TransitionJournal(self._file_path, 100)
+            self.assertEqual(
+                journal.get_created_object_ids(['a', 'b', 'c']), {'c': 12})
+
+
+    def test_created_objects_not_remembered(self):
+
+        journal = TransitionJournal(self._file_path)
+        journal.start('/A', ['a0'])
+        journal.commit([(1, {'created_object': ['a', 10]})])
+
+        self.assertEqual(journal.get_created_object_ids(['a']), {})
+
+
+    def test_idle_compaction(self):
+
+        journal = TransitionJournal(self._file_path, 3600)
+
+        with patch.object(transition_journal, '_MAX_IDLE_FILE_SIZE', 1000):
+
+            for i in range(100):
+                num = journal.start('/A', [f'a{i}'])[0]
+                journal.commit([(num, {'created_object': [str(i), i]})])
+                journal.end([num])
+
+        # The file is compacted when it grows large, keeping only the
+        # remembered created objects, each in one record instead of the
+        # three records of its transition.
+        with open(self._file_path) as file:
+            lines = file.readlines()
+        self.assertLess(len(lines), 200)
+        self.assertIn('"record":"created"', lines[0])
+        journal = TransitionJournal(self._file_path, 3600)
+        keys = [str(i) for i in range(100)]
+        self.assertEqual(
+            journal.get_created_object_ids(keys),
+            {str(i): i for i in range(100)})
+
+
+def _time(now):
+    return patch.object(transition_journal.time, 'time', return_value=now)
+
+
+def _started(owner, metadata_file_path):
+    return {'owner': owner, 'metadata_file_path': metadata_file_path}
+
+
+def _committed(owner, metadata_file_path, **data):
+    return {
+        **_started(owner, metadata_file_path), **data, 'committed': True}
@@ -0,0 +1,421 @@
+from http.client import RemoteDisconnected
+from pathlib import Path
+import gzip
+import json
+import os
+import stat
+import tempfile
+
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError
+import requests
+
+from lrgv.archiver.vesper_client import VesperClient
+from lrgv.util.bunch import Bunch
+from lrgv.util.circuit_breaker import CircuitBreaker
+from lrgv.util.test_case import TestCase
+import lrgv.archiver.vesper_client as vesper_client
+
+
+_DATA = {'recordings': [], 'clips': [{'station': 'Alamo'}]}
+
+
+class VesperClientTests(TestCase):
+
+
+    def test_uncompressed_request(self):
+
+        client, requests_ = _create_client(None, [(200, '')])
+
+        response = client.import_objects(_DATA)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(requests_, [(False, _DATA)])
+
+
+    def test_compressed_request(self):
+
+        client, requests_ = _create_client(6, [(200, '')])
+
+        response = client.import_objects(_DATA)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(requests_, [(True, _DATA)])
+
+
+    def test_encoding_rejection_fallback(self):
+
+        cases = (
+            (415, ''),
+            (400, 'Unsupported Content-Encoding: gzip'),
+        )
+
+        for status_code, text in cases:
+
+            client, requests_ = _create_client(
+                6, [(status_code, text), (200, ''), (200, '')])
+
+            # Compressed request is rejected and resent uncompressed.
+            response = client.import_objects(_DATA)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(requests_, [(True, _DATA), (False, _DATA)])
+
+            # Client no longer compresses requests.
+            client.import_objects(_DATA)
+            self.assertEqual(requests_[2], (False, _DATA))
+
+            # Rejections are not server failures.
+            self.assertEqual(client.breaker._failure_count, 0)
+
+
+    def test_no_fallback(self):
+
+        # Responses that do not indicate that the server rejected a
+        # compressed request because of its encoding should be returned
+        # as is, without resending the request.
+        cases = (
+            (400, 'Invalid clip start time.'),
+            (500, 'Internal server error.'),
+            (502, ''),
+            (503, ''),
+            (504, ''),
+        )
+
+        for status_code, text in cases:
+
+            client, requests_ = _create_client(6, [(status_code, text)])
+
+            response = client.import_objects(_DATA)
+
+            self.assertEqual(response.status_code, status_code)
+            self.assertEqual(len(requests_), 1)
+
+            # Each server error should count as just one failure.
+            expected = 1 if status_code >= 500 else 0
+            self.assertEqual(client.breaker._failure_count, expected)
+
+
+    def test_dropped_connection(self):
+
+        # A request whose connection is dropped without a response is
+        # resent once.
+        client, requests_ = _create_client(
+            None, [_dropped_connection_error(), (200, '')])
+        response = client.import_objects(_DATA)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(requests_, [(False, _DATA), (False, _DATA)])
+        self.assertEqual(client.breaker._failure_count, 0)
+
+        # If the resend is dropped, too, the outcome is unknown.
+        client, requests_ = _create_client(
+            None, [_dropped_connection_error(), _dropped_connection_error()])
+        with self.assertRaises(requests.ConnectionError) as context:
+            client.import_objects(_DATA)
+        self.assertEqual(len(requests_), 2)
+        self.assertTrue(
+            vesper_client.may_have_reached_server(context.exception))
+
+        # Other connection errors are not resent.
+        client, requests_ = _create_client(
+            None, [requests.ConnectionError('Other error.')])
+        with self.assertRaises(requests.ConnectionError):
+            client.import_objects(_DATA)
+        self.assertEqual(len(requests_), 1)
+
+
+    def test_timeout(self):
+
+        cases = (
+            (None, vesper_client._DEFAULT_REQUEST_TIMEOUT),
+            ((1, 2), (1, 2)),
+        )
+
+        for timeout, expected in cases:
+            client, _ = _create_client(None, [(200, '')], timeout)
+            client.import_objects(_DATA)
+            adapter = client._session.get_adapter(client._import_url)
+            self.assertEqual(adapter.timeouts, [expected])
+
+
+    def test_log_in(self):
+
+        server = _Server([200, 200])
+        client = _create_logging_in_client(server)
+
+        # The client logs in when it is first used, and only then.
+        for _ in range(2):
+            response = client.import_objects(_DATA)
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(server.login_count, 1)
+        self.assertEqual(client.login_count, 1)
+        self.assertEqual(server.import_session_ids, ['Session 1'] * 2)
+
+
+    def test_log_in_again(self):
+
+        # The server reports that the client is not logged in, for
+        # example because its session expired.
+        server = _Server([200, 401, 200])
+        client = _create_logging_in_client(server)
+
+        client.import_objects(_DATA)
+        response = client.import_objects(_DATA)
+
+        # The client logs in again and resends the request once.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(server.login_count, 2)
+        self.assertEqual(client.login_count, 2)
+        self.assertEqual(
+            server.import_session_ids,
+            ['Session 1', 'Session 1', 'Session 2'])
+
+        # If the server still reports that the client is not logged in,
+        # the client returns the response without resending it again.
+        server = _Server([401, 401])
+        client = _create_logging_in_client(server)
+        response = client.import_objects(_DATA)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(server.import_session_ids), 2)
+
+
+    def test_stale_login(self):
+
+        client = _create_logging_in_client(_Server([]))
+
+        _, login_count = client._get_session()
+        self.assertEqual(login_count, 1)
+
+        # Several processors whose requests failed because the client
+        # was not logged in ask for a new session, but only the first
+        # logs in again. The others get the session that it started.
+        sessions = [client._get_session(login_count) for _ in range(3)]
+        self.assertEqual(client.login_count, 2)
+        self.assertEqual(len(set(id(s) for s, _ in sessions)), 1)
+        self.assertEqual([c for _, c in sessions], [2, 2, 2])
+
+
+    def test_session_file(self):
+
+        with tempfile.TemporaryDirectory() as dir_name:
+
+            file_path = Path(dir_name) / 'Session' / 'Session.json'
+
+            # The client saves its session cookies to a file that only
+            # its owner can read.
+            server = _Server([200])
+            client = _create_logging_in_client(server, file_path)
+            client.import_objects(_DATA)
+            mode = stat.S_IMODE(os.stat(file_path).st_mode)
+            self.assertEqual(mode, 0o600)
+            with open(file_path) as file:
+                cookies = {c['name']: c['value'] for c in json.load(file)}
+            self.assertEqual(
+                cookies, {'csrftoken': 'Token 1', 'sessionid': 'Session 1'})
+
+            # A new client, as after the archiver restarts, loads the
+            # saved cookies instead of logging in.
+            server = _Server([200])
+            client = _create_logging_in_client(server, file_path)
+            client.import_objects(_DATA)
+            self.assertEqual(server.login_count, 0)
+            self.assertEqual(server.import_session_ids, ['Session 1'])
+
+            # If the saved session has expired, the client logs in and
+            # saves the new session's cookies.
+            server = _Server([401, 200], first_login_num=2)
+            client = _create_logging_in_client(server, file_path)
+            response = client.import_objects(_DATA)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(server.login_count, 1)
+            with open(file_path) as file:
+                cookies = {c['name']: c['value'] for c in json.load(file)}
+            self.assertEqual(cookies['sessionid'], 'Session 2')
+
+            # A client ignores a session file it cannot parse.
+            file_path.write_text('Not JSON')
+            server = _Server([200])
+            client = _create_logging_in_client(server, file_path)
+            client.import_objects(_DATA)
+            self.assertEqual(server.login_count, 1)
+
+
+    def test_may_have_reached_server(self):
+
+        refused = requests.ConnectionError(
+            vesper_client.NewConnectionError(None, 'Connection refused'))
+
+        cases = (
+            (requests.ConnectTimeout(), False),
+            (refused, False),
+            (requests.ConnectionError('Connection reset by peer'), True),
+            (requests.ReadTimeout(), True),
+            (ValueError(), False),
+        )
+
+        for exception, expected in cases:
+            self.assertEqual(
+                vesper_client.may_have_reached_server(exception), expected)
+
+
+def _dropped_connection_error():
+    return requests.ConnectionError(ProtocolError(
+        'Connection aborted.',
+        RemoteDisconnected('Remote end closed connection without response')))
+
+
+def _create_client(compression_level, responses, timeout=None):
+
+    """
+    Creates a Vesper client whose HTTP session responds to requests with
+    the specified (status code, text) pairs, in order. A response can
+    also be an exception, which is raised instead.
+
+    Returns the client and a list to which the client's requests are
+    appended as (compressed, data) pairs.
+    """
+
+    settings = Bunch(
+        archive_url='http://localhost/',
+        archive_url_base='/',
+        username='user',
+        password='password',
+        request_compression_level=compression_level,
+        request_timeout=timeout)
+
+    breaker = CircuitBreaker('Vesper', failure_threshold=10)
+
+    client = VesperClient(settings, breaker)
+
+    session = requests.session()
+    session.cookies.set('csrftoken', 'token')
+    adapter = _Adapter(responses)
+    session.mount('http://', adapter)
+    client._session = session
+
+    return client, adapter.requests
+
+
+def _create_logging_in_client(server, session_file_path=None):
+
+    """
+    Creates a Vesper client that logs in to the specified fake server.
+    """
+
+    settings = Bunch(
+        archive_url='http://localhost/',
+        archive_url_base='/',
+        username='user',
+        password='password',
+        session_file_path=session_file_path)
+
+    client = VesperClient(settings)
+    client._create_session = server.create_session
+
+    return client
+
+
+class _Server:
+
+    """
+    Fake Vesper server that logs clients in and responds to import
+    requests with status codes from a list.
+    """
+
+
+    def __init__(self, import_status_codes, first_login_num=1):
+        self._import_status_codes = list(import_status_codes)
+        self._login_nums = iter(range(first_login_num, 1000))
+        self.login_count = 0
+        self.import_session_ids = []
+
+
+    def create_session(self):
+        session = requests.session()
+        session.mount('http://', _ServerAdapter(self, session))
+        return session
+
+
+    def respond(self, session, request):
+
+        if 'login' in request.url:
+
+            if request.method == 'GET':
+                # CSRF token request
+
+                num = next(self._login_nums)
+                session.cookies.set('csrftoken', f'Token {num}')
+
+            else:
+                # login request
+
+                num = session.cookies['csrftoken'].split()[-1]
+                session.cookies.set('sessionid', f'Session {num}')
+                self.login_count += 1
+
+            return 200
+
+        else:
+            # import request
+
+            cookies = request.headers.get('Cookie', '')
+            session_id = dict(
+                c.split('=', 1) for c in cookies.split('; ')
+            ).get('sessionid')
+            self.import_session_ids.append(session_id)
+            return self._import_status_codes.pop(0)
+
+
+class _ServerAdapter(HTTPAdapter):
+
+    """Transport adapter that sends a session's requests to a `_Server`."""
+
+
+    def __init__(self, server, session):
+        super().__init__()
+        self._server = server
+        self._session = session
+
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = self._server.respond(self._session, request)
+        response._content = b''
+        response.request = request
+        response.url = request.url
+        return response
+
+
+class _Adapter(HTTPAdapter):
+
+    """Transport adapter that responds to requests from a list."""
+
+
+    def __init__(self, responses):
+        super().__init__()
+        self._responses = list(responses)
+        self.requests = []
+        self.timeouts = []
+
+
+    def send(self, request, **kwargs):
+
+        body = request.body
+        compressed = request.headers.get('Content-Encoding') == 'gzip'
+        if compressed:
+            body = gzip.decompress(body)
+        self.requests.append((compressed, json.loads(body)))
+        self.timeouts.append(kwargs.get('timeout'))
+
+        response = self._responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        status_code, text = response
+
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = text.encode('utf-8')
+        response.request = request
+        response.url = request.url
+
+        return response
@@ -0,0 +1,316 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import json
+import shutil
+import threading
+
+import requests
+
+from lrgv.archiver.archiver_error import ArchiverError
+from lrgv.archiver.clip import Clip
+from lrgv.archiver.transition_journal import TransitionJournal
+from lrgv.archiver.vesper_clip_creator import VesperClipCreator
+from lrgv.util.bunch import Bunch
+from lrgv.util.test_case import TestCase
+import lrgv.archiver.vesper_clip_creator as vesper_clip_creator
+
+
+_DATA_DIR_PATH = Path(__file__).parent / 'data'
+
+
+class VesperClipCreatorTests(TestCase):
+
+
+    def test_get_batches(self):
+
+        clips = [_create_clip(i) for i in (0, 1, 0)]
+
+        cases = (
+            (None, [1, 1, 1]),
+            (1, [1, 1, 1]),
+            (2, [2, 1]),
+            (100, [3]),
+        )
+
+        for batch_size, expected in cases:
+            creator = _create_clip_creator(batch_size)
+            batches = creator._get_batches(clips)
+            self.assertEqual([len(b) for b in batches], expected)
+
+
+    def test_get_import_data(self):
+
+        clips = [_create_clip(i) for i in (0, 1)]
+        metadatas = [c.metadata_file_contents for c in clips]
+
+        data = vesper_clip_creator._get_import_data(metadatas)
+
+        # The clips reference the same recording, which should be
+        # included only once.
+        self.assertEqual(data['recordings'], metadatas[0]['recordings'])
+
+        expected = metadatas[0]['clips'] + metadatas[1]['clips']
+        self.assertEqual(data['clips'], expected)
+
+
+    def test_unknown_outcomes(self):
+
+        # Clips whose creation outcome is unknown should be set aside
+        # and never sent to the server again.
+
+        responses = (
+            requests.ReadTimeout('Read timed out.'),
+            _Response(504, b''),
+            _Response(200, b'<html>Not JSON</html>'),
+            _Response(200, b'{"recordings": [], "clips": []}'),
+        )
+
+        for response in responses:
+
+            with TemporaryDirectory() as dir_name:
+
+                dir_path = Path(dir_name)
+                clip = _copy_clip(0, dir_path / 'Incoming')
+                client = _Client(response)
+                creator = _create_clip_creator(
+                    1, client, dir_path, TransitionJournal(
+                        dir_path / 'Journal.jsonl'))
+
+                creator._process_items([clip], False)
+
+                self.assertEqual(client.request_count, 1)
+                self.assertEqual(
+                    _get_file_names(dir_path / 'Unconfirmed'),
+                    ['Clip 0.json', 'Clip 0.wav'])
+                self.assertEqual(
+                    _get_file_names(dir_path / 'Incoming'), [])
+                self.assertEqual(
+                    creator._journal.get_open_transitions(creator.path),
+                    [])
+
+
+    def test_known_failure(self):
+
+        with TemporaryDirectory() as dir_name:
+
+            dir_path = Path(dir_name)
+            clip = _copy_clip(0, dir_path / 'Incoming')
+            client = _Client(
+                requests.ConnectTimeout('Connection timed out.'))
+            creator = _create_clip_creator(1, client, dir_path)
+
+            with self.assertRaises(Exception):
+                creator._process_items([clip], False)
+
+            # The clip was not created, so it should be left in place
+            # to be created later.
+            self.assertEqual(client.request_count, 1)
+            self.assertEqual(
+                _get_file_names(dir_path / 'Incoming'),
+                ['Clip 0.json', 'Clip 0.wav'])
+            self.assertFalse((dir_path / 'Unconfirmed').exists())
+
+
+    def test_concurrent_creation(self):
+
+        with TemporaryDirectory() as dir_name:
+
+            dir_path = Path(dir_name)
+            start_times = [
+                f'2025-08-05 0{h}:00:00.000 Z' for h in (4, 5, 6)]
+            clips = [
+                _copy_clip(0, dir_path / 'Incoming', f'Clip {i}', t)
+                for i, t in enumerate(start_times)]
+
+            # The server creates the first and third clips, but not the
+            # second. The client waits until all three requests are in
+            # flight before responding to any of them.
+            responses = (
+                _Response(200, b'{"recordings": [], "clips": [{"id": 7}]}'),
+                _Response(400, b'Bad clip'),
+                _Response(200, b'{"recordings": [], "clips": [{"id": 9}]}'))
+            client = _ConcurrentClient(dict(zip(start_times, responses)), 3)
+            creator = _create_clip_creator(
+                1, client, dir_path, TransitionJournal(
+                    dir_path / 'Journal.jsonl'), concurrency=3)
+
+            # The creator creates the clips it can, and then raises a
+            # single error for the other.
+            with self.assertRaises(ArchiverError) as context:
+                creator._process_items(clips, False)
+            self.assertIn('Could not create 1 of 3', str(context.exception))
+
+            self.assertEqual(client.request_count, 3)
+            self.assertIsNotNone(creator._executor)
+            self.assertEqual(
+                _get_file_names(dir_path / 'Created'),
+                ['Clip 0.json', 'Clip 0.wav', 'Clip 2.json', 'Clip 2.wav'])
+            for name, clip_id in (('Clip 0', 7), ('Clip 2', 9)):
+                with open(dir_path / 'Created' / f'{name}.json') as file:
+                    metadata = json.load(file)
+                self.assertEqual(metadata['clips'][0]['id'], clip_id)
+
+            # The clip that was not created is left in place to be
+            # created later.
+            self.assertEqual(
+                _get_file_names(dir_path / 'Incoming'),
+                ['Clip 1.json', 'Clip 1.wav'])
+            self.assertEqual(
+                creator._journal.get_open_transitions(creator.path), [])
+
+
+    def test_uncommitted_transition_on_startup(self):
+
+        with TemporaryDirectory() as dir_name:
+
+            dir_path = Path(dir_name)
+            clips = [_copy_clip(i, dir_path / 'Incoming') for i in (0, 1)]
+            journal = TransitionJournal(dir_path / 'Journal.jsonl')
+            client = _Client(_Response(
+                200, b'{"recordings": [], "clips": [{"id": 7}]}'))
+            creator = _create_clip_creator(1, client, dir_path, journal)
+
+            # Start transition as if the archiver stopped after sending
+            # an import request for the first clip.
+            journal.start(creator.path, [clips[0].metadata_file_path])
+
+            creator._process_items(clips, False)
+
+            # The first clip should be set aside and the second created.
+            self.assertEqual(client.request_count, 1)
+            self.assertEqual(
+                _get_file_names(dir_path / 'Unconfirmed'),
+                ['Clip 0.json', 'Clip 0.wav'])
+            self.assertEqual(
+                _get_file_names(dir_path / 'Created'),
+                ['Clip 1.json', 'Clip 1.wav'])
+            self.assertEqual(journal.get_open_transitions(creator.path), [])
+
+
+    def test_reappearing_clip(self):
+
+        with TemporaryDirectory() as dir_name:
+
+            dir_path = Path(dir_name)
+            journal = TransitionJournal(dir_path / 'Journal.jsonl', 3600)
+            client = _Client(_Response(
+                200, b'{"recordings": [], "clips": [{"id": 7}]}'))
+            creator = _create_clip_creator(1, client, dir_path, journal)
+
+            clip = _copy_clip(0, dir_path / 'Incoming')
+            creator._process_items([clip], False)
+            (dir_path / 'Created' / 'Clip 0.json').unlink()
+
+            # Files of created clip reappear, for example because a
+            # sync program restores them. The clip should be archived
+            # with its remembered ID without being created again.
+            clip = _copy_clip(0, dir_path / 'Incoming')
+            creator._process_items([clip], False)
+
+            self.assertEqual(client.request_count, 1)
+            self.assertEqual(_get_file_names(dir_path / 'Incoming'), [])
+            with open(dir_path / 'Created' / 'Clip 0.json') as file:
+                metadata = json.load(file)
+            self.assertEqual(metadata['clips'][0]['id'], 7)
+
+
+def _create_clip(num):
+    return Clip(_DATA_DIR_PATH / f'Clip {num}.json')
+
+
+def _copy_clip(num, dir_path, name=None, start_time=None):
+
+    dir_path.mkdir(exist_ok=True)
+
+    if name is None:
+        name = f'Clip {num}'
+
+    metadata_file_path = dir_path / f'{name}.json'
+    shutil.copy(_DATA_DIR_PATH / f'Clip {num}.json', metadata_file_path)
+
+    if start_time is not None:
+        with open(metadata_file_path) as file:
+            metadata = json.load(file)
+        metadata['clips'][0]['start_time'] = start_time
+        with open(metadata_file_path, 'w') as file:
+            json.dump(metadata, file)
+
+    metadata_file_path.with_suffix('.wav').touch()
+
+    return Clip(metadata_file_path)
+
+
+def _get_file_names(dir_path):
+    return sorted(p.name for p in dir_path.iterdir())
+
+
+def _create_clip_creator(
+        batch_size, client=None, dir_path=None, journal=None,
+        concurrency=None):
+
+    vesper = Bunch(
+        archive_url='http://localhost/',
+        archive_url_base='/',
+        username='user',
+        password='password',
+        clip_import_batch_size=batch_size,
+        clip_import_concurrency=concurrency)
+
+    if dir_path is None:
+        settings = Bunch(vesper=vesper, created_clip_dir_path=None)
+    else:
+        settings = Bunch(
+            vesper=vesper,
+            vesper_client=client,
+            created_clip_dir_path=dir_path / 'Created',
+            unconfirmed_clip_dir_path=dir_path / 'Unconfirmed',
+            journal=journal)
+
+    return VesperClipCreator(settings)
+
+
+class _Client:
+
+    """Vesper client that responds to every request in the same way."""
+
+    def __init__(self, response):
+        self.breaker = None
+        self.request_count = 0
+        self._response = response
+
+    def import_objects(self, data):
+        self.request_count += 1
+        if isinstance(self._response, Exception):
+            raise self._response
+        return self._response
+
+
+class _ConcurrentClient:
+
+    """
+    Vesper client that responds to each request according to the start
+    time of its first clip, once the specified number of requests are
+    in flight.
+    """
+
+    def __init__(self, responses, concurrency):
+        self.breaker = None
+        self.request_count = 0
+        self._responses = responses
+        self._barrier = threading.Barrier(concurrency, timeout=5)
+        self._lock = threading.Lock()
+
+    def import_objects(self, data):
+        with self._lock:
+            self.request_count += 1
+        self._barrier.wait()
+        return self._responses[data['clips'][0]['start_time']]
+
+
+class _Response:
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.content = content
+        self.text = content.decode('utf-8')
@@ -0,0 +1,160 @@
+from datetime import datetime as DateTime, timedelta as TimeDelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+import json
+import shutil
+import tempfile
+
+from lrgv.archiver.archiver_index import ArchiverIndex
+from lrgv.archiver.recording import Recording
+from lrgv.archiver.transition_journal import TransitionJournal
+from lrgv.archiver.vesper_recording_creator import VesperRecordingCreator
+from lrgv.util.bunch import Bunch
+from lrgv.util.test_case import TestCase
+import lrgv.archiver.night_dirs as night_dirs
+
+
+_DATA_DIR_PATH = Path(__file__).parent / 'data'
+_UTC = ZoneInfo('UTC')
+_TIME_ZONE = ZoneInfo('US/Central')
+
+
+class VesperRecordingCreatorTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+        self._archived_dir_path = self._dir_path / 'Archived'
+        self._archived_dir_path.mkdir()
+        self._index = ArchiverIndex(self._dir_path / 'Index.sqlite')
+
+
+    def tearDown(self):
+        self._index.close()
+        self._temp_dir.cleanup()
+
+
+    def test_backfill_index(self):
+
+        now = DateTime.now(_UTC).replace(microsecond=0)
+        recent = now - TimeDelta(hours=12)
+        old = now - TimeDelta(days=10)
+
+        self._create_recording('Vesper Recorder 0', recent, 17)
+        self._create_recording('Vesper Recorder 0', old, 16)
+
+        creator = VesperRecordingCreator(Bunch(
+            vesper=Bunch(),
+            vesper_client=Bunch(breaker=None),
+            archived_recording_dir_path=self._archived_dir_path,
+            index=self._index,
+            station_time_zone=_TIME_ZONE))
+
+        creator._process_items((), False)
+
+        # Only the recent recording is recorded.
+        for start_time, expected in ((recent, True), (old, False)):
+            night = night_dirs.get_night_date(start_time, _TIME_ZONE)
+            start_times = self._index.get_recording_start_times(
+                'Alamo', 'Vesper Recorder 0', night)
+            self.assertEqual(start_time.isoformat() in start_times, expected)
+
+
+    def test_committed_transition_on_startup(self):
+
+        journal = TransitionJournal(self._dir_path / 'Journal.jsonl')
+        creator = VesperRecordingCreator(Bunch(
+            vesper=Bunch(),
+            vesper_client=_Client(None),
+            archived_recording_dir_path=self._archived_dir_path,
+            index=self._index,
+            index_stage='Archived',
+            station_time_zone=_TIME_ZONE,
+            journal=journal))
+
+        incoming_dir_path = self._dir_path / 'Incoming'
+        incoming_dir_path.mkdir()
+        shutil.copy(_DATA_DIR_PATH / 'Recording 0.json', incoming_dir_path)
+        recording = Recording(incoming_dir_path / 'Recording 0.json')
+
+        # Commit transition as if the archiver stopped after creating
+        # the recording but before moving its metadata file.
+        metadata = recording.metadata_file_contents
+        metadata['recordings'][0]['id'] = 21
+        recording.id = 21
+        num = journal.start(creator.path, [recording.metadata_file_path])[0]
+        journal.commit([
+            (num, creator._get_created_transition(recording, metadata))])
+
+        creator._process_items([recording], False)
+
+        # The transition is completed without a request, and the
+        # recording is recorded in the index so that its clips are not
+        # held back.
+        self.assertEqual(creator._client.request_count, 0)
+        self.assertEqual(journal.get_open_transitions(creator.path), [])
+        self.assertTrue(
+            (self._archived_dir_path / 'Recording 0.json').exists())
+        night = night_dirs.get_night_date(recording.start_time, _TIME_ZONE)
+        start_times = self._index.get_recording_start_times(
+            'Alamo', 'Vesper Recorder 0', night)
+        self.assertEqual(start_times, {recording.start_time.isoformat()})
+
+
+    def test_reappearing_recording(self):
+
+        client = _Client(b'{"recordings": [{"id": 21}], "clips": []}')
+        creator = VesperRecordingCreator(Bunch(
+            vesper=Bunch(),
+            vesper_client=client,
+            archived_recording_dir_path=self._archived_dir_path,
+            journal=TransitionJournal(
+                self._dir_path / 'Journal.jsonl', 3600)))
+
+        incoming_dir_path = self._dir_path / 'Incoming'
+        incoming_dir_path.mkdir()
+        metadata_file_path = incoming_dir_path / 'Recording 0.json'
+
+        # Create recording, and then restore its metadata file, as a
+        # sync program might.
+        for _ in range(2):
+            shutil.copy(_DATA_DIR_PATH / 'Recording 0.json', incoming_dir_path)
+            creator._process_items([Recording(metadata_file_path)], False)
+
+        # The recording is created only once, and both times its
+        # metadata file is archived with its ID.
+        self.assertEqual(client.request_count, 1)
+        self.assertFalse(metadata_file_path.exists())
+        with open(self._archived_dir_path / 'Recording 0.json') as file:
+            metadata = json.load(file)
+        self.assertEqual(metadata['recordings'][0]['id'], 21)
+
+
+    def _create_recording(self, recorder_name, start_time, recording_id):
+
+        with open(_DATA_DIR_PATH / 'Recording 0.json') as file:
+            metadata = json.load(file)
+
+        r = metadata['recordings'][0]
+        r['recorder'] = recorder_name
+        r['start_time'] = start_time.strftime('%Y-%m-%d %H:%M:%S Z')
+        r['id'] = recording_id
+
+        file_name = start_time.strftime('Alamo_%Y-%m-%d_%H.%M.%S_Z.json')
+        with open(self._archived_dir_path / file_name, 'wt') as file:
+            json.dump(metadata, file)
+
+
+class _Client:
+
+    """Vesper client that responds to every request with the same content."""
+
+    def __init__(self, content):
+        self.breaker = None
+        self.request_count = 0
+        self._content = content
+
+    def import_objects(self, data):
+        self.request_count += 1
+        return Bunch(status_code=200, ok=True, content=self._content)
@@ -0,0 +1,501 @@
+"""
+Append-only journal of archiver stage transitions that involve a
+Vesper server.
+
+When the archiver creates a clip or recording in the Vesper archive, it
+makes three changes that cannot be made atomically together: the
+server creates the object and assigns it an ID, the archiver writes a
+new metadata file with that ID in its destination directory, and the
+archiver removes the object's files from its source directory. If the
+archiver stopped between the first change and the last, it would find
+the object's files still in the source directory when it restarted,
+and create the object again.
+
+The journal prevents that. Each transition has three records:
+
+start
+    written before the archiver sends the import request. It
+    identifies the source metadata file of the object.
+
+commit
+    written after the server creates the object, before any files are
+    moved. It contains everything needed to complete the transition
+    without the server: the object's new metadata, including its ID,
+    and the source and destination paths of its files.
+
+end
+    written after the files have been moved, or after the import
+    request failed.
+
+The owner of a transition (the processor that started it) completes
+committed transitions that have not ended, typically after the
+archiver restarts, instead of importing their objects again.
+
+An import request can also fail without telling whether or not the
+server created its objects, for example when it times out after it
+was sent, or when the server's response cannot be parsed. The Vesper
+server offers no way to look the objects up, so the owner never sends
+such a request again. Instead, it commits a transition that moves the
+objects' files to an *unconfirmed* directory, with no ID, and logs an
+error asking an operator to move the files back to the source
+directory if the objects are not in the archive. The owner does the
+same with transitions that started but were not committed when the
+archiver stopped.
+
+The journal also remembers the IDs of recently created objects by
+their natural keys (e.g. station, mic output, detector, start time,
+and serial number for a clip). A commit record can include the key
+and ID of the object its transition created, and the journal keeps
+them for a retention period after the transition ends, across
+restarts. Before it sends an import request, the owner of a transition
+looks up the keys of the objects it is about to create, and just moves
+the files of objects that were already created, with their remembered
+IDs. This keeps the archiver from creating an object again if its
+files reappear in the source directory, for example because a sync
+program restores them after the archiver moved them.
+
+Records are JSON objects, one per line. Start and commit records are
+forced to disk before the methods that write them return. To amortize
+the cost of that, concurrent writers share `fsync` calls: while one
+writer syncs the file, others queue their records, and the next sync
+writes all of them at once (this is often called *group commit*). End
+records are not forced to disk, since losing one only means that a
+transition is completed again, and completing a transition is
+idempotent.
+"""
+
+
+from pathlib import Path
+import itertools
+import json
+import os
+import threading
+import time
+
+from lrgv.archiver.archiver_error import ArchiverError
+
+
+_START = 'start'
+_COMMIT = 'commit'
+_END = 'end'
+
+# Kind of record written when the journal file is compacted for each
+# created object that is remembered, since the commit record of its
+# transition is discarded.
+_CREATED = 'created'
+
+# Size in bytes above which the journal file is compacted when no
+# transitions are open.
+_MAX_IDLE_FILE_SIZE = 1024 * 1024
+
+
+class TransitionJournal:
+
+
+    def __init__(self, file_path, created_object_retention_period=None):
+
+        """
+        Initializes this journal, reading any existing journal file.
+
+        Parameters
+        ----------
+        file_path : Path
+            the path of the journal file.
+
+        created_object_retention_period : float | None
+            the period in seconds for which to remember the IDs of
+            created objects, or `None` to not remember them.
+        """
+
+        self._file_path = Path(file_path)
+        self._created_object_retention_period = \
+            created_object_retention_period
+
+        # Mapping from keys of remembered created objects to
+        # `(id, creation_time)` pairs, in order of creation time.
+        self._created_objects = {}
+
+        # Mapping from numbers of open transitions to dictionaries
+        # combining their start and commit records.
+        self._open_transitions = self._read_file()
+
+        start_num = max(self._open_transitions, default=0) + 1
+        self._transition_nums = itertools.count(start_num)
+
+        # Discard the records of ended transitions and of created
+        # objects that are no longer remembered.
+        self._forget_created_objects()
+        self._compacted_size = self._compact()
+
+        self._open_file()
+
+        # Group commit state. Lines are queued in `self._pending_lines`
+        # and counted in `self._queued_count`. `self._synced_count` is
+        # the number of queued lines that have been written and synced.
+        self._pending_lines = []
+        self._queued_count = 0
+        self._synced_count = 0
+        self._syncing = False
+
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+
+
+    def _open_file(self):
+        try:
+            self._file = open(self._file_path, 'a')
+        except Exception as e:
+            raise ArchiverError(
+                f'Could not open archiver journal file '
+                f'"{self._file_path}". Error message was: {e}')
+
+
+    def _read_file(self):
+
+        transitions = {}
+
+        try:
+            file = open(self._file_path)
+        except FileNotFoundError:
+            return transitions
+        except Exception as e:
+            raise ArchiverError(
+                f'Could not open archiver journal file '
+                f'"{self._file_path}". Error message was: {e}')
+
+        with file:
+
+            for line in file:
+
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # partial last line written when archiver stopped
+
+                    continue
+
+                kind = record.pop('record')
+
+                if kind == _CREATED:
+                    self._remember_created_object(
+                        record['key'], record['id'], record['time'])
+                    continue
+
+                num = record.pop('num')
+
+                if kind == _START:
+                    transitions[num] = record
+
+                elif kind == _COMMIT:
+
+                    # Commit records rewritten by compaction have no
+                    # time, but their created objects have their own
+                    # records.
+                    creation_time = record.pop('time', None)
+                    created_object = record.get('created_object')
+                    if created_object is not None and \
+                            creation_time is not None:
+                        self._remember_created_object(
+                            *created_object, creation_time)
+
+                    transition = transitions.get(num)
+                    if transition is not None:
+                        transition.update(record)
+                        transition['committed'] = True
+
+                else:
+                    transitions.pop(num, None)
+
+        return transitions
+
+
+    def _compact(self):
+
+        """
+        Rewrites the journal file with only open transitions and
+        remembered created objects.
+
+        Returns the size of the new file.
+        """
+
+        lines = [
+            _format_created_record(key, object_id, creation_time)
+            for key, (object_id, creation_time)
+            in self._created_objects.items()]
+
+        for num, transition in self._open_transitions.items():
+            lines.append(_format_record(num, _START, transition))
+            if transition.get('committed'):
+                lines.append(_format_record(num, _COMMIT, transition))
+
+        temp_file_path = self._file_path.with_name(
+            self._file_path.name + '.tmp')
+
+        try:
+            self._file_path.parent.mkdir(
+                mode=0o755, parents=True, exist_ok=True)
+            with open(temp_file_path, 'w') as file:
+                file.write(''.join(lines))
+                file.flush()
+                os.fsync(file.fileno())
+                size = file.tell()
+            os.replace(temp_file_path, self._file_path)
+        except Exception as e:
+            raise ArchiverError(
+                f'Could not compact archiver journal file '
+                f'"{self._file_path}". Error message was: {e}')
+
+        return size
+
+
+    def start(self, owner, metadata_file_paths):
+
+        """
+        Starts transitions for the objects with the specified metadata
+        files.
+
+        Returns the numbers of the new transitions, in the order of the
+        metadata file paths.
+        """
+
+        nums = []
+        lines = []
+
+        with self._lock:
+
+            for path in metadata_file_paths:
+                num = next(self._transition_nums)
+                transition = {'owner': owner, 'metadata_file_path': str(path)}
+                self._open_transitions[num] = transition
+                nums.append(num)
+                lines.append(_format_record(num, _START, transition))
+
+        self._write(lines, sync=True)
+
+        return nums
+
+
+    def commit(self, commits):
+
+        """
+        Commits transitions.
+
+        Parameters
+        ----------
+        commits : Sequence[tuple[int, dict]]
+            `(num, data)` pairs, where `num` is the number of a started
+            transition and `data` is a JSON-serializable dictionary
+            containing everything the transition's owner needs to
+            complete the transition. If the transition created an
+            object, `data` can include a `created_object` item whose
+            value is a `[key, id]` pair, in which case the journal
+            remembers the ID for its owner's `get_created_object_ids`
+            lookups. The key must be a string.
+        """
+
+        lines = []
+
+        now = time.time()
+
+        with self._lock:
+            for num, data in commits:
+                transition = self._open_transitions[num]
+                transition.update(data)
+                transition['committed'] = True
+                created_object = data.get('created_object')
+                if created_object is not None:
+                    self._remember_created_object(*created_object, now)
+                lines.append(
+                    _format_record(num, _COMMIT, {**data, 'time': now}))
+
+        self._write(lines, sync=True)
+
+
+    def end(self, nums):
+
+        """Ends transitions."""
+
+        lines = []
+
+        with self._lock:
+            for num in nums:
+                if self._open_transitions.pop(num, None) is not None:
+                    lines.append(_format_record(num, _END, {}))
+
+        self._write(lines, sync=False)
+
+
+    def get_open_transitions(self, owner):
+
+        """
+        Gets the open transitions of the specified owner.
+
+        Returns a list of `(num, transition)` pairs. Each transition is
+        a dictionary with a `metadata_file_path` item, and if the
+        transition has been committed, a `committed` item whose value
+        is `True` and the items of its commit data.
+        """
+
+        with self._lock:
+            return [
+                (num, dict(transition))
+                for num, transition in self._open_transitions.items()
+                if transition['owner'] == owner]
+
+
+    def get_created_object_ids(self, keys):
+
+        """
+        Gets the IDs of remembered created objects.
+
+        Returns a mapping from those of the specified keys that are of
+        objects created within the retention period to the objects'
+        IDs.
+        """
+
+        with self._lock:
+
+            self._forget_created_objects()
+
+            ids = {}
+            for key in keys:
+                created_object = self._created_objects.get(key)
+                if created_object is not None:
+                    ids[key] = created_object[0]
+
+            return ids
+
+
+    def _remember_created_object(self, key, object_id, creation_time):
+
+        if self._created_object_retention_period is None:
+            return
+
+        # Remove any existing item for the key first, so that the new
+        # item goes at the end, keeping the items in order of creation
+        # time.
+        self._created_objects.pop(key, None)
+        self._created_objects[key] = (object_id, creation_time)
+
+
+    def _forget_created_objects(self):
+
+        """Forgets objects created before the retention period."""
+
+        period = self._created_object_retention_period
+
+        if period is None:
+            return
+
+        min_time = time.time() - period
+
+        objects = self._created_objects
+        while len(objects) != 0:
+            key, (_, creation_time) = next(iter(objects.items()))
+            if creation_time >= min_time:
+                break
+            del objects[key]
+
+
+    def _write(self, lines, sync):
+
+        if len(lines) == 0:
+            return
+
+        with self._condition:
+
+            self._pending_lines.extend(lines)
+            self._queued_count += len(lines)
+
+            if not sync:
+
+                # Write queued lines without syncing them, unless
+                # another writer is about to write and sync them.
+                if not self._syncing:
+                    self._write_pending_lines()
+                    self._compact_if_idle()
+
+                return
+
+            target_count = self._queued_count
+
+            while self._synced_count < target_count:
+
+                if self._syncing:
+                    # another writer is syncing
+
+                    self._condition.wait()
+                    continue
+
+                # Become the writer that syncs, writing all queued
+                # lines, including those of other writers.
+                self._syncing = True
+                lines = self._pending_lines
+                self._pending_lines = []
+                count = self._queued_count
+
+                self._lock.release()
+
+                try:
+                    self._file.write(''.join(lines))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+
+                except Exception as e:
+
+                    self._lock.acquire()
+                    self._syncing = False
+                    self._condition.notify_all()
+
+                    raise ArchiverError(
+                        f'Could not write to archiver journal file '
+                        f'"{self._file_path}". Error message was: {e}')
+
+                self._lock.acquire()
+                self._syncing = False
+                self._synced_count = count
+                self._condition.notify_all()
+
+            self._compact_if_idle()
+
+
+    def _write_pending_lines(self):
+        try:
+            self._file.write(''.join(self._pending_lines))
+            self._file.flush()
+        except Exception as e:
+            raise ArchiverError(
+                f'Could not write to archiver journal file '
+                f'"{self._file_path}". Error message was: {e}')
+        self._pending_lines = []
+
+
+    def _compact_if_idle(self):
+
+        # Compact the file if it has grown large and no transitions are
+        # open. Remembered created objects survive compaction, so we
+        # wait until the file has at least doubled in size since it was
+        # last compacted, to keep the cost of compaction proportional to
+        # the number of records written.
+        if len(self._open_transitions) == 0 and \
+                len(self._pending_lines) == 0 and \
+                not self._syncing and \
+                self._file.tell() > \
+                max(_MAX_IDLE_FILE_SIZE, 2 * self._compacted_size):
+
+            self._file.close()
+            self._forget_created_objects()
+            self._compacted_size = self._compact()
+            self._open_file()
+
+
+def _format_record(num, kind, data):
+    record = {'num': num, 'record': kind, **data}
+    return json.dumps(record, separators=(',', ':')) + '\n'
+
+
+def _format_created_record(key, object_id, creation_time):
+    record = {
+        'record': _CREATED, 'key': key, 'id': object_id,
+        'time': creation_time}
+    return json.dumps(record, separators=(',', ':')) + '\n'
@@ -0,0 +1,510 @@
+"""
+Client of a Vesper server that is shared by all of the processors of an
+archiver.
+
+The client maintains a single HTTP session with the server, including a
+pool of connections that is large enough for several processors to use
+the session concurrently. It logs in to the server when it is first
+used, logs in again when the server reports that it is no longer logged
+in, and can optionally save its session cookies to a file so that the
+archiver can use them again after it restarts instead of logging in.
+The client can optionally gzip the JSON bodies of its import requests,
+which typically compress very well. If the server rejects a compressed
+request because of its encoding, the client resends it uncompressed
+and stops compressing requests. The client can also have a circuit
+breaker (see `lrgv.util.circuit_breaker`), in which case it does not
+send requests while the server is unavailable.
+"""
+
+
+import gzip
+import json
+import logging
+import os
+import threading
+
+from http.client import RemoteDisconnected
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError, ProtocolError
+import requests
+
+from lrgv.archiver.archiver_error import ArchiverError
+from lrgv.util.circuit_breaker import CircuitOpenError
+
+
+_logger = logging.getLogger(__name__)
+
+
+# Format for Vesper server login URL. We set the URL to redirect to
+# "/health-check/" after login instead of the default "/" since "/"
+# redirects to the clip calendar, which is relatively expensive to
+# serve.
+_LOGIN_URL_SUFFIX_FORMAT = '{}login/?next={}health-check/'
+
+_IMPORT_URL_SUFFIX = 'import-recordings-and-clips/'
+
+_DEFAULT_CONNECTION_POOL_SIZE = 10
+
+# Default (connect, read) timeouts in seconds of requests to the Vesper
+# server. Without a timeout, a request to a server that stopped
+# responding would wait forever, and with it the processor that sent it
+# and, if the request is the trial request of a half-open circuit
+# breaker, every other processor that uses the server.
+_DEFAULT_REQUEST_TIMEOUT = (10, 120)
+
+_COMPRESSED_REQUEST_HEADERS = {
+    'Content-Type': 'application/json',
+    'Content-Encoding': 'gzip'
+}
+
+# Status code with which a server rejects a request whose body has an
+# unsupported content encoding (415 Unsupported Media Type).
+_UNSUPPORTED_MEDIA_TYPE_STATUS_CODE = 415
+
+# Strings, one of which a server that rejects a request whose body has
+# an unsupported content encoding with status code 400 (Bad Request)
+# typically includes in its response.
+_ENCODING_REJECTION_STRINGS = ('gzip', 'encoding')
+
+# Status codes of responses that do not tell whether or not the server
+# acted on a request, since a proxy stopped waiting for the server's
+# response.
+UNKNOWN_OUTCOME_STATUS_CODES = frozenset((504,))
+
+
+class VesperClient:
+
+
+    def __init__(self, settings, breaker=None):
+
+        """
+        Initializes this client.
+
+        Parameters
+        ----------
+        settings : Bunch
+            Vesper server settings, including `archive_url`,
+            `archive_url_base`, `username`, and `password`, and
+            optionally `connection_pool_size`, `session_file_path`,
+            `request_compression_level`, and `request_timeout`.
+            `session_file_path` is the path of the file in which to save
+            session cookies, or `None` to not save them.
+            `request_compression_level` is the gzip compression level
+            (from 1 to 9) of import request bodies, or `None` to not
+            compress them. `request_timeout` is the timeout in seconds,
+            or (connect, read) pair of timeouts, of every request.
+
+        breaker : CircuitBreaker | None
+            circuit breaker for the Vesper server, or `None`.
+        """
+
+        s = settings
+
+        self._login_url = \
+            _LOGIN_URL_SUFFIX_FORMAT.format(s.archive_url, s.archive_url_base)
+        self._import_url = s.archive_url + _IMPORT_URL_SUFFIX
+
+        self._username = s.username
+        self._password = s.password
+
+        self._connection_pool_size = \
+            s.get('connection_pool_size') or _DEFAULT_CONNECTION_POOL_SIZE
+        self._session_file_path = s.get('session_file_path')
+        self._compression_level = s.get('request_compression_level')
+        self._timeout = s.get('request_timeout') or _DEFAULT_REQUEST_TIMEOUT
+        self._breaker = breaker
+
+        self._session = None
+
+        # Number of times we have logged in. A processor that finds that
+        # the client is not logged in logs in again only if no other
+        # processor has done so since it sent its request.
+        self._login_count = 0
+
+        self._lock = threading.Lock()
+
+
+    @property
+    def breaker(self):
+        return self._breaker
+
+
+    @property
+    def login_count(self):
+        return self._login_count
+
+
+    def import_objects(self, data):
+
+        """
+        Imports recordings and clips into the Vesper archive.
+
+        Parameters
+        ----------
+        data : dict
+            import data, with the same format as the contents of
+            recording and clip metadata files.
+
+        Returns
+        -------
+        requests.Response
+            the server's response.
+        """
+
+        compression_level = self._compression_level
+
+        if compression_level is None:
+            return self.post(self._import_url, json=data)
+
+        body = gzip.compress(
+            json.dumps(data).encode('utf-8'), compression_level)
+
+        response = self.post(
+            self._import_url, data=body, headers=_COMPRESSED_REQUEST_HEADERS)
+
+        if not _is_encoding_rejection(response):
+            return response
+
+        # If we get here, the server rejected the compressed request
+        # because it cannot decompress it. Resend the request
+        # uncompressed, and stop compressing requests if that succeeds.
+        # We do not resend requests that failed for other reasons, since
+        # that would double the load on a failing server and its
+        # circuit breaker's count of failures.
+
+        response = self.post(self._import_url, json=data)
+
+        if response.ok and self._compression_level is not None:
+            self._compression_level = None
+            _logger.warning(
+                'Vesper server rejected compressed request but accepted '
+                'uncompressed one. Will no longer compress requests.')
+
+        return response
+
+
+    def post(self, url, **kwargs):
+
+        """
+        Sends a POST request to the Vesper server, logging in first if
+        needed. If the server reports that the client is not logged in,
+        the client logs in again and resends the request once.
+
+        Raises `CircuitOpenError` without sending the request if the
+        client's circuit breaker is open.
+        """
+
+        if self._breaker is None:
+            return self._post(url, **kwargs)
+
+        if not self._breaker.allow_request():
+            raise CircuitOpenError(self._breaker)
+
+        try:
+            response = self._post(url, **kwargs)
+        except Exception:
+            self._breaker.record_failure()
+            raise
+
+        # We consider only server errors to be failures of the server.
+        # Client errors, such as for an invalid clip, are not.
+        if response.status_code >= 500:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+
+        return response
+
+
+    def _post(self, url, **kwargs):
+
+        kwargs.setdefault('timeout', self._timeout)
+
+        session, login_count = self._get_session()
+
+        try:
+            response = _post(session, url, **kwargs)
+
+        except requests.ConnectionError as e:
+
+            if not _is_dropped_connection_error(e):
+                raise
+
+            # The server closed the connection without responding. The
+            # server closes idle keep-alive connections, and a request
+            # sent on one just as the server closes it fails this way
+            # before the server has read it. That is far more common
+            # than a server that reads a request and then drops the
+            # connection without a response, since a proxy in front of
+            # a failing server responds with an error. We therefore
+            # resend the request once, on a new connection. If the
+            # resend fails too, the outcome is unknown.
+            _logger.info(
+                'Vesper server closed connection without responding. '
+                'Resending request on a new connection.')
+            _close_idle_connections(session, url)
+            response = _post(session, url, **kwargs)
+
+        if response.status_code == 401:
+            # not logged in
+
+            # TODO: Do we need to start a new session here, or just log in?
+            # When, exactly, do we need to start a new session? How do we
+            # detect when we need to start a new session? Is it just when
+            # we find that we are no longer logged in, or is there a more
+            # direct way for a client to tell when a session has expired?
+            session, _ = self._get_session(login_count)
+            response = _post(session, url, **kwargs)
+
+        return response
+
+
+    def _get_session(self, stale_login_count=None):
+
+        """
+        Gets our session, starting a new one if there is none or if
+        the login with count `stale_login_count` is still current.
+        """
+
+        with self._lock:
+
+            if self._session is None:
+
+                if not self._load_session():
+                    self._start_new_session()
+
+            elif self._login_count == stale_login_count:
+                self._start_new_session()
+
+            return self._session, self._login_count
+
+
+    def _create_session(self):
+
+        session = requests.session()
+
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self._connection_pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+
+    # TODO: Learn more about HTTP sessions, Django authentication,
+    # and the relationship between the two.
+    def _start_new_session(self):
+
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+        session = self._create_session()
+
+        try:
+            self._get_csrf_token(session)
+            self._log_in(session)
+        except Exception:
+            session.close()
+            raise
+
+        self._session = session
+        self._login_count += 1
+
+        _logger.info('Logged in to Vesper server.')
+
+        self._save_session()
+
+
+    def _get_csrf_token(self, session):
+
+        # Send GET request to Vesper server login page so HTTP session
+        # will have Django CSRF token. The token is required for
+        # subsequent POST requests that log in to the Vesper server and
+        # create recordings and clips.
+        try:
+            response = session.get(self._login_url, timeout=self._timeout)
+        except Exception as e:
+            raise ArchiverError(
+                f'Could not get CSRF token from Vesper server. HTTP GET '
+                f'request raised exception with message: {e}')
+
+        if not response.ok:
+            raise ArchiverError(
+                f'Could not get CSRF token from Vesper server. HTTP GET '
+                f'request returned status code {response.status_code}')
+
+
+    def _log_in(self, session):
+
+        data = {
+            'username': self._username,
+            'password': self._password
+        }
+
+        response = _post(
+            session, self._login_url, data=data, timeout=self._timeout)
+
+        if not response.ok:
+            raise ArchiverError('Could not log in to Vesper server.')
+
+
+    def _load_session(self):
+
+        """
+        Loads session cookies saved by a previous client, if there are
+        any.
+
+        Returns `True` if and only if cookies were loaded. The cookies
+        may have expired, in which case the server will report that we
+        are not logged in and we will log in again.
+        """
+
+        if self._session_file_path is None or \
+                not self._session_file_path.exists():
+            return False
+
+        try:
+            with open(self._session_file_path) as file:
+                cookies = json.load(file)
+        except Exception as e:
+            _logger.warning(
+                f'Could not load Vesper session cookies from file '
+                f'"{self._session_file_path}". Error message was: {e}')
+            return False
+
+        session = self._create_session()
+
+        for c in cookies:
+            session.cookies.set(
+                c['name'], c['value'], domain=c['domain'], path=c['path'],
+                expires=c['expires'], secure=c['secure'])
+
+        if 'csrftoken' not in session.cookies:
+            session.close()
+            return False
+
+        self._session = session
+
+        _logger.info('Loaded saved Vesper server session.')
+
+        return True
+
+
+    def _save_session(self):
+
+        if self._session_file_path is None:
+            return
+
+        cookies = [
+            {
+                'name': c.name,
+                'value': c.value,
+                'domain': c.domain,
+                'path': c.path,
+                'expires': c.expires,
+                'secure': c.secure
+            }
+            for c in self._session.cookies]
+
+        # The cookies grant access to the Vesper archive, so we make
+        # the file readable only by its owner.
+        try:
+            self._session_file_path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(
+                self._session_file_path,
+                os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, 'wt') as file:
+                json.dump(cookies, file)
+        except Exception as e:
+            _logger.warning(
+                f'Could not save Vesper session cookies to file '
+                f'"{self._session_file_path}". Error message was: {e}')
+
+
+def may_have_reached_server(exception):
+
+    """
+    Determines whether or not the request that raised the specified
+    exception may have reached the Vesper server, so that the server
+    may have acted on it even though we got no response.
+
+    Only failures to connect to the server are known not to have
+    reached it. Exceptions that are not raised by `requests`, such as
+    an `ArchiverError` raised when logging in fails, are raised before
+    the request is sent. Note that `VesperClient.post` resends a
+    request once if the server closes its connection without
+    responding, so such an exception means that the resend failed, too.
+    """
+
+    if isinstance(exception, CircuitOpenError) or \
+            not isinstance(exception, requests.RequestException):
+        return False
+
+    if isinstance(exception, requests.ConnectTimeout):
+        return False
+
+    if isinstance(exception, requests.ConnectionError):
+        reason = exception.args[0] if exception.args else None
+        reason = getattr(reason, 'reason', reason)
+        if isinstance(reason, NewConnectionError):
+            return False
+
+    return True
+
+
+def _is_dropped_connection_error(exception):
+
+    """
+    Determines whether or not the specified `requests.ConnectionError`
+    was raised because the server closed the connection of a request
+    without sending a response.
+    """
+
+    reason = exception.args[0] if exception.args else None
+
+    if not isinstance(reason, ProtocolError) or len(reason.args) < 2:
+        return False
+
+    return isinstance(
+        reason.args[1],
+        (RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+
+
+def _close_idle_connections(session, url):
+
+    """
+    Closes the pooled connections of a session to the specified URL, so
+    that the session's next request to it uses a new connection.
+    """
+
+    session.get_adapter(url).close()
+
+
+def _is_encoding_rejection(response):
+
+    """
+    Determines whether or not the specified response to a compressed
+    request indicates that the server rejected the request because of
+    its content encoding.
+    """
+
+    status_code = response.status_code
+
+    if status_code == _UNSUPPORTED_MEDIA_TYPE_STATUS_CODE:
+        return True
+
+    if status_code != 400:
+        return False
+
+    text = response.text.lower()
+    return any(s in text for s in _ENCODING_REJECTION_STRINGS)
+
+
+def _post(session, url, headers=None, **kwargs):
+    headers = {**_get_post_headers(session), **(headers or {})}
+    return session.post(url, headers=headers, **kwargs)
+
+
+def _get_post_headers(session):
+    return {'X-CSRFToken': session.cookies['csrftoken']}
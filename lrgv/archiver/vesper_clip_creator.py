@@ -1,132 +1,530 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime as DateTime
+from pathlib import Path
 import json
 import logging
-
-import requests
+import time
 
 from lrgv.archiver.archiver_error import ArchiverError
+from lrgv.archiver.clip import Clip
+from lrgv.archiver.file_move_recorder import FileMoveRecorder
+from lrgv.archiver.vesper_client import (
+    UNKNOWN_OUTCOME_STATUS_CODES, VesperClient, may_have_reached_server)
+from lrgv.archiver.vesper_recording_creator import (
+    get_recording_creation_cause)
 from lrgv.dataflow import SimpleSink
+from lrgv.util.circuit_breaker import CircuitOpenError
+import lrgv.archiver.night_dirs as night_dirs
 
 
 _logger = logging.getLogger(__name__)
 
 
-# Format for Vesper server login URL. We set the URL to redirect to
-# "/health-check/" after login instead of the default "/" since "/"
-# redirects to the clip calendar, which is relatively expensive to
-# serve.
-_LOGIN_URL_SUFFIX_FORMAT = '{}login/?next={}health-check/'
-
-_CREATE_OBJECTS_URL_SUFFIX = 'import-recordings-and-clips/'
+# Period in seconds after which to check again whether or not the
+# recordings of held clips have been created. Creating a recording of
+# a held clip's station also unblocks us, so this is only a fallback.
+_HELD_CLIP_RECHECK_PERIOD = 60
 
 
-class VesperClipCreator(SimpleSink):
+class VesperClipCreator(FileMoveRecorder, SimpleSink):
 
 
     def __init__(self, settings, parent=None, name=None):
 
         super().__init__(settings, parent, name)
 
-        s = settings.vesper
+        # Vesper server client, typically shared with other processors.
+        self._client = settings.get('vesper_client')
+        if self._client is None:
+            self._client = VesperClient(settings.vesper)
 
-        self._login_url = \
-            _LOGIN_URL_SUFFIX_FORMAT.format(s.archive_url, s.archive_url_base)
-        self._create_clips_url = s.archive_url + _CREATE_OBJECTS_URL_SUFFIX
+        self._init_file_move_recorder(settings)
 
-        self._username = s.username
-        self._password = s.password
-        self._session = None
+        # Time zone in which to compute the nights of clips if our
+        # created clip directory is partitioned by night, or `None` if
+        # it is not.
+        self._night_dir_time_zone = settings.get('night_dir_time_zone')
 
+        # Maximum number of clips to import with one request.
+        self._batch_size = settings.vesper.get('clip_import_batch_size') or 1
 
-    def _process_item(self, clip, finished):
+        # Maximum number of import requests to have in flight at once,
+        # and executor that sends them when that number is more than one.
+        self._concurrency = \
+            settings.vesper.get('clip_import_concurrency') or 1
+        self._executor = None
 
-        if self._session is None:
-            self._start_new_session()
+        # Optional `ActivityScheduler`, which we tell when we skip clips
+        # because the Vesper server is unavailable.
+        self._scheduler = settings.get('scheduler')
 
-        # Create clip in Vesper archive. The clip receives an ID on
-        # the server, which is also set as `clip.id`.
-        self._create_clip(clip)
+        # Optional `Bunch` with `time_zone` and `wait_period` attributes.
+        # If present, we hold back each clip until its recording has
+        # been created, as recorded in our index, or until the clip
+        # started at least `wait_period` seconds ago. The time zone is
+        # the one in which recording nights are computed.
+        self._recording_hold = settings.get('recording_hold')
 
-        _logger.info(
-            f'Processor "{self.path}" created Vesper clip {clip.id} '
-            f'for station "{clip.station_name}", mic output '
-            f'"{clip.mic_output_name}", and start time {clip.start_time}.')
+        # Optional `ClipAudioFileUploadStarter` that we tell about each
+        # clip we create, so that it can start uploading the clip's
+        # audio file right away.
+        self._upload_starter = settings.get('upload_starter')
 
+        # Optional `ClipHandoff` into which we put each clip we create,
+        # for the audio file archiver that follows us.
+        self._handoff = settings.get('handoff')
 
-    # TODO: Learn more about HTTP sessions, Django authentication,
-    # and the relationship between the two.
-    def _start_new_session(self):
+        # Optional `TransitionJournal` in which we record the creation
+        # of each clip, so that we never create a clip twice. The
+        # journal also remembers the IDs of the clips we create by
+        # their natural keys, so that we do not create a clip again if
+        # its files reappear.
+        self._journal = settings.get('journal')
 
-        if self._session is not None:
-            self._session.close()
+        # Directory to which we move the files of clips that we may or
+        # may not have created, for example because an import request
+        # timed out. We never send such clips to the server again, since
+        # that could create them twice.
+        self._unconfirmed_clip_dir_path = \
+            settings.get('unconfirmed_clip_dir_path')
 
-        self._session = requests.session()
 
-        try:
-            self._get_csrf_token()
-        except Exception:
-            self._session = None
-            raise
+    def _process_items(self, clips, finished):
 
-        self._log_in()
+        clips = self._resolve_open_transitions(clips)
 
+        clip_count = len(clips)
 
-    def _get_csrf_token(self):
+        clips, failed_clips = self._complete_created_clips(clips)
 
-        # Send GET request to Vesper server login page so HTTP session
-        # will have Django CSRF token. The token is required for
-        # subsequent POST requests that log in to the Vesper server and
-        # create clips.
-        try:
-            response = self._session.get(self._login_url)
-        except Exception as e:
-            raise ArchiverError(
-                f'Could not get CSRF token from Vesper server. HTTP GET '
-                f'request raised exception with message: {e}')
+        if len(clips) != 0 and not self._is_server_unavailable():
 
-        if not response.ok:
+            clips = self._release_held_clips(clips)
+
+            if len(clips) != 0:
+
+                batches = self._get_batches(clips)
+
+                failed_clips += self._create_clips(batches)
+
+                # Note if the server became unavailable while we were
+                # creating clips, in which case we may have skipped some.
+                self._is_server_unavailable()
+
+        if len(failed_clips) != 0:
             raise ArchiverError(
-                f'Could not get CSRF token from Vesper server. HTTP GET '
-                f'request returned status code {response.status_code}')
+                f'Could not create {len(failed_clips)} of {clip_count} '
+                f'clips in Vesper archive database. See log for details.')
 
 
-    def _log_in(self):
+    def _resolve_open_transitions(self, clips):
 
-        data = {
-            'username': self._username,
-            'password': self._password
-        }
+        """
+        Completes the clip creation transitions that we left open in
+        our journal, for example when the archiver stopped while
+        creating clips.
 
-        response = _post(self._session, self._login_url, data=data)
+        We complete a committed transition by moving its clip's files
+        as recorded in the transition. A transition that was not
+        committed may or may not have created its clip, so we move the
+        clip's files to the unconfirmed clip directory.
 
-        if not response.ok:
-            raise ArchiverError('Could not log in to Vesper server.')
-        
+        Returns the specified clips less those of open transitions,
+        which must not be created again.
+        """
+
+        if self._journal is None:
+            return clips
+
+        transitions = self._journal.get_open_transitions(self.path)
+
+        if len(transitions) == 0:
+            return clips
+
+        open_paths = set()
+
+        for num, transition in transitions:
+
+            metadata_file_path = Path(transition['metadata_file_path'])
+            open_paths.add(metadata_file_path)
+
+            if not transition.get('committed'):
+                # import request sent, but outcome unknown
+
+                if not metadata_file_path.exists():
+                    # clip files already moved or deleted
+
+                    self._journal.end([num])
+                    continue
+
+                if self._unconfirmed_clip_dir_path is None:
+                    # nowhere to set clip aside
+
+                    # Leave the transition open, so that we do not
+                    # create the clip again.
+                    continue
+
+                clip = Clip(metadata_file_path, self._metadata_cache)
+
+                self._set_aside_clips(
+                    [clip], [num],
+                    'The archiver stopped while the clip was being '
+                    'created.')
+
+                continue
+
+            try:
+                self._complete_transition(transition)
+            except ArchiverError as e:
+                _logger.error(
+                    f'Processor "{self.path}" could not complete the '
+                    f'archiving of clip metadata file '
+                    f'"{metadata_file_path}". Will try again later. Error '
+                    f'message was: {e}')
+                continue
+
+            self._journal.end([num])
+
+            if transition['clip_id'] is not None:
+                _logger.info(
+                    f'Processor "{self.path}" completed the archiving of '
+                    f'Vesper clip {transition["clip_id"]}.')
+
+        return tuple(
+            c for c in clips if c.metadata_file_path not in open_paths)
+
+
+    def _complete_created_clips(self, clips):
+
+        """
+        Moves the files of clips that our journal says we already
+        created to the created clip directory, without creating the
+        clips again.
+
+        Returns a pair of lists: the clips that were not already
+        created and the clips whose files could not be moved.
+        """
+
+        if self._journal is None or len(clips) == 0:
+            return list(clips), []
+
+        clip_keys = [_get_clip_key(c) for c in clips]
+
+        clip_ids = self._journal.get_created_object_ids(clip_keys)
+
+        if len(clip_ids) == 0:
+            return list(clips), []
+
+        new_clips = []
+        failed_clips = []
+
+        for clip, key in zip(clips, clip_keys):
+
+            clip_id = clip_ids.get(key)
+
+            if clip_id is None:
+                new_clips.append(clip)
+                continue
+
+            # We modify the metadata, so we evict it from the metadata
+            # cache (if there is one).
+            metadata = clip.metadata_file_contents
+            if self._metadata_cache is not None:
+                self._metadata_cache.evict(clip.metadata_file_path)
+
+            metadata['clips'][0]['id'] = clip_id
+            clip.id = clip_id
+            transition = self._get_created_transition(clip, metadata)
+
+            try:
+                self._complete_transition(transition)
+            except ArchiverError as e:
+                _logger.error(
+                    f'Processor "{self.path}" could not move the files '
+                    f'of previously created Vesper clip {clip_id} to the '
+                    f'created clip directory. Error message was: {e}')
+                failed_clips.append(clip)
+                continue
+
+            _logger.info(
+                f'Processor "{self.path}" found that Vesper clip '
+                f'{clip_id} for station "{clip.station_name}", mic '
+                f'output "{clip.mic_output_name}", and start time '
+                f'{clip.start_time} was already created, and moved its '
+                f'files to the created clip directory without creating '
+                f'it again.')
+
+            self._hand_off_clip(transition)
+
+        return new_clips, failed_clips
+
+
+    def _is_server_unavailable(self):
+
+        breaker = self._client.breaker
+
+        if breaker is None or not breaker.is_open():
+            return False
+
+        if self._scheduler is not None:
+            self._scheduler.record_blocked(breaker.retry_time, breaker)
+
+        return True
+
+
+    def _release_held_clips(self, clips):
+
+        """
+        Gets the clips that are not held back awaiting the creation of
+        their recordings.
+        """
+
+        hold = self._recording_hold
+
+        if hold is None or self._index is None:
+            return clips
+
+        now = DateTime.now(hold.time_zone)
+
+        # Mapping from (station name, recorder name, night) to the
+        # start times of the created recordings of that night.
+        recording_start_times = {}
+
+        released_clips = []
+
+        # Names of stations of held clips.
+        held_station_names = set()
+
+        for clip in clips:
+
+            recording = _get_recording(clip)
+
+            if recording is None or \
+                    (now - clip.start_time).total_seconds() >= \
+                    hold.wait_period:
+                # clip has no recording or has waited long enough
+
+                released_clips.append(clip)
+                continue
+
+            station_name, recorder_name, start_time = recording
+
+            night = night_dirs.get_night_date(start_time, hold.time_zone)
+            key = (station_name, recorder_name, night)
+
+            start_times = recording_start_times.get(key)
+            if start_times is None:
+                start_times = self._index.get_recording_start_times(*key)
+                recording_start_times[key] = start_times
+
+            if start_time.isoformat() in start_times:
+                released_clips.append(clip)
+            else:
+                held_station_names.add(station_name)
+
+        held_clip_count = len(clips) - len(released_clips)
+
+        if held_clip_count != 0:
+
+            _logger.debug(
+                f'Processor "{self.path}" is holding {held_clip_count} '
+                f'clips until their recordings are created.')
+
+            if self._scheduler is not None:
+                retry_time = time.monotonic() + _HELD_CLIP_RECHECK_PERIOD
+                for station_name in held_station_names:
+                    self._scheduler.record_blocked(
+                        retry_time,
+                        get_recording_creation_cause(station_name))
+
+        return released_clips
+
+
+    def _get_batches(self, clips):
+
+        """
+        Partitions clips into batches to be imported into the Vesper
+        archive with one request each.
+
+        The clips of a batch all have the same station, recorder, and
+        detector, so they typically all reference the same recording.
+        """
+
+        groups = {}
+
+        for clip in clips:
+            key = _get_batch_key(clip)
+            groups.setdefault(key, []).append(clip)
+
+        batch_size = self._batch_size
+
+        return [
+            group[i:i + batch_size]
+            for group in groups.values()
+            for i in range(0, len(group), batch_size)]
+
+
+    def _create_clips(self, batches):
+
+        """
+        Creates clips in the Vesper archive, one batch per request.
+
+        Up to `self._concurrency` requests are in flight at once. The
+        responses are handled on the calling thread, in the order of
+        the batches.
+
+        Returns the clips that could not be created. Clips that were
+        not sent to the Vesper server because it is unavailable are
+        left in place and are not included.
+        """
+
+        # Get batch metadata and import data. We modify the metadata
+        # after the clips are created, so we evict it from the metadata
+        # cache (if there is one) before doing so.
+        metadatas = []
+        import_data = []
+        for batch in batches:
+            batch_metadatas = [clip.metadata_file_contents for clip in batch]
+            if self._metadata_cache is not None:
+                for clip in batch:
+                    self._metadata_cache.evict(clip.metadata_file_path)
+            metadatas.append(batch_metadatas)
+            import_data.append(_get_import_data(batch_metadatas))
+
+        if self._concurrency == 1 or len(batches) == 1:
+            results = map(self._import_batch, batches, import_data)
+        else:
+            results = self._get_executor().map(
+                self._import_batch, batches, import_data)
+
+        failed_clips = []
+
+        for batch, batch_metadatas, (batch_nums, response, message,
+                outcome_unknown) in zip(batches, metadatas, results):
+
+            if response is not None:
+                failed_clips += self._process_response(
+                    batch, batch_metadatas, batch_nums, response)
+                continue
+
+            if outcome_unknown:
+                # server may or may not have created clips
+
+                failed_clips += self._set_aside_clips(
+                    batch, batch_nums, message)
+                continue
+
+            # If we get here, the server did not create the clips of
+            # the batch.
+            self._end_transitions(batch_nums)
+
+            if message is None:
+                # server unavailable
+
+                continue
+
+            elif len(batch) > 1:
+                # batch import failed
+
+                # The Vesper server imports the recordings and clips of
+                # a request in a single database transaction, so none
+                # of the clips of the batch were created. Create them
+                # one at a time so that one bad clip does not prevent
+                # the creation of the others.
+                _logger.warning(
+                    f'Processor "{self.path}" could not create batch of '
+                    f'{len(batch)} Vesper clips. {message} Will try to '
+                    f'create the clips one at a time.')
+
+                failed_clips += self._create_clips([[c] for c in batch])
+
+            else:
+                clip = batch[0]
+                _logger.error(
+                    f'Processor "{self.path}" could not create Vesper '
+                    f'clip for station "{clip.station_name}", mic output '
+                    f'"{clip.mic_output_name}", and start time '
+                    f'{clip.start_time}. {message}')
+                failed_clips.append(clip)
 
-    def _create_clip(self, clip):
+        return failed_clips
 
-        metadata = clip.metadata_file_contents
 
-        response = _post(self._session, self._create_clips_url, json=metadata)
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self._concurrency, thread_name_prefix=self.path)
+        return self._executor
 
-        if response.status_code == 401:
-            # not logged in
 
-            # TODO: Do we need to start a new session here, or just log in?
-            # When, exactly, do we need to start a new session? How do we
-            # detect when we need to start a new session? Is it just when
-            # we find that we are no longer logged in, or is there a more
-            # direct way for a client to tell when a session has expired?
-            self._start_new_session()
-            response = \
-                _post(self._session, self._create_clips_url, json=metadata)
+    def _import_batch(self, clips, data):
+
+        """
+        Starts the creation transitions of a batch of clips in our
+        journal and sends the Vesper import request for them.
+
+        Returns a `(nums, response, message, outcome_unknown)` tuple.
+        `nums` are the transition numbers of the clips. `response` is
+        the server's response if the request succeeded, or `None` if it
+        failed, in which case `message` is an error message sentence.
+        Both are `None` if the request was not sent because the server
+        is unavailable. `outcome_unknown` is `True` if and only if the
+        request failed in a way that does not tell whether or not the
+        server created the clips, for example because it timed out.
+        """
+
+        if self._journal is None:
+            nums = [None] * len(clips)
+        else:
+            nums = self._journal.start(
+                self.path, [c.metadata_file_path for c in clips])
+
+        return nums, *self._import_objects(data)
+
+
+    def _import_objects(self, data):
+
+        """
+        Sends a Vesper import request.
+
+        Returns a `(response, message, outcome_unknown)` triple as
+        described for `_import_batch`.
+        """
+
+        try:
+            response = self._client.import_objects(data)
+        except CircuitOpenError:
+            return None, None, False
+        except Exception as e:
+            return None, (
+                f'HTTP POST request raised exception with message: '
+                f'{e}'), may_have_reached_server(e)
+
+        if response.status_code in UNKNOWN_OUTCOME_STATUS_CODES:
+            return None, (
+                f'Vesper server request returned status code '
+                f'{response.status_code}.'), True
 
         if not response.ok:
-            message = response.content.decode(response.encoding)
-            raise ArchiverError(
-                f'Could not create clip in Vesper archive database. '
-                f'Vesper server error message was: {message}')
-        
-        # If we get here, we sucessfully added the new clip to the
+            return None, (
+                f'Vesper server error message was: {response.text}'), False
+
+        return response, None, False
+
+
+    def _end_transitions(self, nums):
+        if self._journal is not None:
+            self._journal.end(nums)
+
+
+    def _process_response(self, clips, metadatas, transition_nums, response):
+
+        """
+        Processes the response to a successful Vesper import request,
+        returning the clips that could not be processed.
+        """
+
+        # If we get here, we sucessfully added the new clips to the
         # Vesper archive database. It remains to move the clip files
         # to from their existing location to the created clip
         # directory, adding the clip's Vesper archive ID to its
@@ -134,55 +532,328 @@ class VesperClipCreator(SimpleSink):
         # a `ClipMover` processor since it doesn't know how to add
         # the clip ID.
 
-        # Set new Vesper clip ID on clip object and in metadata.
-        response_data = json.loads(response.content)
-        clip_id = response_data['clips'][0]['id']
-        metadata['clips'][0]['id'] = clip_id
-
-        # Create created clip directory if needed.
-        created_clip_dir_path = self._settings.created_clip_dir_path
+        # Get new Vesper clip IDs, which the server returns in the
+        # order of the clips of the request. If we can't, the server
+        # created the clips but we don't know their IDs.
         try:
-            created_clip_dir_path.mkdir(
-                mode=0o755, parents=True, exist_ok=True)
+            response_data = json.loads(response.content)
+            clip_ids = [c['id'] for c in response_data['clips']]
         except Exception as e:
-            raise ArchiverError(
-                f'Could not create directory "{created_clip_dir_path}". '
+            return self._set_aside_clips(
+                clips, transition_nums,
+                f'Could not get clip IDs from Vesper server response. '
                 f'Error message was: {e}')
-        
-        # Move audio file to created clip directory.
-        old_path = clip.audio_file_path
-        new_path = created_clip_dir_path / old_path.name
+
+        if len(clip_ids) != len(clips):
+            return self._set_aside_clips(
+                clips, transition_nums,
+                f'Received {len(clip_ids)} clip IDs from Vesper server '
+                f'for request to create {len(clips)} clips.')
+
+        # Set new Vesper clip IDs on clip objects and in metadata, and
+        # get the data needed to move the clips' files.
+        transitions = []
+        for clip, metadata, clip_id in zip(clips, metadatas, clip_ids):
+            metadata['clips'][0]['id'] = clip_id
+            clip.id = clip_id
+            transitions.append(self._get_created_transition(clip, metadata))
+
+        # Commit the clip creation transitions. Once we have done so,
+        # the clips will be moved even if the archiver stops before we
+        # move them below.
+        if self._journal is not None:
+            self._journal.commit(list(zip(transition_nums, transitions)))
+
+        failed_clips = []
+
+        for clip, transition, transition_num in \
+                zip(clips, transitions, transition_nums):
+
+            try:
+                self._complete_transition(transition)
+            except ArchiverError as e:
+                _logger.error(
+                    f'Processor "{self.path}" created Vesper clip '
+                    f'{clip.id} but could not move its files to the '
+                    f'created clip directory. Error message was: {e}')
+                failed_clips.append(clip)
+                continue
+
+            self._end_transitions([transition_num])
+
+            _logger.info(
+                f'Processor "{self.path}" created Vesper clip {clip.id} '
+                f'for station "{clip.station_name}", mic output '
+                f'"{clip.mic_output_name}", and start time '
+                f'{clip.start_time}.')
+
+            self._hand_off_clip(transition)
+
+        return failed_clips
+
+
+    def _set_aside_clips(self, clips, transition_nums, message):
+
+        """
+        Moves the files of clips that the Vesper server may or may not
+        have created to the unconfirmed clip directory, so that we do
+        not create them again. The clips' transitions must have been
+        started but not committed.
+
+        If we have no unconfirmed clip directory, we instead leave the
+        clips' transitions open, which also keeps us from creating the
+        clips again if we have a journal.
+
+        Returns the clips whose files could not be moved.
+        """
+
+        dir_path = self._unconfirmed_clip_dir_path
+
+        if dir_path is None:
+            # no unconfirmed clip directory
+
+            _logger.error(
+                f'Processor "{self.path}" may or may not have created '
+                f'{len(clips)} Vesper clips. {message}')
+            return []
+
+        transitions = [
+            self._get_transition(
+                clip, clip.metadata_file_contents, None, dir_path,
+                'Unconfirmed')
+            for clip in clips]
+
+        if self._journal is not None:
+            self._journal.commit(list(zip(transition_nums, transitions)))
+
+        failed_clips = []
+
+        for clip, transition, transition_num in \
+                zip(clips, transitions, transition_nums):
+
+            try:
+                self._complete_transition(transition)
+            except ArchiverError as e:
+                _logger.error(
+                    f'Processor "{self.path}" could not move the files '
+                    f'of clip "{clip.metadata_file_path}" to the '
+                    f'unconfirmed clip directory. Error message was: {e}')
+                failed_clips.append(clip)
+                continue
+
+            self._end_transitions([transition_num])
+
+            _logger.error(
+                f'Processor "{self.path}" may or may not have created '
+                f'Vesper clip for station "{clip.station_name}", mic '
+                f'output "{clip.mic_output_name}", and start time '
+                f'{clip.start_time}. {message} So that the clip is not '
+                f'created twice, its files have been moved to '
+                f'"{dir_path}". If the clip is not in the Vesper archive, '
+                f'move them back to "{clip.metadata_file_path.parent}" '
+                f'to create it.')
+
+        return failed_clips
+
+
+    def _get_created_transition(self, clip, metadata):
+
+        """
+        Gets the data needed to move a created clip's files to the
+        created clip directory, as a JSON-serializable dictionary.
+        """
+
+        created_clip_dir_path = self._settings.created_clip_dir_path
+        if self._night_dir_time_zone is not None:
+            created_clip_dir_path = night_dirs.get_night_dir_path(
+                created_clip_dir_path, clip.start_time,
+                self._night_dir_time_zone)
+
+        transition = self._get_transition(
+            clip, metadata, clip.id, created_clip_dir_path,
+            self._index_stage)
+
+        transition['created_object'] = [_get_clip_key(clip), clip.id]
+
+        return transition
+
+
+    def _get_transition(self, clip, metadata, clip_id, dir_path, stage):
+
+        """
+        Gets the data needed to move a clip's files to the specified
+        directory, writing the specified metadata to the new metadata
+        file, as a JSON-serializable dictionary.
+        """
+
+        audio_file_path = clip.audio_file_path
+        metadata_file_path = clip.metadata_file_path
+
+        return {
+            'clip_id': clip_id,
+            'audio_file_path': str(audio_file_path),
+            'new_audio_file_path': str(dir_path / audio_file_path.name),
+            'metadata_file_path': str(metadata_file_path),
+            'new_metadata_file_path':
+                str(dir_path / metadata_file_path.name),
+            'metadata': metadata,
+            'index_stage': stage,
+        }
+
+
+    def _complete_transition(self, transition):
+
+        """
+        Moves a clip's files as specified by a transition, for example
+        to the created clip directory, writing a new metadata file with
+        the transition's metadata (which include the clip's ID if the
+        clip was created).
+
+        This method is idempotent, so it can complete a transition
+        that was interrupted partway through.
+        """
+
+        old_audio_path = Path(transition['audio_file_path'])
+        new_audio_path = Path(transition['new_audio_file_path'])
+        old_metadata_path = Path(transition['metadata_file_path'])
+        new_metadata_path = Path(transition['new_metadata_file_path'])
+
+        # We remove the old metadata file last, so if it is gone the
+        # transition is already complete.
+        if not old_metadata_path.exists():
+            return
+
+        # Transitions journaled by earlier versions of this class have
+        # no index stage.
+        stage = transition.get('index_stage', self._index_stage)
+
+        # Create destination directory if needed.
+        dir_path = new_metadata_path.parent
         try:
-            old_path.rename(new_path)
+            dir_path.mkdir(mode=0o755, parents=True, exist_ok=True)
         except Exception as e:
             raise ArchiverError(
-                f'Could not move clip audio file "{old_path}" to '
-                f'"{new_path.parent}". Error message was: {e}')
+                f'Could not create directory "{dir_path}". '
+                f'Error message was: {e}')
         
-        # Create new metadata file in created clip directory.
-        old_path = clip.metadata_file_path
-        new_path = created_clip_dir_path / old_path.name
+        # Move audio file to destination directory, unless that was
+        # already done.
+        if old_audio_path.exists() or not new_audio_path.exists():
+
+            try:
+                old_audio_path.rename(new_audio_path)
+            except Exception as e:
+                raise ArchiverError(
+                    f'Could not move clip audio file "{old_audio_path}" '
+                    f'to "{new_audio_path.parent}". Error message was: {e}')
+
+            self._record_move(old_audio_path, new_audio_path, stage)
+
+        # Create new metadata file in destination directory.
         try:
-            with open(new_path, 'wt') as file:
-                json.dump(metadata, file, indent=4)
+            with open(new_metadata_path, 'wt') as file:
+                json.dump(transition['metadata'], file, indent=4)
         except Exception as e:
             raise ArchiverError(
-                f'Could not create clip metadata file "{new_path}". '
-                f'Error message was: {e}')
+                f'Could not create clip metadata file '
+                f'"{new_metadata_path}". Error message was: {e}')
         
         # Remove old metadata file.
         try:
-            old_path.unlink()
+            old_metadata_path.unlink()
         except Exception as e:
             raise ArchiverError(
-                f'Could not delete clip metadata file "{old_path}". '
-                f'Error message was: {e}')
+                f'Could not delete clip metadata file '
+                f'"{old_metadata_path}". Error message was: {e}')
+        
+        self._record_move(old_metadata_path, new_metadata_path, stage)
+
+
+    def _hand_off_clip(self, transition):
+
+        if self._upload_starter is None and self._handoff is None:
+            return
+
+        # Create a clip for the files in the created clip directory
+        # from the metadata we already have, so that it need not be
+        # loaded from the new metadata file.
+        clip = Clip(
+            Path(transition['new_metadata_file_path']),
+            self._metadata_cache, drop_metadata=True,
+            metadata_file_contents=transition['metadata'])
+
+        if self._upload_starter is not None:
+            self._upload_starter.start_upload(clip)
+
+        if self._handoff is not None:
+            self._handoff.put(clip)
+
+
+def _get_clip_key(clip):
+
+    """
+    Gets the key by which our journal remembers a created clip, derived
+    from the clip's natural key.
+    """
+
+    return json.dumps([
+        'Clip', clip.station_name, clip.mic_output_name,
+        clip.detector_name, clip.start_time.isoformat(), clip.serial_num])
+
+
+def _get_batch_key(clip):
+    recordings = clip.metadata_file_contents['recordings']
+    recorder_name = recordings[0]['recorder'] if recordings else None
+    return clip.station_name, recorder_name, clip.detector_name
+
+
+def _get_recording(clip):
+
+    """
+    Gets the station name, recorder name, and start time of the recording
+    of a clip, or `None` if the clip's metadata do not include one.
+    """
+
+    recordings = clip.metadata_file_contents['recordings']
+
+    if len(recordings) == 0:
+        return None
+
+    r = recordings[0]
+    start_time = _parse_start_time(r['start_time'])
+
+    return r['station'], r['recorder'], start_time
+
+
+def _parse_start_time(start_time):
+
+    # Get start time in ISO 8601 format. Note that we do not name the
+    # time part `time` since that would shadow the `time` module.
+    date, time_of_day, tz = start_time.split()
+    start_time = f'{date}T{time_of_day}{tz}'
+
+    return DateTime.fromisoformat(start_time)
+
+
+def _get_import_data(metadatas):
+
+    """
+    Combines the metadata of several clips into the data of a single
+    Vesper import request, including each distinct recording only once.
+    """
+
+    recordings = {}
+    clips = []
 
+    for metadata in metadatas:
 
-def _post(session, url, **kwargs):
-    headers = _get_post_headers(session)
-    return session.post(url, headers=headers, **kwargs)
+        for recording in metadata['recordings']:
+            key = json.dumps(recording, sort_keys=True)
+            recordings.setdefault(key, recording)
 
+        clips += metadata['clips']
 
-def _get_post_headers(session):
-    return {'X-CSRFToken': session.cookies['csrftoken']}
+    return {
+        'recordings': list(recordings.values()),
+        'clips': clips
+    }
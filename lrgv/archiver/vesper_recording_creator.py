@@ -1,110 +1,325 @@
+from datetime import datetime as DateTime, timedelta as TimeDelta
+from pathlib import Path
 import json
 import logging
 
-import requests
-
 from lrgv.archiver.archiver_error import ArchiverError
+from lrgv.archiver.file_move_recorder import FileMoveRecorder
+from lrgv.archiver.recording import Recording
+from lrgv.archiver.vesper_client import (
+    UNKNOWN_OUTCOME_STATUS_CODES, VesperClient, may_have_reached_server)
 from lrgv.dataflow import SimpleSink
+from lrgv.util.circuit_breaker import CircuitOpenError
+import lrgv.archiver.night_dirs as night_dirs
+import lrgv.util.file_utils as file_utils
 
 
 _logger = logging.getLogger(__name__)
 
 
-# Format for Vesper server login URL. We set the URL to redirect to
-# "/health-check/" after login instead of the default "/" since "/"
-# redirects to the clip calendar, which is relatively expensive to
-# serve.
-_LOGIN_URL_SUFFIX_FORMAT = '{}login/?next={}health-check/'
-
-_CREATE_OBJECTS_URL_SUFFIX = 'import-recordings-and-clips/'
+# Period in seconds before the present within which recordings that
+# were archived without being recorded in the archiver index (for
+# example by an earlier version of the archiver) are added to it when
+# the archiver starts. Clips are held back awaiting their recordings
+# for only an hour or so after they start, and recordings are at most a
+# night long, so older recordings do not matter.
+_INDEX_BACKFILL_PERIOD = 2 * 24 * 3600
 
 
-class VesperRecordingCreator(SimpleSink):
+class VesperRecordingCreator(FileMoveRecorder, SimpleSink):
 
 
     def __init__(self, settings, parent=None, name=None):
 
         super().__init__(settings, parent, name)
 
-        s = settings.vesper
+        # Vesper server client, typically shared with other processors.
+        self._client = settings.get('vesper_client')
+        if self._client is None:
+            self._client = VesperClient(settings.vesper)
+
+        self._init_file_move_recorder(settings)
+
+        # Optional `ActivityScheduler`, which we tell when we skip
+        # recordings because the Vesper server is unavailable, and
+        # wake when we create recordings, since clip creators may be
+        # holding back clips of the recordings.
+        self._scheduler = settings.get('scheduler')
+
+        # Time zone in which to compute the nights of the recordings
+        # that we record in our index, or `None` to not record them.
+        self._station_time_zone = settings.get('station_time_zone')
+
+        # Optional `TransitionJournal` in which we record the creation
+        # of each recording, so that we never create a recording twice.
+        # The journal also remembers the IDs of the recordings we create
+        # by their natural keys, so that we do not create a recording
+        # again if its metadata file reappears.
+        self._journal = settings.get('journal')
+
+        # Directory to which we move the metadata files of recordings
+        # that we may or may not have created, for example because an
+        # import request timed out. We never send such recordings to the
+        # server again, since that could create them twice.
+        self._unconfirmed_recording_dir_path = \
+            settings.get('unconfirmed_recording_dir_path')
+
+        self._index_backfilled = False
+
+
+    def _process_items(self, recordings, finished):
+
+        if not self._index_backfilled:
+            self._backfill_index()
+            self._index_backfilled = True
+
+        recordings = self._resolve_open_transitions(recordings)
+        super()._process_items(recordings, finished)
+
+
+    def _backfill_index(self):
+
+        """
+        Records recent recordings of our archived recording directory
+        that are missing from our index in it.
+
+        Clip creators hold back clips until the index says that their
+        recordings have been created, so without this they would hold
+        back the clips of recordings archived before the index recorded
+        created recordings for the full hold period.
+        """
+
+        if self._index is None or self._station_time_zone is None:
+            return
+
+        min_start_time = DateTime.now(file_utils.UTC_TIME_ZONE) - \
+            TimeDelta(seconds=_INDEX_BACKFILL_PERIOD)
+
+        dir_path = self._settings.archived_recording_dir_path
+
+        # Mapping from (station name, recorder name, night) to the
+        # start times of the recorded recordings of that night.
+        recording_start_times = {}
+
+        count = 0
+
+        for file in file_utils.scan_dir(dir_path):
+
+            if file.path.suffix != '.json':
+                continue
+
+            # Get recording start time from file name, so that we need
+            # not parse the metadata files of old recordings.
+            info = file_utils.parse_recording_file_name(file.path.name)
+            if info is None or info.start_time < min_start_time:
+                continue
+
+            recording = Recording(file.path, drop_metadata=True)
+
+            try:
+                night = night_dirs.get_night_date(
+                    recording.start_time, self._station_time_zone)
+                key = (recording.station_name, recording.recorder_name, night)
+            except Exception as e:
+                _logger.warning(
+                    f'Processor "{self.path}" could not read recording '
+                    f'metadata file "{file.path}". Error message was: {e}')
+                continue
+
+            start_times = recording_start_times.get(key)
+            if start_times is None:
+                start_times = self._index.get_recording_start_times(*key)
+                recording_start_times[key] = start_times
+
+            if recording.start_time.isoformat() not in start_times:
+                self._index.record_recording(
+                    *key, recording.start_time, recording.id)
+                count += 1
+
+        if count != 0:
+            _logger.info(
+                f'Processor "{self.path}" recorded {count} previously '
+                f'archived recordings in the archiver index.')
+
+
+    def _resolve_open_transitions(self, recordings):
+
+        """
+        Completes the recording creation transitions that we left open
+        in our journal, for example when the archiver stopped while
+        creating a recording.
+
+        We complete a committed transition by moving its recording's
+        metadata file as recorded in the transition, and recording the
+        recording in our index if it was created, so that clip creators
+        need not hold back its clips. A transition that was not
+        committed may or may not have created its recording, so we move
+        the recording's metadata file to the unconfirmed recording
+        directory.
+
+        Returns the specified recordings less those of open transitions,
+        which must not be created again.
+        """
+
+        if self._journal is None:
+            return recordings
 
-        self._login_url = \
-            _LOGIN_URL_SUFFIX_FORMAT.format(s.archive_url, s.archive_url_base)
-        self._create_objects_url = s.archive_url + _CREATE_OBJECTS_URL_SUFFIX
+        transitions = self._journal.get_open_transitions(self.path)
 
-        self._username = s.username
-        self._password = s.password
-        self._session = None
+        if len(transitions) == 0:
+            return recordings
+
+        open_paths = set()
+
+        for num, transition in transitions:
+
+            metadata_file_path = Path(transition['metadata_file_path'])
+            open_paths.add(metadata_file_path)
+
+            try:
+
+                if transition.get('committed'):
+                    self._complete_transition(transition)
+
+                elif not metadata_file_path.exists():
+                    # recording metadata file already moved or deleted
+
+                    pass
+
+                elif self._unconfirmed_recording_dir_path is None:
+                    # nowhere to set recording aside
+
+                    # Leave the transition open, so that we do not
+                    # create the recording again.
+                    continue
+
+                else:
+                    # import request sent, but outcome unknown
+
+                    recording = \
+                        Recording(metadata_file_path, self._metadata_cache)
+                    self._set_aside_recording(
+                        recording, num,
+                        'The archiver stopped while the recording was '
+                        'being created.')
+                    continue
+
+            except ArchiverError as e:
+                _logger.error(
+                    f'Processor "{self.path}" could not complete the '
+                    f'archiving of recording metadata file '
+                    f'"{metadata_file_path}". Will try again later. Error '
+                    f'message was: {e}')
+                continue
+
+            self._journal.end([num])
+
+            if transition.get('recording_id') is not None:
+
+                _logger.info(
+                    f'Processor "{self.path}" completed the archiving of '
+                    f'Vesper recording {transition["recording_id"]}.')
+
+                self._record_recording(Recording(
+                    Path(transition['new_metadata_file_path']),
+                    drop_metadata=True))
+
+        return tuple(
+            r for r in recordings
+            if r.metadata_file_path not in open_paths)
 
 
     def _process_item(self, recording, finished):
 
-        if self._session is None:
-            self._start_new_session()
+        if self._complete_created_recording(recording):
+            return
+
+        # Leave recording in place if the Vesper server is unavailable.
+        if self._is_server_unavailable():
+            return
 
         # Create recording in Vesper archive. The recording receives an
         # ID on the server, which is also set as `recording.id`.
-        self._create_recording(recording)
+        try:
+            created = self._create_recording(recording)
+        except CircuitOpenError:
+            self._is_server_unavailable()
+            return
+
+        if not created:
+            # recording set aside
+
+            return
 
         _logger.info(
             f'Processor "{self.path}" created Vesper recording '
             f'{recording.id} for station "{recording.station_name}" '
             f'and start time {recording.start_time}.')
 
-    # TODO: Learn more about HTTP sessions, Django authentication,
-    # and the relationship between the two.
-    def _start_new_session(self):
+        self._record_recording(recording)
 
-        if self._session is not None:
-            self._session.close()
 
-        self._session = requests.session()
+    def _complete_created_recording(self, recording):
 
-        try:
-            self._get_csrf_token()
-        except Exception:
-            self._session = None
-            raise
+        """
+        Moves the metadata file of a recording that our journal says we
+        already created to the archived recording directory, without
+        creating the recording again.
 
-        self._log_in()
+        Returns `True` if and only if the recording was already created.
+        """
 
+        if self._journal is None:
+            return False
 
-    def _get_csrf_token(self):
+        key = _get_recording_key(recording)
 
-        # Send GET request to Vesper server login page so HTTP session
-        # will have Django CSRF token. The token is required for
-        # subsequent POST requests that log in to the Vesper server and
-        # create clips.
-        try:
-            response = self._session.get(self._login_url)
-        except Exception as e:
-            raise ArchiverError(
-                f'Could not get CSRF token from Vesper server. HTTP GET '
-                f'request raised exception with message: {e}')
+        recording_id = self._journal.get_created_object_ids([key]).get(key)
 
-        if not response.ok:
-            raise ArchiverError(
-                f'Could not get CSRF token from Vesper server. HTTP GET '
-                f'request returned status code {response.status_code}')
+        if recording_id is None:
+            return False
 
+        metadata = self._get_metadata(recording)
+        metadata['recordings'][0]['id'] = recording_id
+        recording.id = recording_id
 
-    def _log_in(self):
+        self._complete_transition(
+            self._get_created_transition(recording, metadata))
 
-        data = {
-            'username': self._username,
-            'password': self._password
-        }
+        _logger.info(
+            f'Processor "{self.path}" found that Vesper recording '
+            f'{recording.id} for station "{recording.station_name}" and '
+            f'start time {recording.start_time} was already created, and '
+            f'moved its metadata file to the archived recording directory '
+            f'without creating it again.')
 
-        response = _post(self._session, self._login_url, data=data)
+        self._record_recording(recording)
 
-        if not response.ok:
-            raise ArchiverError('Could not log in to Vesper server.')
-        
+        return True
 
-    def _create_recording(self, recording):
+
+    def _is_server_unavailable(self):
+
+        breaker = self._client.breaker
+
+        if breaker is None or not breaker.is_open():
+            return False
+
+        if self._scheduler is not None:
+            self._scheduler.record_blocked(breaker.retry_time, breaker)
+
+        return True
+
+
+    def _get_metadata(self, recording):
 
         metadata = recording.metadata_file_contents
 
+        # Our callers modify the metadata, so we evict it from the
+        # metadata cache (if there is one).
+        if self._metadata_cache is not None:
+            self._metadata_cache.evict(recording.metadata_file_path)
+
         # Patch recording metadata for LRGV 2026 Harlington station.
         # Due to a SugarSync problem, that station is running an old
         # version of the script that creates recording metadata files.
@@ -117,22 +332,46 @@ class VesperRecordingCreator(SimpleSink):
                 r['mic_outputs'][0] == '21c 2 Vesper Output':
             r['mic_outputs'][0] = '21c 2 Output'
 
-        response = \
-            _post(self._session, self._create_objects_url, json=metadata)
+        return metadata
+
+
+    def _create_recording(self, recording):
+
+        """
+        Creates a recording in the Vesper archive and moves its metadata
+        file to the archived recording directory.
+
+        Returns `True` if the recording was created, or `False` if the
+        recording may or may not have been created and was set aside.
+        Raises an exception if the recording was not created.
+        """
+
+        metadata = self._get_metadata(recording)
 
-        if response.status_code == 401:
-            # not logged in
+        if self._journal is None:
+            transition_num = None
+        else:
+            transition_num = self._journal.start(
+                self.path, [recording.metadata_file_path])[0]
 
-            # TODO: Do we need to start a new session here, or just log in?
-            # When, exactly, do we need to start a new session? How do we
-            # detect when we need to start a new session? Is it just when
-            # we find that we are no longer logged in, or is there a more
-            # direct way for a client to tell when a session has expired?
-            self._start_new_session()
-            response = \
-                _post(self._session, self._create_objects_url, json=metadata)
+        try:
+            response = self._client.import_objects(metadata)
+        except Exception as e:
+            if not may_have_reached_server(e):
+                self._end_transition(transition_num)
+                raise
+            return self._set_aside_recording(
+                recording, transition_num,
+                f'HTTP POST request raised exception with message: {e}')
+
+        if response.status_code in UNKNOWN_OUTCOME_STATUS_CODES:
+            return self._set_aside_recording(
+                recording, transition_num,
+                f'Vesper server request returned status code '
+                f'{response.status_code}.')
 
         if not response.ok:
+            self._end_transition(transition_num)
             message = response.content.decode(response.encoding)
             raise ArchiverError(
                 f'Could not create recording in Vesper archive database. '
@@ -144,28 +383,161 @@ class VesperRecordingCreator(SimpleSink):
         # recording directory, adding the recording's Vesper archive
         # ID to its metadata.
 
+        # Get new Vesper recording ID. If we can't, the server created
+        # the recording but we don't know its ID.
+        try:
+            response_data = json.loads(response.content)
+            recording_id = response_data['recordings'][0]['id']
+        except Exception as e:
+            return self._set_aside_recording(
+                recording, transition_num,
+                f'Could not get recording ID from Vesper server response. '
+                f'Error message was: {e}')
+
         # Set new Vesper recording ID on recording object and in metadata.
-        response_data = json.loads(response.content)
-        recording_id = response_data['recordings'][0]['id']
         metadata['recordings'][0]['id'] = recording_id
+        recording.id = recording_id
+
+        transition = self._get_created_transition(recording, metadata)
+
+        # Commit the recording creation transition. Once we have done
+        # so, the recording metadata file will be moved even if the
+        # archiver stops before we move it below.
+        if self._journal is not None:
+            self._journal.commit([(transition_num, transition)])
+
+        self._complete_transition(transition)
+
+        self._end_transition(transition_num)
+
+        return True
+
+
+    def _set_aside_recording(self, recording, transition_num, message):
+
+        """
+        Moves the metadata file of a recording that the Vesper server
+        may or may not have created to the unconfirmed recording
+        directory, so that we do not create it again. The recording's
+        transition must have been started but not committed.
+
+        If we have no unconfirmed recording directory, we instead leave
+        the recording's transition open, which also keeps us from
+        creating the recording again if we have a journal.
+
+        Returns `False`, for the convenience of `_create_recording`.
+        """
+
+        dir_path = self._unconfirmed_recording_dir_path
+
+        if dir_path is None:
+            # no unconfirmed recording directory
+
+            _logger.error(
+                f'Processor "{self.path}" may or may not have created '
+                f'Vesper recording for station "{recording.station_name}" '
+                f'and start time {recording.start_time}. {message}')
+            return False
+
+        transition = self._get_transition(
+            recording, recording.metadata_file_contents, None, dir_path,
+            'Unconfirmed')
+
+        if self._journal is not None:
+            self._journal.commit([(transition_num, transition)])
+
+        self._complete_transition(transition)
+
+        self._end_transition(transition_num)
 
-        # Create archived recording directory if needed.
-        archived_recording_dir_path = \
-            self._settings.archived_recording_dir_path
+        _logger.error(
+            f'Processor "{self.path}" may or may not have created Vesper '
+            f'recording for station "{recording.station_name}" and start '
+            f'time {recording.start_time}. {message} So that the '
+            f'recording is not created twice, its metadata file has been '
+            f'moved to "{dir_path}". If the recording is not in the Vesper '
+            f'archive, move the file back to '
+            f'"{recording.metadata_file_path.parent}" to create it.')
+
+        return False
+
+
+    def _get_created_transition(self, recording, metadata):
+
+        """
+        Gets the data needed to move a created recording's metadata
+        file to the archived recording directory, as a JSON-serializable
+        dictionary.
+        """
+
+        transition = self._get_transition(
+            recording, metadata, recording.id,
+            self._settings.archived_recording_dir_path, self._index_stage)
+
+        transition['created_object'] = \
+            [_get_recording_key(recording), recording.id]
+
+        return transition
+
+
+    def _get_transition(
+            self, recording, metadata, recording_id, dir_path, stage):
+
+        """
+        Gets the data needed to move a recording's metadata file to the
+        specified directory, writing the specified metadata to the new
+        file, as a JSON-serializable dictionary.
+        """
+
+        old_path = recording.metadata_file_path
+        new_path = dir_path / old_path.name
+
+        return {
+            'recording_id': recording_id,
+            'metadata_file_path': str(old_path),
+            'new_metadata_file_path': str(new_path),
+            'metadata': metadata,
+            'index_stage': stage,
+        }
+
+
+    def _end_transition(self, num):
+        if self._journal is not None:
+            self._journal.end([num])
+
+
+    def _complete_transition(self, transition):
+
+        """
+        Moves a recording's metadata file as specified by a transition,
+        for example to the archived recording directory, writing the
+        transition's metadata (which include the recording's ID if the
+        recording was created) to the new file.
+
+        This method is idempotent, so it can complete a transition
+        that was interrupted partway through.
+        """
+
+        old_path = Path(transition['metadata_file_path'])
+        new_path = Path(transition['new_metadata_file_path'])
+
+        # If the old metadata file is gone, the new one was written.
+        if not old_path.exists():
+            return
+
+        # Create destination directory if needed.
+        dir_path = new_path.parent
         try:
-            archived_recording_dir_path.mkdir(
-                mode=0o755, parents=True, exist_ok=True)
+            dir_path.mkdir(mode=0o755, parents=True, exist_ok=True)
         except Exception as e:
             raise ArchiverError(
-                f'Could not create directory '
-                f'"{archived_recording_dir_path}". Error message was: {e}')
+                f'Could not create directory "{dir_path}". Error message '
+                f'was: {e}')
 
-        # Create new metadata file in archived recording directory.
-        old_path = recording.metadata_file_path
-        new_path = archived_recording_dir_path / old_path.name
+        # Create new metadata file in destination directory.
         try:
             with open(new_path, 'wt') as file:
-                json.dump(metadata, file, indent=4)
+                json.dump(transition['metadata'], file, indent=4)
         except Exception as e:
             raise ArchiverError(
                 f'Could not create recording metadata file "{new_path}". '
@@ -178,12 +550,52 @@ class VesperRecordingCreator(SimpleSink):
             raise ArchiverError(
                 f'Could not delete recording metadata file "{old_path}". '
                 f'Error message was: {e}')
+        
+        # Transitions journaled by earlier versions of this class have
+        # no index stage.
+        stage = transition.get('index_stage', self._index_stage)
+
+        self._record_move(old_path, new_path, stage)
+
+
+    def _record_recording(self, recording):
+
+        if self._index is None or self._station_time_zone is None:
+            return
+
+        night = night_dirs.get_night_date(
+            recording.start_time, self._station_time_zone)
+
+        self._index.record_recording(
+            recording.station_name, recording.recorder_name, night,
+            recording.start_time, recording.id)
+
+        # Resume processing of clips that were held back until a
+        # recording of this station was created.
+        if self._scheduler is not None:
+            self._scheduler.unblock(
+                get_recording_creation_cause(recording.station_name))
+
+
+def _get_recording_key(recording):
+
+    """
+    Gets the key by which our journal remembers a created recording,
+    derived from the recording's natural key.
+    """
+
+    return json.dumps([
+        'Recording', recording.station_name, recording.recorder_name,
+        recording.start_time.isoformat()])
 
 
-def _post(session, url, **kwargs):
-    headers = _get_post_headers(session)
-    return session.post(url, headers=headers, **kwargs)
+def get_recording_creation_cause(station_name):
 
+    """
+    Gets the cause with which processors that are waiting for a
+    recording of the specified station to be created record blocks with
+    an `ActivityScheduler`. Creating a recording of the station removes
+    the cause.
+    """
 
-def _get_post_headers(session):
-    return {'X-CSRFToken': session.cookies['csrftoken']}
+    return ('Recording Creation', station_name)
@@ -37,8 +37,6 @@ import csv
 import datetime
 import json
 
-import requests
-
 # Set up Django. This must happen before any use of Django, including
 # ORM class imports.
 import vesper.util.django_utils as django_utils
@@ -46,6 +44,7 @@ django_utils.set_up_django()
 
 from lrgv.archiver.archiver_error import ArchiverError
 from lrgv.archiver.app_settings_lrgv import app_settings
+from lrgv.archiver.vesper_client import VesperClient
 from vesper.django.app.models import Recording
 from vesper.util.bunch import Bunch
 
@@ -92,14 +91,6 @@ FILE_PATH_FORMAT = (
 CHANNEL_COUNT = 1
 SAMPLE_RATE = 22050
 
-# Format for Vesper server login URL. We set the URL to redirect to
-# "/health-check/" after login instead of the default "/" since "/"
-# redirects to the clip calendar, which is relatively expensive to
-# serve.
-LOGIN_URL_SUFFIX_FORMAT = '{}login/?next={}health-check/'
-
-CREATE_CLIPS_URL_SUFFIX = 'import-recordings-and-clips/'
-
 
 def main():
 
@@ -216,25 +207,17 @@ class Archiver:
 
     def __init__(self):
 
-        s = app_settings.vesper
-
-        self._login_url = \
-            LOGIN_URL_SUFFIX_FORMAT.format(s.archive_url, s.archive_url_base)
-        self._create_clips_url = s.archive_url + CREATE_CLIPS_URL_SUFFIX
-
-        self._username = s.username
-        self._password = s.password
-        self._session = None
+        # The Vesper client gzips request bodies according to the
+        # `request_compression_level` Vesper setting, falling back to
+        # uncompressed requests if the server rejects compressed ones.
+        self._client = VesperClient(app_settings.vesper)
 
 
     def archive_recordings(self, recordings):
 
         metadata = create_recording_metadata_json(recordings)
 
-        if self._session is None:
-            self._start_new_session()
-
-        response = post(self._session, self._create_clips_url, json=metadata)
+        response = self._client.import_objects(metadata)
 
         if not response.ok:
             message = response.content.decode(response.encoding)
@@ -246,54 +229,6 @@ class Archiver:
             print('Created missing recordings in Vesper archive.')
 
 
-    def _start_new_session(self):
-
-        if self._session is not None:
-            self._session.close()
-
-        self._session = requests.session()
-
-        try:
-            self._get_csrf_token()
-        except Exception:
-            self._session = None
-            raise
-
-        self._log_in()
-
-
-    def _get_csrf_token(self):
-
-        # Send GET request to Vesper server login page so HTTP session
-        # will have Django CSRF token. The token is required for
-        # subsequent POST requests that log in to the Vesper server and
-        # create clips.
-        try:
-            response = self._session.get(self._login_url)
-        except Exception as e:
-            raise ArchiverError(
-                f'Could not get CSRF token from Vesper server. HTTP GET '
-                f'request raised exception with message: {e}')
-
-        if not response.ok:
-            raise ArchiverError(
-                f'Could not get CSRF token from Vesper server. HTTP GET '
-                f'request returned status code {response.status_code}')
-
-
-    def _log_in(self):
-
-        data = {
-            'username': self._username,
-            'password': self._password
-        }
-
-        response = post(self._session, self._login_url, data=data)
-
-        if not response.ok:
-            raise ArchiverError('Could not log in to Vesper server.')
-        
-
 def create_recording_metadata_json(recordings):
     recording_dicts = [create_recording_dict(r) for r in recordings]
     d = {'recordings': recording_dicts}
@@ -320,14 +255,5 @@ def create_recording_dict(r):
     }
 
 
-def post(session, url, **kwargs):
-    headers = get_post_headers(session)
-    return session.post(url, headers=headers, **kwargs)
-
-
-def get_post_headers(session):
-    return {'X-CSRFToken': session.cookies['csrftoken']}
-
-
 if __name__ == '__main__':
     main()
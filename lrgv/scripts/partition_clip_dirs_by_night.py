@@ -0,0 +1,126 @@
+"""
+Script that partitions the archiver `Incoming`, `Created`, and `Archived`
+clip directories of a project by night.
+
+The script moves each clip file that is directly in one of those
+directories into a night subdirectory of it, for example from
+`Archived` to `Archived/2026-04-15`. It gets the start time of a clip
+from its file name and computes the clip's night in the station time
+zone of the project. Files whose names are not clip file names are left
+where they are. If the project has an archiver index, the script records
+the moves in it.
+
+The script should be run while the archiver is stopped, after which the
+`_PARTITION_CLIP_DIRS_BY_NIGHT` setting of the project's app settings
+module should be set to `True` before the archiver is restarted. The
+script can safely be run more than once.
+
+Usage: python partition_clip_dirs_by_night.py lrgv|lighthouse
+"""
+
+
+from datetime import datetime as DateTime
+import importlib
+import sys
+
+from lrgv.archiver.archiver_index import ArchiverIndex
+from lrgv.archiver.clip_lister import get_clip_file_name_fields
+import lrgv.archiver.night_dirs as night_dirs
+import lrgv.util.file_utils as file_utils
+
+
+PROJECT_NAMES = ('lrgv', 'lighthouse')
+CLIP_FILE_NAME_EXTENSIONS = ('.json', '.wav')
+METADATA_FILE_NAME_EXTENSION = '.json'
+CLIP_DIR_STAGES = (
+    ('Incoming', 'incoming_clip_dir_path'),
+    ('Created', 'created_clip_dir_path'),
+    ('Archived', 'archived_clip_dir_path'),
+)
+
+
+def main():
+
+    if len(sys.argv) != 2 or sys.argv[1] not in PROJECT_NAMES:
+        print(
+            'Usage: python partition_clip_dirs_by_night.py '
+            'lrgv|lighthouse')
+        sys.exit(1)
+
+    module_name = f'lrgv.archiver.app_settings_{sys.argv[1]}'
+    app_settings = importlib.import_module(module_name).app_settings
+
+    index_file_path = app_settings.paths.archiver_index_file_path
+    index = None if index_file_path is None else ArchiverIndex(index_file_path)
+
+    time_zone = app_settings.station_time_zone
+
+    total_count = 0
+
+    for station_paths in app_settings.paths.stations.values():
+        for detector_paths in station_paths.detectors.values():
+            for stage, attribute_name in CLIP_DIR_STAGES:
+                dir_path = getattr(detector_paths, attribute_name)
+                total_count += partition_dir(
+                    dir_path, stage, time_zone, index)
+
+    print(f'Moved a total of {total_count} clip files.')
+
+    if index is not None:
+        index.close()
+
+
+def partition_dir(dir_path, stage, time_zone, index):
+
+    file_count = 0
+
+    for file in file_utils.scan_dir(dir_path):
+
+        start_time = get_clip_start_time(file.path)
+
+        if start_time is None:
+            # not a clip file
+
+            continue
+
+        night_dir_path = \
+            night_dirs.get_night_dir_path(dir_path, start_time, time_zone)
+        new_path = night_dir_path / file.path.name
+
+        night_dir_path.mkdir(mode=0o755, parents=True, exist_ok=True)
+        file.path.rename(new_path)
+
+        if index is not None:
+            index.record_move(file.path, new_path, stage)
+
+        file_count += 1
+
+    if file_count != 0:
+        print(f'Moved {file_count} files in "{dir_path}".')
+
+    return file_count
+
+
+def get_clip_start_time(file_path):
+
+    if file_path.suffix.lower() not in CLIP_FILE_NAME_EXTENSIONS:
+        return None
+
+    # Both the metadata and audio files of a clip have the same
+    # name stem.
+    name = file_path.with_suffix(METADATA_FILE_NAME_EXTENSION).name
+
+    fields = get_clip_file_name_fields(name)
+
+    if fields is None:
+        return None
+
+    # Get start time in ISO 8601 format.
+    date, time, tz = fields.start_time.split()
+    start_time = f'{date}T{time}{tz}'
+
+    return DateTime.fromisoformat(start_time)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Script that unpacks clip containers.
+
+The script unpacks each clip container in the specified directories
+(typically archiver `Archived` clip directories) into the night
+subdirectory of the container's night, for example from
+`Archived/2026-04-15.zip` into `Archived/2026-04-15`, and then deletes
+the container and its index file. Archiver clip packing should be
+disabled while the script runs.
+
+Usage: python unpack_clip_containers.py <dir_path> [<dir_path> ...]
+"""
+
+
+from pathlib import Path
+import sys
+
+import lrgv.archiver.clip_container as clip_container
+
+
+def main():
+
+    if len(sys.argv) < 2:
+        print('Usage: python unpack_clip_containers.py <dir_path> ...')
+        sys.exit(1)
+
+    for dir_path in sys.argv[1:]:
+        unpack_containers(Path(dir_path))
+
+
+def unpack_containers(dir_path):
+
+    container_file_paths = clip_container.get_container_file_paths(dir_path)
+
+    for container_file_path in container_file_paths:
+
+        # Get night from container file name, e.g. "2026-04-15" from
+        # "2026-04-15.zip" or "2026-04-15_1.zip".
+        night = container_file_path.stem.split('_')[0]
+
+        night_dir_path = dir_path / night
+
+        file_paths = clip_container.unpack_container(
+            container_file_path, night_dir_path)
+
+        clip_container.get_index_file_path(container_file_path).unlink(
+            missing_ok=True)
+        container_file_path.unlink()
+
+        print(
+            f'Unpacked {len(file_paths)} files from "{container_file_path}" '
+            f'into "{night_dir_path}".')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Token bucket bandwidth limiter whose rate follows a time-of-day schedule.
+
+The limiter lets an application share a network link with other
+applications, for example by uploading at a low rate during the day,
+when the link is busy, and at a higher rate or without limit at night.
+"""
+
+
+from datetime import datetime as DateTime, time as Time
+import threading
+import time
+
+
+# Maximum period in seconds for which `BandwidthLimiter.acquire` sleeps
+# before checking the schedule again. This bounds how long a change of
+# scheduled rate takes to take effect, including when the rate is zero.
+_MAX_SLEEP_PERIOD = 10
+
+
+class BandwidthLimiter:
+
+
+    def __init__(self, schedule, time_zone=None, burst_period=1):
+
+        """
+        Initializes this limiter.
+
+        Parameters
+        ----------
+        schedule : Sequence[tuple[str, float | None]]
+            pairs of the form `(start_time, rate)`, where `start_time`
+            is a time of day like "08:00" and `rate` is the maximum rate
+            in bytes per second from that time until the start time of
+            the next pair. The last pair continues past midnight to the
+            start time of the first one. A rate of `None` means no
+            limit, and a rate of zero pauses transfers.
+
+        time_zone : ZoneInfo | None
+            the time zone of the schedule's start times, or `None` for
+            the local time zone.
+
+        burst_period : float
+            the period in seconds of transfer at the current rate that
+            may accumulate while transfers are idle.
+        """
+
+        if len(schedule) == 0:
+            raise ValueError('Bandwidth schedule must not be empty.')
+
+        self._schedule = sorted(
+            (Time.fromisoformat(start_time), rate)
+            for start_time, rate in schedule)
+
+        self._time_zone = time_zone
+        self._burst_period = burst_period
+
+        self._tokens = 0
+        self._update_time = time.monotonic()
+
+        self._lock = threading.Lock()
+
+
+    def get_rate(self, now=None):
+
+        """
+        Gets the scheduled rate at the specified time.
+
+        Parameters
+        ----------
+        now : DateTime | None
+            the time, or `None` for the current time.
+
+        Returns
+        -------
+        float | None
+            the rate in bytes per second, or `None` for no limit.
+        """
+
+        if now is None:
+            now = DateTime.now(self._time_zone)
+
+        time_of_day = now.time()
+
+        # The last pair applies before the start time of the first one.
+        rate = self._schedule[-1][1]
+
+        for start_time, start_rate in self._schedule:
+            if start_time <= time_of_day:
+                rate = start_rate
+            else:
+                break
+
+        return rate
+
+
+    def acquire(self, byte_count):
+
+        """
+        Waits until `byte_count` bytes may be transferred.
+
+        A request for more bytes than can accumulate in the bucket is
+        allowed once the bucket is full, and the bucket goes into debt
+        for the remainder, so that large transfers neither wait forever
+        nor exceed the scheduled rate on average.
+        """
+
+        while True:
+
+            with self._lock:
+
+                rate = self.get_rate()
+                now = time.monotonic()
+
+                if rate is None:
+                    # no limit
+
+                    self._tokens = 0
+                    self._update_time = now
+                    return
+
+                capacity = rate * self._burst_period
+
+                self._tokens = min(
+                    self._tokens + (now - self._update_time) * rate,
+                    capacity)
+                self._update_time = now
+
+                required_tokens = min(byte_count, capacity)
+
+                if rate != 0 and self._tokens >= required_tokens:
+                    self._tokens -= byte_count
+                    return
+
+                if rate == 0:
+                    sleep_period = _MAX_SLEEP_PERIOD
+                else:
+                    sleep_period = min(
+                        (required_tokens - self._tokens) / rate,
+                        _MAX_SLEEP_PERIOD)
+
+            time.sleep(sleep_period)
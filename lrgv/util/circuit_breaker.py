@@ -0,0 +1,287 @@
+"""
+Circuit breakers for remote services.
+
+A circuit breaker tracks the health of a remote service, such as a
+Vesper server or AWS S3, on behalf of all of the clients of the
+service. While the service is healthy the breaker is *closed* and
+clients use the service normally. After several consecutive failures
+the breaker *opens*, and clients skip their remote work rather than
+each failing slowly on its own. After an open period the breaker
+becomes *half open* and allows a single trial request. If the trial
+succeeds the breaker closes, and otherwise it opens again for a longer
+period. Open periods grow exponentially up to a maximum, and are
+jittered so that the clients of different services do not retry in
+lockstep.
+"""
+
+
+import logging
+import random
+import threading
+import time
+
+
+_logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+
+    """
+    Exception raised when a request is not sent to a service because
+    the service's circuit breaker is open.
+    """
+
+    def __init__(self, breaker):
+        super().__init__(
+            f'Service "{breaker.name}" is unavailable. Request was not '
+            f'sent.')
+        self.breaker = breaker
+
+
+class CircuitBreaker:
+
+
+    CLOSED = 'Closed'
+    OPEN = 'Open'
+    HALF_OPEN = 'Half Open'
+
+
+    def __init__(
+            self, name, failure_threshold=3, min_open_period=5,
+            max_open_period=300, backoff_factor=2, jitter=.2,
+            on_close=None):
+
+        """
+        Initializes this circuit breaker.
+
+        Parameters
+        ----------
+        name : str
+            the name of the service protected by this breaker.
+
+        failure_threshold : int
+            the number of consecutive failures after which this breaker
+            opens.
+
+        min_open_period : float
+            the period in seconds for which this breaker first opens.
+
+        max_open_period : float
+            the maximum period in seconds for which this breaker opens.
+
+        backoff_factor : float
+            the factor by which the open period grows each time a trial
+            request fails.
+
+        jitter : float
+            the maximum fraction by which open periods are randomly
+            shortened or lengthened.
+
+        on_close : Callable[[CircuitBreaker], None] | None
+            function to call when this breaker closes after having
+            been open, or `None`.
+        """
+
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._min_open_period = min_open_period
+        self._max_open_period = max_open_period
+        self._backoff_factor = backoff_factor
+        self._jitter = jitter
+        self._on_close = on_close
+
+        self._state = CircuitBreaker.CLOSED
+        self._failure_count = 0
+        self._open_period = 0
+        self._retry_time = 0
+        self._trial_in_progress = False
+
+        self._lock = threading.Lock()
+
+
+    @property
+    def name(self):
+        return self._name
+
+
+    @property
+    def state(self):
+        return self._state
+
+
+    @property
+    def retry_time(self):
+
+        """
+        The `time.monotonic` time at which this breaker will next allow
+        a request if it is open or half open, or zero if it is closed.
+        """
+
+        return self._retry_time
+
+
+    def is_open(self, now=None):
+
+        """
+        Determines whether or not this breaker would currently refuse a
+        request. Unlike `allow_request`, this method does not change
+        the state of the breaker.
+        """
+
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+
+            if self._state == CircuitBreaker.CLOSED:
+                return False
+
+            elif self._state == CircuitBreaker.OPEN:
+                return now < self._retry_time
+
+            else:
+                return self._trial_in_progress
+
+
+    def allow_request(self, now=None):
+
+        """
+        Determines whether or not a client may send a request to the
+        service.
+
+        If this breaker is half open, only one client at a time is
+        allowed to send a trial request. That client must report the
+        outcome with `record_success` or `record_failure`.
+        """
+
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+
+            if self._state == CircuitBreaker.CLOSED:
+                return True
+
+            elif self._state == CircuitBreaker.OPEN:
+
+                if now < self._retry_time:
+                    return False
+
+                self._start_trial(now)
+                return True
+
+            else:
+                # half open
+
+                if self._trial_in_progress:
+                    return False
+
+                self._start_trial(now)
+                return True
+
+
+    def _start_trial(self, now):
+
+        self._state = CircuitBreaker.HALF_OPEN
+        self._trial_in_progress = True
+
+        # Other clients should not retry before the trial request has
+        # had a chance to complete.
+        self._retry_time = now + self._min_open_period
+
+
+    def record_success(self):
+
+        with self._lock:
+
+            was_closed = self._state == CircuitBreaker.CLOSED
+
+            self._state = CircuitBreaker.CLOSED
+            self._failure_count = 0
+            self._open_period = 0
+            self._retry_time = 0
+            self._trial_in_progress = False
+
+        if not was_closed:
+
+            _logger.info(f'Service "{self._name}" is available again.')
+
+            if self._on_close is not None:
+                self._on_close(self)
+
+
+    def record_failure(self, now=None):
+
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+
+            self._failure_count += 1
+
+            if self._state == CircuitBreaker.CLOSED:
+
+                if self._failure_count < self._failure_threshold:
+                    return
+
+                self._open_period = self._min_open_period
+
+            elif self._state == CircuitBreaker.OPEN:
+                # failure of request sent before breaker opened
+
+                return
+
+            else:
+                # half open
+
+                self._open_period = min(
+                    self._open_period * self._backoff_factor,
+                    self._max_open_period)
+
+            period = self._open_period * \
+                (1 + random.uniform(-self._jitter, self._jitter))
+
+            self._state = CircuitBreaker.OPEN
+            self._retry_time = now + period
+            self._trial_in_progress = False
+
+            failure_count = self._failure_count
+
+        _logger.warning(
+            f'Service "{self._name}" failed {failure_count} consecutive '
+            f'times. Will skip requests to it for {period:.1f} seconds.')
+
+
+class CircuitBreakerRegistry:
+
+
+    """
+    Collection of circuit breakers, one per remote service, that all
+    have the same settings.
+    """
+
+
+    def __init__(self, **breaker_kwargs):
+        self._breaker_kwargs = breaker_kwargs
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+
+    def get(self, name):
+
+        """Gets the circuit breaker for the named service."""
+
+        with self._lock:
+
+            breaker = self._breakers.get(name)
+
+            if breaker is None:
+                breaker = CircuitBreaker(name, **self._breaker_kwargs)
+                self._breakers[name] = breaker
+
+            return breaker
+
+
+    def __iter__(self):
+        with self._lock:
+            return iter(tuple(self._breakers.values()))
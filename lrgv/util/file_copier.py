@@ -0,0 +1,273 @@
+"""
+File copier that avoids copying file data when it can.
+
+A `FileCopier` copies a file by the first of the following methods that
+works for the file systems of the source and destination:
+
+1. Creating a hard link to the source file, if the copier allows it.
+   This copies no data at all, but requires that the source and
+   destination be on the same file system, and makes them the same file
+   rather than two files with the same contents, so it is disabled by
+   default.
+
+2. Cloning the source file with a reflink (Linux only). The clone
+   shares data blocks with the source until either is modified. This
+   requires a copy-on-write file system such as Btrfs or XFS.
+
+3. Copying the file's data within the kernel with `os.copy_file_range`
+   (Linux only), without passing it through user space. A copy that
+   comes up short is treated as lack of support for the method.
+
+4. Copying the file with `shutil.copy2`.
+
+The copier remembers which method worked for each pair of source and
+destination file systems, and uses that method for subsequent copies
+between them. It stops using a method for a pair of file systems only
+when the method fails with an error that indicates that the file
+systems do not support it. When a method fails with another error that
+may concern only a particular file, such as when a file has too many
+links or a reflink is not permitted for it, the copier tries the next
+method for that file only. The copier is thread safe, so one copier
+can serve many threads.
+"""
+
+
+import errno
+import os
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # not Unix
+    fcntl = None
+
+
+def _get_errnos(*names):
+    return frozenset(
+        getattr(errno, name) for name in names if hasattr(errno, name))
+
+
+# Linux `FICLONE` ioctl request code, from `linux/fs.h`.
+_FICLONE = 0x40049409
+
+# Error numbers that indicate that a copy method is not supported for a
+# pair of file systems, as opposed to that a particular copy failed.
+_UNSUPPORTED_ERRNOS = _get_errnos(
+    'EXDEV', 'ENOSYS', 'ENOTSUP', 'EOPNOTSUPP')
+
+# Error numbers that indicate that reflinks are not supported for a pair
+# of file systems. The `FICLONE` ioctl fails with `EINVAL` or `ENOTTY`
+# on file systems that do not implement it, regardless of the file.
+_REFLINK_UNSUPPORTED_ERRNOS = \
+    _UNSUPPORTED_ERRNOS | _get_errnos('EINVAL', 'ENOTTY')
+
+# Error numbers that indicate that a copy method failed for a particular
+# file, but might work for others, so that we should try the next method
+# for the file but continue to use the method for other files.
+_FILE_ERRNOS = _get_errnos('EPERM', 'EINVAL', 'ENOTTY', 'EMLINK')
+
+
+class FileCopier:
+
+
+    LINK = 'Link'
+    REFLINK = 'Reflink'
+    COPY_FILE_RANGE = 'Copy File Range'
+    COPY = 'Copy'
+
+
+    def __init__(self, allow_links=False):
+
+        """
+        Initializes this copier.
+
+        Parameters
+        ----------
+        allow_links : bool
+            `True` if and only if this copier may copy files by creating
+            hard links to them.
+        """
+
+        # (name, function, unsupported error numbers) triples.
+        methods = []
+
+        if allow_links:
+            methods.append((FileCopier.LINK, _link, _UNSUPPORTED_ERRNOS))
+
+        if fcntl is not None and hasattr(os, 'copy_file_range'):
+            # Linux
+
+            methods.append((
+                FileCopier.REFLINK, _reflink, _REFLINK_UNSUPPORTED_ERRNOS))
+            methods.append((
+                FileCopier.COPY_FILE_RANGE, _copy_file_range,
+                _UNSUPPORTED_ERRNOS))
+
+        methods.append((FileCopier.COPY, _copy, _UNSUPPORTED_ERRNOS))
+
+        self._methods = tuple(methods)
+
+        # Mapping from (source device, destination device) pairs to
+        # indices in `self._methods` of the methods to use for them.
+        self._method_indices = {}
+
+        self._lock = threading.Lock()
+
+
+    def get_method_name(self, from_path, to_dir_path):
+
+        """
+        Gets the name of the method this copier uses to copy files from
+        the directory of `from_path` to the directory `to_dir_path`, or
+        `None` if it has not yet chosen one.
+        """
+
+        key = _get_device_pair(from_path, to_dir_path)
+
+        with self._lock:
+            index = self._method_indices.get(key)
+
+        return None if index is None else self._methods[index][0]
+
+
+    def copy(self, from_path, to_path):
+
+        """
+        Copies a file, replacing any existing file at the destination.
+
+        The destination's parent directory must exist. The destination
+        file gets the source file's modification time.
+        """
+
+        if os.path.exists(to_path) and os.path.samefile(from_path, to_path):
+            # destination already linked to source, for example by an
+            # earlier attempt to copy it
+
+            return
+
+        key = _get_device_pair(from_path, to_path.parent)
+
+        with self._lock:
+            index = self._method_indices.get(key, 0)
+
+        # `True` if and only if we have fallen back to a method because
+        # an earlier method failed for this file only.
+        file_fallback = False
+
+        while True:
+
+            _, method, unsupported_errnos = self._methods[index]
+
+            try:
+                method(from_path, to_path)
+
+            except OSError as e:
+
+                if index == len(self._methods) - 1:
+                    raise
+
+                if e.errno in unsupported_errnos:
+                    # method unsupported for these file systems
+
+                    # Fall back to the next method, for this copy and,
+                    # unless the method failed for this file only, for
+                    # subsequent copies.
+                    index += 1
+
+                    if not file_fallback:
+                        with self._lock:
+                            self._method_indices[key] = index
+
+                elif e.errno in _FILE_ERRNOS:
+                    # method failed for this file only
+
+                    # Fall back to the next method for this copy only.
+                    index += 1
+                    file_fallback = True
+
+                else:
+                    raise
+
+            else:
+
+                if not file_fallback:
+                    with self._lock:
+                        self._method_indices.setdefault(key, index)
+
+                return
+
+
+def _get_device_pair(from_path, to_dir_path):
+    return os.stat(from_path).st_dev, os.stat(to_dir_path).st_dev
+
+
+def _link(from_path, to_path):
+
+    try:
+        os.link(from_path, to_path)
+    except FileExistsError:
+        os.unlink(to_path)
+        os.link(from_path, to_path)
+
+
+def _reflink(from_path, to_path):
+
+    with open(from_path, 'rb') as from_file, open(to_path, 'wb') as to_file:
+        try:
+            fcntl.ioctl(to_file.fileno(), _FICLONE, from_file.fileno())
+        except OSError:
+            to_file.close()
+            _unlink_quietly(to_path)
+            raise
+
+    shutil.copystat(from_path, to_path)
+
+
+def _copy_file_range(from_path, to_path):
+
+    with open(from_path, 'rb') as from_file, open(to_path, 'wb') as to_file:
+
+        size = os.fstat(from_file.fileno()).st_size
+        remaining = size
+
+        try:
+
+            while remaining > 0:
+
+                count = os.copy_file_range(
+                    from_file.fileno(), to_file.fileno(), remaining)
+
+                if count == 0:
+                    # copy came up short
+
+                    # Some file systems, for example some network and
+                    # FUSE file systems, report end of file early
+                    # rather than failing. We treat this as lack of
+                    # support so that the copier falls back to another
+                    # method rather than leaving a truncated file.
+                    raise OSError(
+                        errno.EOPNOTSUPP,
+                        f'os.copy_file_range copied only '
+                        f'{size - remaining} of {size} bytes.')
+
+                remaining -= count
+
+        except OSError:
+            to_file.close()
+            _unlink_quietly(to_path)
+            raise
+
+    shutil.copystat(from_path, to_path)
+
+
+def _copy(from_path, to_path):
+    shutil.copy2(from_path, to_path)
+
+
+def _unlink_quietly(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -1,7 +1,9 @@
+from dataclasses import dataclass
 from datetime import datetime as DateTime
 from pathlib import Path
 from zoneinfo import ZoneInfo
 import logging
+import os
 
 from lrgv.util.bunch import Bunch
 
@@ -12,6 +14,20 @@ logger = logging.getLogger(__name__)
 UTC_TIME_ZONE = ZoneInfo('UTC')
 
 
+@dataclass(frozen=True)
+class FileInfo:
+
+    """Path, size, and last modification time of a file."""
+
+    path: Path
+    size: int
+    mtime_ns: int
+
+    @property
+    def mtime(self):
+        return self.mtime_ns / 1e9
+
+
 def parse_recording_file_name(name):
 
     stem = Path(name).stem
@@ -43,3 +59,63 @@ def parse_recording_file_name(name):
     file.start_time = start_time
 
     return file
+
+
+def scan_dir(dir_path, recursive=False):
+
+    """
+    Gets `FileInfo` objects for the files of a directory.
+
+    The files are sorted lexicographically by path. Subdirectories are
+    not included in the result, though their files are if `recursive`
+    is `True`. A nonexistent directory is treated as empty.
+
+    This function uses `os.scandir`, which gets file types along with
+    file names on most platforms, so it needs no system call to tell
+    files from subdirectories. It still calls `stat` once for each file
+    to get the file's size and modification time, except on Windows,
+    where `os.scandir` gets those along with the names, too.
+    """
+
+    files = []
+    _scan_dir(Path(dir_path), recursive, files)
+    files.sort(key=lambda f: f.path)
+    return tuple(files)
+
+
+def _scan_dir(dir_path, recursive, files):
+
+    try:
+        entries = tuple(os.scandir(dir_path))
+    except FileNotFoundError:
+        return
+
+    for entry in entries:
+
+        try:
+
+            if entry.is_dir():
+                if recursive:
+                    _scan_dir(dir_path / entry.name, recursive, files)
+
+            else:
+                stat = entry.stat()
+                files.append(FileInfo(
+                    dir_path / entry.name, stat.st_size, stat.st_mtime_ns))
+
+        except FileNotFoundError:
+            # file was deleted or moved after it was listed
+            pass
+
+
+def get_mtime_ns(path):
+
+    """
+    Gets the last modification time of a file or directory in
+    nanoseconds, or `None` if the file or directory does not exist.
+    """
+
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,59 @@
+from datetime import datetime as DateTime
+import time
+
+from lrgv.util.bandwidth_limiter import BandwidthLimiter
+from lrgv.util.test_case import TestCase
+
+
+class BandwidthLimiterTests(TestCase):
+
+
+    def test_get_rate(self):
+
+        limiter = BandwidthLimiter(
+            (('19:00', None), ('07:00', 1000), ('12:00', 0)))
+
+        cases = (
+            ('00:00', None),
+            ('06:59', None),
+            ('07:00', 1000),
+            ('11:59:59', 1000),
+            ('12:00', 0),
+            ('19:00', None),
+            ('23:59', None),
+        )
+
+        for time_of_day, expected in cases:
+            now = DateTime.fromisoformat(f'2025-05-01T{time_of_day}')
+            self.assertEqual(limiter.get_rate(now), expected)
+
+
+    def test_empty_schedule(self):
+        self.assert_raises(ValueError, BandwidthLimiter, ())
+
+
+    def test_acquire(self):
+
+        # no limit
+        limiter = BandwidthLimiter((('00:00', None),))
+        self._assert_acquire_period(limiter, (10 ** 9,) * 3, 0)
+
+        # Bucket starts empty and fills at scheduled rate.
+        limiter = BandwidthLimiter((('00:00', 10000),), burst_period=.1)
+        self._assert_acquire_period(limiter, (1000,) * 4, .4)
+
+        # A request larger than the bucket goes into debt.
+        limiter = BandwidthLimiter((('00:00', 10000),), burst_period=.1)
+        self._assert_acquire_period(limiter, (2000, 1000), .3)
+
+
+    def _assert_acquire_period(self, limiter, byte_counts, expected):
+
+        start_time = time.monotonic()
+
+        for byte_count in byte_counts:
+            limiter.acquire(byte_count)
+
+        period = time.monotonic() - start_time
+        self.assertGreaterEqual(period, expected - .01)
+        self.assertLess(period, expected + .1)
@@ -0,0 +1,89 @@
+from lrgv.util.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+from lrgv.util.test_case import TestCase
+
+
+_CLOSED = CircuitBreaker.CLOSED
+_OPEN = CircuitBreaker.OPEN
+_HALF_OPEN = CircuitBreaker.HALF_OPEN
+
+
+class CircuitBreakerTests(TestCase):
+
+
+    def test_open_and_close(self):
+
+        closed_breakers = []
+
+        breaker = CircuitBreaker(
+            'Vesper', failure_threshold=2, min_open_period=10,
+            max_open_period=30, backoff_factor=2, jitter=0,
+            on_close=closed_breakers.append)
+
+        # Breaker stays closed until failure threshold is reached.
+        breaker.record_failure(now=0)
+        self.assertEqual(breaker.state, _CLOSED)
+        self.assertTrue(breaker.allow_request(now=0))
+
+        # Breaker opens for minimum open period.
+        breaker.record_failure(now=0)
+        self.assertEqual(breaker.state, _OPEN)
+        self.assertEqual(breaker.retry_time, 10)
+        self.assertTrue(breaker.is_open(now=5))
+        self.assertFalse(breaker.allow_request(now=5))
+
+        # Failures of requests sent before breaker opened are ignored.
+        breaker.record_failure(now=5)
+        self.assertEqual(breaker.retry_time, 10)
+
+        # After open period, breaker allows a single trial request.
+        self.assertFalse(breaker.is_open(now=10))
+        self.assertTrue(breaker.allow_request(now=10))
+        self.assertEqual(breaker.state, _HALF_OPEN)
+        self.assertTrue(breaker.is_open(now=10))
+        self.assertFalse(breaker.allow_request(now=10))
+
+        # Failed trials reopen breaker for longer periods.
+        retry_times = []
+        now = 10
+        for _ in range(3):
+            breaker.record_failure(now=now)
+            retry_times.append(breaker.retry_time)
+            now = breaker.retry_time
+            self.assertTrue(breaker.allow_request(now=now))
+        self.assertEqual(retry_times, [30, 60, 90])
+
+        # Successful trial closes breaker.
+        breaker.record_success()
+        self.assertEqual(breaker.state, _CLOSED)
+        self.assertFalse(breaker.is_open(now=now))
+        self.assertEqual(closed_breakers, [breaker])
+
+        # Success of closed breaker does not invoke callback.
+        breaker.record_success()
+        self.assertEqual(closed_breakers, [breaker])
+
+
+    def test_jitter(self):
+
+        breaker = CircuitBreaker(
+            'S3', failure_threshold=1, min_open_period=10, jitter=.2)
+
+        for _ in range(20):
+            breaker.record_success()
+            breaker.record_failure(now=0)
+            self.assertGreaterEqual(breaker.retry_time, 8)
+            self.assertLessEqual(breaker.retry_time, 12)
+
+
+    def test_registry(self):
+
+        registry = CircuitBreakerRegistry(failure_threshold=1)
+
+        vesper = registry.get('Vesper')
+        self.assertIs(registry.get('Vesper'), vesper)
+        self.assertIsNot(registry.get('S3'), vesper)
+        self.assertEqual(
+            sorted(b.name for b in registry), ['S3', 'Vesper'])
+
+        vesper.record_failure(now=0)
+        self.assertEqual(vesper.state, _OPEN)
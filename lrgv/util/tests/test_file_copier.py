@@ -0,0 +1,191 @@
+from pathlib import Path
+import errno
+import os
+import tempfile
+import unittest
+
+from lrgv.util.file_copier import FileCopier
+from lrgv.util.test_case import TestCase
+import lrgv.util.file_copier as file_copier
+
+
+class FileCopierTests(TestCase):
+
+
+    def setUp(self):
+
+        self._temp_dir = tempfile.TemporaryDirectory()
+        dir_path = Path(self._temp_dir.name)
+
+        self._from_path = dir_path / 'from.wav'
+        self._from_path.write_bytes(b'0123456789' * 1000)
+        os.utime(self._from_path, ns=(10 ** 18, 10 ** 18))
+
+        self._to_dir_path = dir_path / 'to'
+        self._to_dir_path.mkdir()
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_link(self):
+
+        copier = FileCopier(allow_links=True)
+        to_path = self._copy(copier)
+
+        self.assertEqual(
+            copier.get_method_name(self._from_path, self._to_dir_path),
+            FileCopier.LINK)
+        self.assertTrue(os.path.samefile(self._from_path, to_path))
+
+        # Copying again is harmless.
+        self._copy(copier)
+        self.assertEqual(self._from_path.stat().st_nlink, 2)
+
+
+    def test_no_link(self):
+
+        copier = FileCopier()
+
+        # Create destination file to be replaced.
+        (self._to_dir_path / 'to.wav').write_bytes(b'old')
+
+        to_path = self._copy(copier)
+
+        self.assertNotEqual(
+            copier.get_method_name(self._from_path, self._to_dir_path),
+            FileCopier.LINK)
+        self.assertFalse(os.path.samefile(self._from_path, to_path))
+
+
+    def test_fallback(self):
+
+        calls = []
+
+        def method(name, error_numbers):
+
+            def copy(from_path, to_path):
+                calls.append(name)
+                if len(error_numbers) != 0:
+                    raise OSError(error_numbers.pop(0), 'Copy failed.')
+                to_path.write_bytes(from_path.read_bytes())
+                os.utime(to_path, ns=(10 ** 18, 10 ** 18))
+
+            return name, copy, file_copier._UNSUPPORTED_ERRNOS
+
+        copier = FileCopier()
+
+        # The first method fails once for a particular file, and then
+        # once because it is unsupported.
+        copier._methods = (
+            method('First', [errno.EMLINK, errno.EXDEV]),
+            method('Second', []))
+
+        # A per-file error falls back to the next method for that file
+        # only.
+        self._copy(copier)
+        self.assertEqual(calls, ['First', 'Second'])
+        self.assertIsNone(
+            copier.get_method_name(self._from_path, self._to_dir_path))
+
+        # An unsupported method error falls back to the next method for
+        # all subsequent files.
+        self._copy(copier)
+        self._copy(copier)
+        self.assertEqual(
+            calls, ['First', 'Second', 'First', 'Second', 'Second'])
+        self.assertEqual(
+            copier.get_method_name(self._from_path, self._to_dir_path),
+            'Second')
+
+
+    def test_other_error(self):
+
+        def copy(from_path, to_path):
+            raise OSError(errno.ENOSPC, 'No space left on device.')
+
+        copier = FileCopier()
+        unsupported_errnos = file_copier._UNSUPPORTED_ERRNOS
+        copier._methods = (
+            ('First', copy, unsupported_errnos),
+            ('Second', copy, unsupported_errnos))
+
+        with self.assertRaises(OSError):
+            copier.copy(self._from_path, self._to_dir_path / 'to.wav')
+
+        self.assertIsNone(
+            copier.get_method_name(self._from_path, self._to_dir_path))
+
+
+    def test_reflink_unsupported(self):
+
+        calls = []
+
+        def reflink(from_path, to_path):
+            calls.append('Reflink')
+            raise OSError(errno.EINVAL, 'Invalid argument.')
+
+        def copy(from_path, to_path):
+            calls.append('Copy')
+            file_copier._copy(from_path, to_path)
+
+        copier = FileCopier()
+        copier._methods = (
+            (FileCopier.REFLINK, reflink,
+             file_copier._REFLINK_UNSUPPORTED_ERRNOS),
+            (FileCopier.COPY, copy, file_copier._UNSUPPORTED_ERRNOS))
+
+        # A file system that rejects reflinks with `EINVAL` is not asked
+        # for one again.
+        self._copy(copier)
+        self._copy(copier)
+        self.assertEqual(calls, ['Reflink', 'Copy', 'Copy'])
+        self.assertEqual(
+            copier.get_method_name(self._from_path, self._to_dir_path),
+            FileCopier.COPY)
+
+
+    @unittest.skipUnless(
+        hasattr(os, 'copy_file_range'), 'requires os.copy_file_range')
+    def test_short_copy_file_range(self):
+
+        copy_file_range = os.copy_file_range
+        counts = []
+
+        def short_copy_file_range(from_fd, to_fd, count):
+            # Copy a little, and then report end of file early.
+            if len(counts) == 0:
+                counts.append(copy_file_range(from_fd, to_fd, 100))
+            else:
+                counts.append(0)
+            return counts[-1]
+
+        copier = FileCopier()
+        copier._methods = tuple(
+            m for m in copier._methods
+            if m[0] in (FileCopier.COPY_FILE_RANGE, FileCopier.COPY))
+
+        os.copy_file_range = short_copy_file_range
+        try:
+            # `self._copy` checks that the whole file was copied.
+            self._copy(copier)
+        finally:
+            os.copy_file_range = copy_file_range
+
+        self.assertEqual(counts, [100, 0])
+        self.assertEqual(
+            copier.get_method_name(self._from_path, self._to_dir_path),
+            FileCopier.COPY)
+
+
+    def _copy(self, copier):
+
+        to_path = self._to_dir_path / 'to.wav'
+        copier.copy(self._from_path, to_path)
+
+        self.assertEqual(to_path.read_bytes(), self._from_path.read_bytes())
+        self.assertEqual(
+            to_path.stat().st_mtime_ns, self._from_path.stat().st_mtime_ns)
+
+        return to_path
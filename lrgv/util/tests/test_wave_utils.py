@@ -0,0 +1,75 @@
+from pathlib import Path
+import tempfile
+import wave
+
+from lrgv.util.test_case import TestCase
+from lrgv.util.wave_utils import WaveFileError
+import lrgv.util.wave_utils as wave_utils
+
+
+class WaveUtilsTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def _write_wave_file(self, name, frame_count, channel_count=1):
+        path = self._dir_path / name
+        with wave.open(str(path), 'wb') as writer:
+            writer.setnchannels(channel_count)
+            writer.setsampwidth(2)
+            writer.setframerate(22050)
+            writer.writeframes(b'\x01\x00' * frame_count * channel_count)
+        return path
+
+
+    def test_read_wave_file_header(self):
+
+        path = self._write_wave_file('a.wav', 1000, 2)
+
+        header = wave_utils.read_wave_file_header(path)
+
+        self.assertEqual(header.format_tag, 1)
+        self.assertEqual(header.channel_count, 2)
+        self.assertEqual(header.sample_rate, 22050)
+        self.assertEqual(header.sample_width, 2)
+        self.assertEqual(header.frame_count, 1000)
+        self.assertEqual(header.data_offset, 44)
+        self.assertEqual(header.data_size, 4000)
+
+
+    def test_read_wave_file_header_errors(self):
+
+        path = self._dir_path / 'b.wav'
+
+        for contents in (b'', b'RIFF', b'RIFF\x00\x00\x00\x00WAVX'):
+            path.write_bytes(contents)
+            with self.assertRaises(WaveFileError):
+                wave_utils.read_wave_file_header(path)
+
+
+    def test_is_wave_file_complete(self):
+
+        path = self._write_wave_file('a.wav', 1000)
+        contents = path.read_bytes()
+        size = len(contents)
+
+        self.assertTrue(wave_utils.is_wave_file_complete(path, size))
+
+        # truncated file
+        path.write_bytes(contents[:-10])
+        self.assertFalse(wave_utils.is_wave_file_complete(path, size - 10))
+
+        # truncated header
+        path.write_bytes(contents[:20])
+        self.assertFalse(wave_utils.is_wave_file_complete(path, 20))
+
+        # missing file
+        path.unlink()
+        self.assertFalse(wave_utils.is_wave_file_complete(path, size))
@@ -0,0 +1,138 @@
+"""
+Utility functions relating to WAVE audio files.
+
+The functions of this module read only the RIFF chunk headers and the
+format chunk of a WAVE file, and not its sample data, so they are much
+less expensive than opening a file with the `wave` module when only
+the file's format, length, or completeness is needed.
+"""
+
+
+import struct
+
+from lrgv.util.bunch import Bunch
+
+
+class WaveFileError(Exception):
+    pass
+
+
+_RIFF_HEADER_STRUCT = struct.Struct('<4sI4s')
+_CHUNK_HEADER_STRUCT = struct.Struct('<4sI')
+_FORMAT_STRUCT = struct.Struct('<HHIIHH')
+
+
+def read_wave_file_header(file_path):
+
+    """
+    Reads the header of a WAVE file.
+
+    Returns a `Bunch` with the following attributes:
+
+        riff_chunk_size - size in bytes of the RIFF chunk, as declared
+            in the RIFF chunk header
+        format_tag - WAVE format tag, e.g. 1 for PCM
+        channel_count - number of channels
+        sample_rate - sample rate in hertz
+        sample_width - sample width in bytes
+        data_offset - offset in bytes of the sample data in the file
+        data_size - size in bytes of the sample data, as declared in
+            the data chunk header
+        frame_count - number of sample frames, computed from the data
+            size and the frame size
+
+    Raises `WaveFileError` if the file is not a WAVE file, or if it is
+    truncated before the start of its sample data.
+    """
+
+    with open(file_path, 'rb') as file:
+
+        data = file.read(_RIFF_HEADER_STRUCT.size)
+
+        if len(data) < _RIFF_HEADER_STRUCT.size:
+            raise WaveFileError(
+                f'File "{file_path}" is too short to be a WAVE file.')
+
+        riff_id, riff_chunk_size, wave_id = _RIFF_HEADER_STRUCT.unpack(data)
+
+        if riff_id != b'RIFF' or wave_id != b'WAVE':
+            raise WaveFileError(f'File "{file_path}" is not a WAVE file.')
+
+        format = None
+
+        while True:
+
+            data = file.read(_CHUNK_HEADER_STRUCT.size)
+
+            if len(data) < _CHUNK_HEADER_STRUCT.size:
+                raise WaveFileError(
+                    f'WAVE file "{file_path}" has no data chunk.')
+
+            chunk_id, chunk_size = _CHUNK_HEADER_STRUCT.unpack(data)
+
+            if chunk_id == b'fmt ':
+
+                data = file.read(chunk_size)
+
+                if len(data) < _FORMAT_STRUCT.size:
+                    raise WaveFileError(
+                        f'WAVE file "{file_path}" has truncated format '
+                        f'chunk.')
+
+                format = _FORMAT_STRUCT.unpack(data[:_FORMAT_STRUCT.size])
+
+                # Skip pad byte, if any.
+                if chunk_size % 2 == 1:
+                    file.seek(1, 1)
+
+            elif chunk_id == b'data':
+                data_offset = file.tell()
+                data_size = chunk_size
+                break
+
+            else:
+                # Skip chunk and pad byte, if any.
+                file.seek(chunk_size + chunk_size % 2, 1)
+
+    if format is None:
+        raise WaveFileError(
+            f'WAVE file "{file_path}" has no format chunk before its '
+            f'data chunk.')
+
+    format_tag, channel_count, sample_rate, _, frame_size, bits_per_sample = \
+        format
+
+    if frame_size == 0:
+        raise WaveFileError(
+            f'WAVE file "{file_path}" has invalid frame size zero.')
+
+    return Bunch(
+        riff_chunk_size=riff_chunk_size,
+        format_tag=format_tag,
+        channel_count=channel_count,
+        sample_rate=sample_rate,
+        sample_width=(bits_per_sample + 7) // 8,
+        data_offset=data_offset,
+        data_size=data_size,
+        frame_count=data_size // frame_size)
+
+
+def is_wave_file_complete(file_path, file_size):
+
+    """
+    Determines whether or not a WAVE file of the specified size is
+    complete, i.e. whether its size is consistent with the chunk sizes
+    declared in its header.
+
+    A WAVE file that is still being written or copied is typically
+    either shorter than its header says it should be, or has a header
+    whose chunk sizes have not yet been updated from placeholder values.
+    """
+
+    try:
+        header = read_wave_file_header(file_path)
+    except (OSError, WaveFileError):
+        return False
+
+    return header.riff_chunk_size + 8 == file_size and \
+        header.data_offset + header.data_size <= file_size